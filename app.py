@@ -1,12 +1,62 @@
-import base64
-import io
-from dash import Dash, html, dcc, Input, Output, callback, dash_table, State
-from process import process_addresses, generate_excel
+import hmac
+import os
+import re
+import threading
+import time
+import uuid
+import diskcache
+from dash import Dash, html, dcc, Input, Output, callback, ctx, dash_table, no_update, DiskcacheManager
+from flask import abort, jsonify, request, send_file
+from incremental import IncrementalStore
+from instrumentation import StageRecorder
+from parsing import AddressParser
+from preview import NUMERIC_COLUMNS, PREVIEW_PAGE_SIZE
+from process import cache_stats, process_addresses, parquet_available, RESULT_COLUMNS, REFERENCE_VERSION_COLUMN
+from reference import (ReferenceWatcher, current_default_reference, install_default_database, load_default_reference,
+                       reload_default_reference, reload_in_progress, DATABASE_POLL_SECONDS, DEFAULT_DATABASE_PATH)
+from result_store import ResultStore, EXPORT_MIMETYPES
 import dash_bootstrap_components as dbc
 
+# Nạp database mặc định đã biên dịch một lần khi worker khởi động. Mỗi worker tự theo dõi file database
+# và nạp lại khi file thay đổi (ADDRESS_DATABASE_POLL_SECONDS=0 để tắt)
+load_default_reference()
+
+# Token cho các endpoint /admin, không đặt thì tắt các endpoint này
+ADMIN_TOKEN = os.environ.get("ADDRESS_ADMIN_TOKEN")
+
+# Lỗi của lần nạp lại database gần nhất (None nếu thành công)
+reference_reload_error = None
+
+# Số địa chỉ tối đa trong một yêu cầu /api/parse/batch
+API_MAX_BATCH = int(os.environ.get("ADDRESS_API_MAX_BATCH", "10000"))
+
+# Cache trên đĩa dùng chung giữa các worker cho hàng đợi job xử lý nền
+JOB_CACHE_DIR = os.environ.get("ADDRESS_JOB_CACHE_DIR",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), ".job_cache"))
+background_callback_manager = DiskcacheManager(diskcache.Cache(JOB_CACHE_DIR))
+
+# Kết quả xử lý theo từng lần tải lên, tải về bằng cách stream từ kho trên đĩa
+result_store = ResultStore()
+
+# Đặt ADDRESS_INCREMENTAL_STORE để dùng lại kết quả của các lần tải lên trước (chỉ xử lý địa chỉ mới),
+# kết quả lưu quá ADDRESS_INCREMENTAL_MAX_AGE_DAYS ngày bị xóa ở mỗi lần tải lên
+INCREMENTAL_ENABLED = bool(os.environ.get("ADDRESS_INCREMENTAL_STORE"))
+
+# File tải lên được ghi thẳng ra thư mục này, callback xử lý đọc từ đĩa rồi xóa
+UPLOAD_DIR = os.environ.get("ADDRESS_UPLOAD_DIR",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".uploads"))
+UPLOAD_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Dung lượng tối đa của một yêu cầu tải lên, và thời gian giữ file tải lên chưa được xử lý (người dùng
+# đóng tab trước khi job chạy, job lỗi trước khi kịp xóa file)
+MAX_UPLOAD_MB = int(os.environ.get("ADDRESS_MAX_UPLOAD_MB", "200"))
+UPLOAD_TTL_SECONDS = int(os.environ.get("ADDRESS_UPLOAD_TTL", "21600"))
+
 # Use Bootstrap theme for a professional look
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP],
+           background_callback_manager=background_callback_manager)
 server = app.server
+server.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024
 app.title = "Tách địa chỉ"
 
 # Custom CSS for additional styling
@@ -55,13 +105,12 @@ app.layout = dbc.Container([
             dbc.Card([
                 dbc.CardHeader("Step 1: Upload Data", className="h5"),
                 dbc.CardBody([
-                    dcc.Upload(
+                    html.Div([
+                        html.I(className="fas fa-cloud-upload-alt me-2"),
+                        'Drag and Drop or ',
+                        html.A('Select Excel File', className="text-primary")
+                    ],
                         id='upload-data',
-                        children=html.Div([
-                            html.I(className="fas fa-cloud-upload-alt me-2"),
-                            'Drag and Drop or ',
-                            html.A('Select Excel File', className="text-primary")
-                        ]),
                         style={
                             'width': '100%',
                             'height': '100px',
@@ -72,9 +121,9 @@ app.layout = dbc.Container([
                             'textAlign': 'center',
                             'backgroundColor': '#f8f9fa',
                             'cursor': 'pointer'
-                        },
-                        multiple=False
+                        }
                     ),
+                    dcc.Store(id='uploaded-file'),
                     html.Div(id="upload-status", className="mt-3 text-center")
                 ])
             ], className="mb-4"),
@@ -83,25 +132,78 @@ app.layout = dbc.Container([
             dbc.Card([
                 dbc.CardHeader("Step 2: Processing", className="h5"),
                 dbc.CardBody([
-                    html.Div(id="processing-status"),
+                    html.Div("Waiting for file upload...", id="processing-status"),
+                    dbc.Progress(id="processing-progress", value=0, striped=True, animated=True,
+                                 className="mt-3", style={'display': 'none'}),
+                    dcc.Store(id="result-key"),
                     dbc.Spinner(html.Div(id="loading-output"), color="primary", type="grow"),
                     html.Div([
+                        dbc.RadioItems(
+                            id="export-format",
+                            options=[{"label": "Excel (.xlsx)", "value": "xlsx"},
+                                     {"label": "CSV", "value": "csv"}] +
+                                    ([{"label": "Parquet", "value": "parquet"}] if parquet_available() else []),
+                            value="xlsx",
+                            inline=True,
+                            className="text-center"
+                        ),
                         dbc.Button("Download Processed Data",
                                    id="btn-download",
                                    color="primary",
                                    disabled=True,
-                                   className="mt-3"),
-                        dcc.Download(id="download-excel")
+                                   external_link=True,
+                                   className="mt-3")
                     ], className="d-grid gap-2 col-6 mx-auto mt-3")
                 ])
             ])
         ], width=12)
     ]),
 
-    # Results preview
+    # Results preview: chỉ trang đang xem được gửi về trình duyệt, lọc/sắp xếp/phân trang làm ở server
     dbc.Row([
         dbc.Col([
-            html.Div(id="preview-container", className="mt-4")
+            html.Div([
+                dbc.Card([
+                    dbc.CardHeader("Data Preview", className="h5"),
+                    dbc.CardBody([
+                        dbc.Switch(id="preview-check-only", label="Only show addresses that need checking",
+                                   value=False, className="mb-3"),
+                        dash_table.DataTable(
+                            id="preview-table",
+                            columns=[{'name': i, 'id': i, 'type': 'numeric' if i in NUMERIC_COLUMNS else 'text'}
+                                     for i in RESULT_COLUMNS],
+                            data=[],
+                            page_current=0,
+                            page_size=PREVIEW_PAGE_SIZE,
+                            page_action='custom',
+                            filter_action='custom',
+                            filter_query='',
+                            sort_action='custom',
+                            sort_mode='multi',
+                            sort_by=[],
+                            style_table={'overflowX': 'auto'},
+                            style_header={
+                                'backgroundColor': '#4b6584',
+                                'color': 'white',
+                                'fontWeight': 'bold'
+                            },
+                            style_cell={
+                                'textAlign': 'left',
+                                'padding': '8px',
+                                'minWidth': '100px',
+                            },
+                            style_data_conditional=[
+                                {
+                                    'if': {'column_id': 'Check', 'filter_query': '{Check} contains "Cần kiểm tra"'},
+                                    'backgroundColor': '#ffeaa7',
+                                    'color': '#d35400'
+                                }
+                            ]
+                        ),
+                        html.P(id="preview-summary", className="text-muted mt-3")
+                    ])
+                ])
+            ], id="preview-container", className="mt-4", style={'display': 'none'})
         ])
     ]),
 
@@ -113,22 +215,81 @@ app.layout = dbc.Container([
 ], fluid=True, className="bg-light min-vh-100 pb-5")
 
 
+@server.route("/uploads", methods=["POST"])
+def upload_file():
+    # Ghi file ra đĩa theo từng khối, không giữ cả file trong bộ nhớ
+    uploaded = request.files.get("file")
+    if uploaded is None or not uploaded.filename:
+        abort(400)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    sweep_uploads()
+    upload_id = uuid.uuid4().hex
+    uploaded.save(os.path.join(UPLOAD_DIR, upload_id))
+    return jsonify(upload_id=upload_id, filename=uploaded.filename)
+
+
+def sweep_uploads():
+    # Xóa các file tải lên cũ hơn UPLOAD_TTL_SECONDS, gọi ở mỗi lần tải lên
+    cutoff = time.time() - UPLOAD_TTL_SECONDS
+    for entry in os.scandir(UPLOAD_DIR):
+        if UPLOAD_ID_PATTERN.fullmatch(entry.name) is None:
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # Đã được job xử lý hoặc worker khác xóa
+            pass
+
+
+def upload_path(upload_id):
+    if not isinstance(upload_id, str) or UPLOAD_ID_PATTERN.fullmatch(upload_id) is None:
+        return None
+    return os.path.join(UPLOAD_DIR, upload_id)
+
+
+def reference_version_of(result_df):
+    # Version database đã dùng cho result_df (mọi dòng cùng một version)
+    versions = result_df[REFERENCE_VERSION_COLUMN]
+    return versions.iloc[0] if len(versions) else "-"
+
+
+def processing_details(recorder):
+    # Thời gian từng bước và các bộ đếm của lần xử lý, thu gọn mặc định
+    return html.Details([
+        html.Summary("Processing details", className="text-muted"),
+        html.Ul([html.Li(f"{stage}: {seconds:.2f}s" + (f" ({recorder.rows[stage]} rows)"
+                                                          if stage in recorder.rows else ""))
+                 for stage, seconds in recorder.seconds.items()] +
+                [html.Li(f"{name}: {value}") for name, value in sorted(recorder.counters.items())],
+                className="small text-muted mb-0")
+    ], className="mt-2")
+
+
 @callback(
     Output('upload-status', 'children'),
     Output('processing-status', 'children'),
-    Output('preview-container', 'children'),
+    Output('preview-container', 'style'),
     Output('btn-download', 'disabled'),
     Output('loading-output', 'children'),
-    Input('upload-data', 'contents'),
-    State('upload-data', 'filename')
+    Output('result-key', 'data'),
+    Input('uploaded-file', 'data'),
+    background=True,
+    running=[
+        (Output('processing-progress', 'style'), {'display': 'flex'}, {'display': 'none'}),
+    ],
+    progress=[Output('processing-progress', 'value'), Output('processing-progress', 'label')],
+    prevent_initial_call=True
 )
-def update_upload_status(contents, filename):
-    if not contents:
+def update_upload_status(set_progress, uploaded_file):
+    path = upload_path(uploaded_file.get("upload_id")) if uploaded_file else None
+    if path is None:
         return (
             None,
             "Waiting for file upload...",
-            None,
+            {'display': 'none'},
             True,
+            None,
             None
         )
 
@@ -136,63 +297,45 @@ def update_upload_status(contents, filename):
         # Show upload status
         upload_status = html.Div([
             html.I(className="fas fa-check-circle text-success me-2"),
-            f"File uploaded: {filename}"
+            f"File uploaded: {uploaded_file.get('filename')}"
         ])
 
-        # Decode uploaded file content
-        content_type, content_string = contents.split(',')
-        decoded = base64.b64decode(content_string)
+        # Process addresses using uploaded file, reporting progress to the progress bar
+        def report_progress(done, total):
+            percent = int(done * 100 / total) if total else 100
+            set_progress((percent, f"{done}/{total}"))
 
-        # Process addresses using uploaded file
-        result_df = process_addresses(io.BytesIO(decoded))
+        # Job nền chạy trong một tiến trình con tạo mới cho mỗi lần tải lên: cache tách địa chỉ và tra mã
+        # bắt đầu từ trạng thái của worker web và bị bỏ khi job kết thúc, nên số trúng cache trong recorder
+        # chỉ tính trong lần tải lên này
+        recorder = StageRecorder()
+        if INCREMENTAL_ENABLED:
+            with IncrementalStore() as store:
+                store.prune()
+                result_df = process_addresses(path, progress_callback=report_progress, recorder=recorder,
+                                              store=store)
+        else:
+            result_df = process_addresses(path, progress_callback=report_progress, recorder=recorder)
+        server.logger.info("Processed %s: %s", uploaded_file.get('filename'), recorder.summary())
+
+        # Store the processed data for download and preview under a per-upload key,
+        # the file is generated in the chosen format on first download
+        result_key = result_store.new_key()
+        issue_count = len(result_store.save(result_key, result_df))
 
         # Processing success message
         processing_status = html.Div([
             html.I(className="fas fa-check-circle text-success me-2"),
             f"Processing complete! {len(result_df)} addresses processed.",
             html.Div([
-                html.Span(f"Found issues in {result_df['Check'].value_counts().get('Cần kiểm tra', 0)} addresses",
-                          className="text-warning" if result_df['Check'].value_counts().get('Cần kiểm tra',
-                                                                                            0) > 0 else "")
-            ], className="mt-2")
-        ])
-
-        # Create preview with styled table
-        preview_component = dbc.Card([
-            dbc.CardHeader("Data Preview", className="h5"),
-            dbc.CardBody([
-                dash_table.DataTable(
-                    data=result_df.head(10).to_dict('records'),
-                    columns=[{'name': i, 'id': i} for i in result_df.columns],
-                    page_size=10,
-                    style_table={'overflowX': 'auto'},
-                    style_header={
-                        'backgroundColor': '#4b6584',
-                        'color': 'white',
-                        'fontWeight': 'bold'
-                    },
-                    style_cell={
-                        'textAlign': 'left',
-                        'padding': '8px',
-                        'minWidth': '100px',
-                    },
-                    style_data_conditional=[
-                        {
-                            'if': {'column_id': 'Check', 'filter_query': '{Check} contains "Cần kiểm tra"'},
-                            'backgroundColor': '#ffeaa7',
-                            'color': '#d35400'
-                        }
-                    ]
-                ),
-                html.P(f"Showing 10 of {len(result_df)} rows", className="text-muted mt-3")
-            ])
+                html.Span(f"Found issues in {issue_count} addresses",
+                          className="text-warning" if issue_count > 0 else "")
+            ], className="mt-2"),
+            html.Div(f"Reference database: {reference_version_of(result_df)}", className="small text-muted mt-1"),
+            processing_details(recorder)
         ])
 
-        # Store the processed data for download
-        global processed_data
-        processed_data = generate_excel(result_df)
-
-        return upload_status, processing_status, preview_component, False, None
+        return upload_status, processing_status, {'display': 'block'}, False, None, result_key
 
     except Exception as e:
         error_message = html.Div([
@@ -202,20 +345,188 @@ def update_upload_status(contents, filename):
         return html.Div([
             html.I(className="fas fa-times-circle text-danger me-2"),
             "Upload failed"
-        ]), error_message, None, True, None
+        ]), error_message, {'display': 'none'}, True, None, None
+
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
 
 
 @callback(
-    Output("download-excel", "data"),
-    Input("btn-download", "n_clicks"),
-    prevent_initial_call=True
+    Output("preview-table", "data"),
+    Output("preview-table", "page_count"),
+    Output("preview-table", "page_current"),
+    Output("preview-summary", "children"),
+    Input("result-key", "data"),
+    Input("preview-table", "page_current"),
+    Input("preview-table", "page_size"),
+    Input("preview-table", "sort_by"),
+    Input("preview-table", "filter_query"),
+    Input("preview-check-only", "value")
 )
-def download_processed_file(n_clicks):
-    if n_clicks:
-        return dcc.send_bytes(
-            processed_data.getvalue(),
-            filename="processed_addresses.xlsx"
-        )
+def update_preview_page(result_key, page_current, page_size, sort_by, filter_query, check_only):
+    # Chỉ đọc trang đang xem từ kho kết quả. Kết quả, bộ lọc, thứ tự hoặc chế độ xem thay đổi thì quay về
+    # trang đầu ngay trong callback này, nên mỗi thay đổi chỉ đọc kho một lần
+    if set(ctx.triggered_prop_ids) - {"preview-table.page_current", "preview-table.page_size"}:
+        page_current = 0
+        new_page = 0
+    else:
+        new_page = no_update
+    page = result_store.preview_page(result_key, page_current, page_size, sort_by, filter_query,
+                                     bool(check_only)) if result_key else None
+    if page is None:
+        return [], 1, new_page, None
+    data, page_count, matched, total = page
+    return data, page_count, new_page, (f"{matched} of {total} rows, "
+                                        f"page {min((page_current or 0) + 1, page_count)} of {page_count}")
+
+
+@callback(
+    Output("btn-download", "href"),
+    Input("result-key", "data"),
+    Input("export-format", "value")
+)
+def update_download_link(result_key, export_format):
+    if not result_key:
+        return None
+    return f"/results/{result_key}/{export_format or 'xlsx'}"
+
+
+@server.route("/results/<result_key>/<export_format>")
+def download_result(result_key, export_format):
+    if export_format == "parquet" and not parquet_available():
+        abort(404)
+    recorder = StageRecorder()
+    with recorder.stage(f"export_{export_format}"):
+        handle = result_store.open_export(result_key, export_format)
+    if handle is None:
+        abort(404)
+    server.logger.info("Download %s: %s", result_key, recorder.summary())
+    return send_file(handle, mimetype=EXPORT_MIMETYPES[export_format], as_attachment=True,
+                     download_name=f"processed_addresses.{export_format}")
+
+
+def parsed_to_json(parsed):
+    # Mã trong ParsedAddress đã là int (hoặc None) nên trả thẳng được ra JSON
+    return parsed._asdict()
+
+
+def api_error(status, message):
+    response = jsonify(error=message)
+    response.status_code = status
+    return response
+
+
+@server.route("/api/parse", methods=["POST"])
+def api_parse():
+    # {"address": "..."} -> kết quả tách và mã của một địa chỉ
+    address_parser = current_parser()
+    if address_parser is None:
+        return api_error(503, "Chưa có database mặc định")
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get("address"), str):
+        return api_error(400, "Cần JSON dạng {\"address\": \"...\"}")
+    result = parsed_to_json(address_parser.parse(payload["address"]))
+    result["reference_version"] = address_parser.version
+    return jsonify(result)
+
+
+@server.route("/api/parse/batch", methods=["POST"])
+def api_parse_batch():
+    # {"addresses": ["...", ...]} -> danh sách kết quả theo đúng thứ tự
+    address_parser = current_parser()
+    if address_parser is None:
+        return api_error(503, "Chưa có database mặc định")
+    payload = request.get_json(silent=True)
+    addresses = payload.get("addresses") if isinstance(payload, dict) else None
+    if not isinstance(addresses, list):
+        return api_error(400, "Cần JSON dạng {\"addresses\": [\"...\", ...]}")
+    if len(addresses) > API_MAX_BATCH:
+        return api_error(413, f"Tối đa {API_MAX_BATCH} địa chỉ mỗi yêu cầu")
+    results = [parsed_to_json(address_parser.parse(address)) for address in addresses]
+    return jsonify(reference_version=address_parser.version, results=results)
+
+
+def current_parser():
+    # Parser cho database mặc định hiện tại; mỗi yêu cầu lấy một lần nên nạp lại database giữa chừng
+    # không ảnh hưởng yêu cầu đang chạy
+    reference = current_default_reference()
+    return AddressParser(reference) if reference is not None else None
+
+
+def set_reload_error(error):
+    global reference_reload_error
+    reference_reload_error = str(error) if error is not None else None
+
+
+def log_reload(reference):
+    set_reload_error(None)
+    server.logger.info("Reference database reloaded: %s", reference.version)
+
+
+def log_reload_error(error):
+    set_reload_error(error)
+    server.logger.error("Reference database reload failed: %s", error)
+
+
+if DATABASE_POLL_SECONDS > 0:
+    ReferenceWatcher(interval=DATABASE_POLL_SECONDS, on_reload=log_reload, on_error=log_reload_error).start()
+
+
+def admin_authorized():
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+@server.route("/admin/reference", methods=["GET"])
+def admin_reference():
+    # Database mặc định đang dùng của worker này, cùng hit/miss cache tách địa chỉ và tra mã của worker
+    if not ADMIN_TOKEN:
+        abort(404)
+    if not admin_authorized():
+        return api_error(401, "Sai token")
+    reference = current_default_reference()
+    return jsonify(version=reference.version if reference is not None else None, path=DEFAULT_DATABASE_PATH,
+                   reloading=reload_in_progress(), error=reference_reload_error, cache=cache_stats())
+
+
+@server.route("/admin/reference", methods=["POST"])
+def admin_reload_reference():
+    # Nạp lại database mặc định trong nền. Có file tải lên (trường "file", sheet "database") thì file
+    # đó thay file database mặc định; các worker khác nhận ra file mới qua ReferenceWatcher
+    if not ADMIN_TOKEN:
+        abort(404)
+    if not admin_authorized():
+        return api_error(401, "Sai token")
+    if reload_in_progress():
+        return api_error(409, "Đang nạp lại database")
+
+    uploaded = request.files.get("file")
+    source_path = None
+    if uploaded is not None and uploaded.filename:
+        # Ghi cạnh file database để đổi tên thay file cũ trong một bước
+        source_path = f"{DEFAULT_DATABASE_PATH}.{uuid.uuid4().hex}.upload"
+        uploaded.save(source_path)
+
+    def reload():
+        try:
+            if source_path is not None:
+                reference = install_default_database(source_path)
+            else:
+                reference = reload_default_reference()
+        except Exception as e:
+            log_reload_error(e)
+            if source_path is not None and os.path.exists(source_path):
+                os.remove(source_path)
+            return
+        if reference is not None:
+            log_reload(reference)
+
+    threading.Thread(target=reload, name="reference-reload", daemon=True).start()
+    reference = current_default_reference()
+    response = jsonify(status="reloading", version=reference.version if reference is not None else None)
+    response.status_code = 202
+    return response
 
 
 # Run the app
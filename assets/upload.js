@@ -0,0 +1,51 @@
+// Gửi file tải lên thẳng tới /uploads dưới dạng multipart thay vì qua dcc.Upload (base64 trong JSON),
+// server ghi file ra đĩa theo từng khối rồi callback xử lý đọc từ file đó.
+(function () {
+    function uploadFile(file) {
+        if (!file) {
+            return;
+        }
+        window.dash_clientside.set_props("upload-status", {children: "Uploading " + file.name + "..."});
+
+        var formData = new FormData();
+        formData.append("file", file);
+        fetch("/uploads", {method: "POST", body: formData})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status + " " + response.statusText);
+                }
+                return response.json();
+            })
+            .then(function (upload) {
+                window.dash_clientside.set_props("uploaded-file", {data: upload});
+            })
+            .catch(function (error) {
+                window.dash_clientside.set_props("upload-status", {children: "Upload failed: " + error.message});
+            });
+    }
+
+    document.addEventListener("click", function (event) {
+        if (event.target.closest && event.target.closest("#upload-data")) {
+            var input = document.createElement("input");
+            input.type = "file";
+            input.accept = ".xlsx,.xls";
+            input.addEventListener("change", function () {
+                uploadFile(input.files[0]);
+            });
+            input.click();
+        }
+    });
+
+    document.addEventListener("dragover", function (event) {
+        if (event.target.closest && event.target.closest("#upload-data")) {
+            event.preventDefault();
+        }
+    });
+
+    document.addEventListener("drop", function (event) {
+        if (event.target.closest && event.target.closest("#upload-data")) {
+            event.preventDefault();
+            uploadFile(event.dataTransfer.files[0]);
+        }
+    });
+})();
@@ -0,0 +1,141 @@
+"""
+Sinh bộ địa chỉ giả lập từ sheet database để benchmark: địa chỉ được ghép từ các dòng tỉnh/quận/phường
+thật trong database rồi thêm nhiễu như dữ liệu người dùng nhập: bỏ dấu, viết tắt (TP HCM, Q.1, P.5, BRVT),
+thiếu dấu phẩy, đổi dấu phân cách, thiếu cấp hành chính, ô trống và địa chỉ trùng lặp.
+
+    python benchmarks/address_generator.py database.xlsx output.xlsx [--rows 10000] [--seed 0]
+
+File kết quả có sheet "raw" (cột Address) và sheet "database" chép từ file đầu vào.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalize import remove_accents  # noqa: E402
+
+STREETS = ("Lê Lợi", "Nguyễn Huệ", "Trần Hưng Đạo", "Hai Bà Trưng", "Lý Thường Kiệt", "Nguyễn Trãi",
+           "Cách Mạng Tháng Tám", "Điện Biên Phủ", "Võ Văn Tần", "Phan Đình Phùng", "Quang Trung", "30 Tháng 4")
+HCMC_NAMES = ("TP HCM", "TPHCM", "TP. HCM", "HCM", "Hồ Chí Minh", "TP. Hồ Chí Minh", "Thành phố Hồ Chí Minh",
+              "ho chi minh")
+BRVT_NAMES = ("BRVT", "Bà Rịa - Vũng Tàu", "Bà Rịa Vũng Tàu", "tỉnh Bà Rịa - Vũng Tàu", "Vũng Tàu",
+              "ba ria vung tau", "Tỉnh BR - VT")
+DISTRICT_ABBREVIATIONS = (("Quận ", ("Q.", "Q", "Q. ", "quận ")), ("Huyện ", ("H.", "huyện ")),
+                          ("Thị xã ", ("TX ", "TX. ")), ("Thành phố ", ("TP ", "TP. ")))
+WARD_ABBREVIATIONS = (("Phường ", ("P.", "P", "P. ", "phường ")), ("Xã ", ("xã ", "X. ")),
+                      ("Thị trấn ", ("TT ", "TT. ")))
+NUMBER_PATTERN = re.compile(r"\d+$")
+
+
+def abbreviate(name, abbreviations, rng):
+    for prefix, short_forms in abbreviations:
+        if name.startswith(prefix):
+            return rng.choice(short_forms) + name[len(prefix):]
+    return name
+
+
+def province_variant(province, rng):
+    normalized = remove_accents(province).lower()
+    if "ho chi minh" in normalized:
+        return rng.choice(HCMC_NAMES)
+    if "vung tau" in normalized:
+        return rng.choice(BRVT_NAMES)
+    return rng.choice((province, province, f"Tỉnh {province}", f"TP {province}", province.lower()))
+
+
+def make_address(row, rng):
+    province, district, ward = row
+    detail = f"{rng.randint(1, 500)} {rng.choice(('', 'Đường ', 'đường '))}{rng.choice(STREETS)}"
+
+    if rng.random() < 0.4:
+        province = province_variant(province, rng)
+    if isinstance(district, str) and (rng.random() < 0.3 or NUMBER_PATTERN.search(district)):
+        district = abbreviate(district, DISTRICT_ABBREVIATIONS, rng)
+    if isinstance(ward, str) and (rng.random() < 0.3 or NUMBER_PATTERN.search(ward)):
+        ward = abbreviate(ward, WARD_ABBREVIATIONS, rng)
+
+    # Thiếu cấp hành chính hoặc số nhà
+    parts = [detail, ward, district, province]
+    roll = rng.random()
+    if roll < 0.08:
+        parts.remove(ward)
+    elif roll < 0.12:
+        parts.remove(detail)
+    parts = [part for part in parts if isinstance(part, str)]
+
+    # Dấu phân cách: dấu phẩy, thiếu dấu phẩy, gạch ngang
+    roll = rng.random()
+    if roll < 0.7:
+        address = ", ".join(parts)
+    elif roll < 0.85:
+        address = " ".join(parts)
+    else:
+        address = " - ".join(parts)
+
+    roll = rng.random()
+    if roll < 0.15:
+        address = remove_accents(address)
+    elif roll < 0.2:
+        address = address.lower()
+    return address
+
+
+def generate_addresses(database_df, rows, seed=0, duplicate_rate=0.2, empty_rate=0.01):
+    """
+    Sinh rows địa chỉ từ database_df. Khoảng duplicate_rate địa chỉ lặp lại một địa chỉ đã sinh trước đó
+    và empty_rate là ô trống. Cùng seed cho cùng kết quả.
+    """
+    rng = random.Random(seed)
+    units = list(database_df[["Tỉnh/Thành phố", "Quận/Huyện", "Phường/Xã"]].dropna(
+        subset=["Tỉnh/Thành phố"]).itertuples(index=False, name=None))
+
+    addresses = []
+    for _ in range(rows):
+        roll = rng.random()
+        if roll < empty_rate:
+            addresses.append(None)
+        elif roll < empty_rate + duplicate_rate and addresses:
+            addresses.append(rng.choice(addresses))
+        else:
+            addresses.append(make_address(rng.choice(units), rng))
+    return addresses
+
+
+def write_workbook(output_path, addresses, database_df):
+    """
+    Ghi sheet "raw" và "database" bằng workbook write-only (đủ nhanh cho hàng triệu dòng).
+    """
+    workbook = Workbook(write_only=True)
+    raw_sheet = workbook.create_sheet("raw")
+    raw_sheet.append(["Address"])
+    for address in addresses:
+        raw_sheet.append([address])
+    database_sheet = workbook.create_sheet("database")
+    database_sheet.append(list(database_df.columns))
+    for row in database_df.itertuples(index=False, name=None):
+        database_sheet.append([None if pd.isna(value) else value for value in row])
+    workbook.save(output_path)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("database")
+    arg_parser.add_argument("output")
+    arg_parser.add_argument("--rows", type=int, default=10000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--duplicate-rate", type=float, default=0.2)
+    args = arg_parser.parse_args()
+
+    database_df = pd.read_excel(args.database, sheet_name="database")
+    addresses = generate_addresses(database_df, args.rows, args.seed, args.duplicate_rate)
+    write_workbook(args.output, addresses, database_df)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Bản sao cách tách địa chỉ trước khi có AddressSplitter: các hàm được định nghĩa lại (closure) mỗi lần gọi
+process_addresses và mỗi lần gọi đưa mẫu regex dạng chuỗi cho re.sub/re.search. Chỉ dùng làm mốc so sánh
+trong bench_split.py; không sửa file này khi thay đổi address_parser.py.
+"""
+import re
+
+import pandas as pd
+import unidecode
+
+from normalize import normalize_baria_vungtau
+
+
+# Hàm bỏ dấu tiếng Việt
+def remove_accents(text):
+    if pd.isna(text) or not isinstance(text, str):
+        return text
+    return unidecode.unidecode(str(text))
+
+
+def make_split_functions(provinces):
+    """
+    Tạo (preprocess_address, find_province_first, split_address) như phần đầu của process_addresses cũ,
+    với provinces là danh sách tỉnh/thành phố của database.
+    """
+    def find_province_first(address):
+        """
+        Tìm tỉnh/thành phố trong địa chỉ bằng cách so khớp với danh sách tỉnh trong database
+        """
+        if not isinstance(address, str):
+            return None
+
+        # Chuẩn hóa địa chỉ để tìm kiếm
+        normalized_address = address.lower()
+
+        # Đặc biệt xử lý trường hợp "thừa thiên huế"
+        if re.search(r'th[ưừ][aà]\s*thi[eê]n\s*hu[êếeé]', normalized_address):
+            return "Thừa Thiên - Huế"
+
+        # Tìm tỉnh/thành phố trong địa chỉ
+        for province in provinces:
+            if province.lower() in normalized_address:
+                return province
+
+        # Xử lý các trường hợp đặc biệt của Hồ Chí Minh
+        hcmc_variations = [
+            "tp hcm", "tp.hcm", "tphcm", "tp. hcm", "hcm", "chm", "tpchm",
+            "tp ho chi minh", "tp. ho chi minh", "ho chi minh"
+        ]
+
+        normalized_address_no_accent = remove_accents(normalized_address)
+        for variation in hcmc_variations:
+            if variation in normalized_address_no_accent:
+                return "TP Hồ Chí Minh"
+
+        return None
+
+
+    def preprocess_address(address):
+        if not isinstance(address, str):
+            return None
+
+        # Handle standalone HCM at the end of address
+        address = re.sub(r'\bHCM\b$', 'Hồ Chí Minh', address, flags=re.IGNORECASE)
+
+        # Handle "TP Something HCM" pattern (like "TP Thủ Đức HCM")
+        address = re.sub(r'(TP|Tp\.|T\.P\.|Thành phố)\s+([^\s,]+(\s+[^\s,]+)*)\s+HCM\b',
+                         r'\1 \2, Hồ Chí Minh', address, flags=re.IGNORECASE)
+
+        # Handle district followed directly by HCM without comma
+        address = re.sub(r'(Bình Chánh|Củ Chi|Hóc Môn|Nhà Bè|Cần Giờ|Thủ Đức)\s+(Hồ Chí Minh|HCM|TPHCM|TP HCM)$',
+                         r'\1, Hồ Chí Minh', address, flags=re.IGNORECASE)
+
+        # Handle numeric ward patterns in HCMC
+        address = re.sub(r'(P\.?\s*(\d+))\s+(Bình Thạnh|Quận \d+|Q\.?\s*\d+)',
+                         r'Phường \2, \3', address, flags=re.IGNORECASE)
+
+        # Handle other common patterns
+        address = re.sub(r'\bTP\.?\s*HCM\b', 'Hồ Chí Minh', address, flags=re.IGNORECASE)
+        address = re.sub(r'\bTPHCM\b', 'Hồ Chí Minh', address, flags=re.IGNORECASE)
+        address = re.sub(r'\bTP\.?\s*Hồ\s*Chí\s*Minh\b', 'Hồ Chí Minh', address, flags=re.IGNORECASE)
+        address = re.sub(r'\bThành\s*[Pp]hố\s*Hồ\s*Chí\s*Minh\b', 'Hồ Chí Minh', address)
+
+        # Chuẩn hóa dấu phẩy
+        address = address.replace(" - ", ", ")
+        address = address.replace("-", ", ")
+
+        # Xử lý khoảng trắng thừa
+        address = re.sub(r'\s+', ' ', address)
+        address = re.sub(r'\s*,\s*', ', ', address)
+
+        # Loại bỏ khoảng trắng ở đầu và cuối
+        address = address.strip()
+
+        return address
+
+
+    # Hàm nhận diện các đơn vị hành chính
+    def identify_admin_units(address):
+        # Các từ khóa để nhận diện tỉnh/thành phố
+        province_keywords = [
+            "TP", "Thành phố", "Tỉnh", "Tp.", "T.P", "Tp", "TPHCM", "Tphcm", "HCM",
+            "Hà Nội", "Hồ Chí Minh", "Đà Nẵng", "Cần Thơ", "Hải Phòng", "Huế"
+        ]
+
+        # Các từ khóa để nhận diện quận/huyện
+        district_keywords = [
+            "Quận", "Huyện", "Thị xã", "TX.", "TX", "Q.", "Q", "H.", "H"
+        ]
+
+        # Các từ khóa để nhận diện phường/xã
+        ward_keywords = [
+            "Phường", "Xã", "Thị trấn", "TT.", "TT", "P.", "P", "X.", "X",
+            "Khu phố", "KP", "Ấp", "Thôn", "Tổ"
+        ]
+
+        province = None
+        district = None
+        ward = None
+        detail = None
+
+        # Tìm kiếm trong địa chỉ
+        words = address.split()
+
+        # Xử lý trường hợp không có dấu phẩy
+        if ", " not in address and len(words) >= 3:
+            # Tìm các từ khóa trong địa chỉ
+            for i, word in enumerate(words):
+                if any(kw in word for kw in province_keywords) and i < len(words) - 1:
+                    province = words[i + 1]
+                elif any(kw in word for kw in district_keywords) and i < len(words) - 1:
+                    district = words[i + 1]
+                elif any(kw in word for kw in ward_keywords) and i < len(words) - 1:
+                    ward = words[i + 1]
+
+        return province, district, ward, detail
+
+
+    # Hàm tách địa chỉ thành 3 cấp
+    def split_address(address):
+        if not isinstance(address, str):
+            return None, None, None, None
+
+        # Tiền xử lý địa chỉ
+        address = preprocess_address(address)
+
+        # Xử lý đặc biệt cho Bà Rịa - Vũng Tàu
+        brvt_pattern = r'(.*?)(?:,\s*)?((?:Thành phố|TP\.?|T\.P\.?|Thị xã|TX\.?|Huyện)\s+([^,]+))(?:,\s*)?(Bà Rịa|Bà Rịa - Vũng Tàu|Vũng Tàu)$'
+        brvt_match = re.search(brvt_pattern, address, re.IGNORECASE)
+
+        if brvt_match and normalize_baria_vungtau(brvt_match.group(4)):
+            detail_and_ward = brvt_match.group(1).strip() if brvt_match.group(1) else None
+            district = brvt_match.group(3).strip()
+            province = "Bà Rịa - Vũng Tàu"
+
+            # Tách ward từ detail nếu có
+            if detail_and_ward:
+                ward_pattern = r'(.*?)(?:,\s*)?([^,]+)$'
+                ward_match = re.search(ward_pattern, detail_and_ward)
+                if ward_match:
+                    detail = ward_match.group(1).strip() if ward_match.group(1) else None
+                    ward = ward_match.group(2).strip()
+                    return province, district, ward, detail
+                else:
+                    return province, district, detail_and_ward, None
+            else:
+                return province, district, None, None
+
+        # Xử lý trường hợp đặc biệt "thành phố Vũng Tàu, tỉnh Bà Rịa - Vũng Tàu"
+        vungtau_pattern = r'(.*?)(?:,\s*)?(?:thành phố|tp\.?)\s+vũng\s+tàu(?:,\s*)?(?:tỉnh)?\s+bà\s+rịa(?:\s*-\s*vũng\s+tàu)?'
+        vungtau_match = re.search(vungtau_pattern, address.lower())
+
+        if vungtau_match:
+            detail_and_ward = vungtau_match.group(1).strip() if vungtau_match.group(1) else None
+            district = "Vũng Tàu"
+            province = "Bà Rịa - Vũng Tàu"
+
+            # Tách ward từ detail nếu có
+            if detail_and_ward and "," in detail_and_ward:
+                parts = detail_and_ward.split(",")
+                ward = parts[-1].strip()
+                detail = ", ".join(parts[:-1]).strip()
+                return province, district, ward, detail
+            else:
+                return province, district, detail_and_ward, None
+
+        # Xử lý các trường hợp đặc biệt khi địa chỉ chứa "Bà Rịa" hoặc "Vũng Tàu" nhưng không theo mẫu trên
+        if re.search(r'bà\s*rịa|vũng\s*tàu', address.lower()):
+            parts = address.split(", ")
+
+            # Xác định province trước
+            province = "Bà Rịa - Vũng Tàu"
+
+            # Tìm district trong các phần còn lại
+            district = None
+            ward = None
+            detail = None
+
+            # Danh sách các district của Bà Rịa - Vũng Tàu
+            brvt_districts = ["bà rịa", "vũng tàu", "châu đức", "đất đỏ", "long điền", "côn đảo", "xuyên mộc", "phú mỹ"]
+
+            # Tìm district trong các phần
+            for i, part in enumerate(parts):
+                part_lower = part.lower()
+                if any(district_name in part_lower for district_name in brvt_districts):
+                    # Tránh nhầm lẫn "Bà Rịa" và "Vũng Tàu" là district khi chúng là một phần của tên tỉnh
+                    if "bà rịa" in part_lower and "vũng tàu" in address.lower():
+                        continue
+                    if "vũng tàu" in part_lower and "bà rịa" in address.lower():
+                        continue
+
+                    district = part
+
+                    # Ward có thể là phần trước district
+                    if i > 0:
+                        ward = parts[i - 1]
+
+                    # Detail là các phần còn lại
+                    if i > 1:
+                        detail = ", ".join(parts[:i - 1])
+
+                    break
+
+            if district:
+                return province, district, ward, detail
+
+        # Tìm tỉnh/thành phố trước
+        province = find_province_first(address)
+
+        # Nếu tìm thấy tỉnh/thành phố, tiếp tục tách các thành phần khác
+        if province:
+            # Thử tách theo dấu phẩy
+            parts = address.split(", ")
+
+            # Xử lý các trường hợp có nhiều hơn 3 phần
+            if len(parts) > 3:
+                ward = parts[-3]
+                district = parts[-2]
+                detail = ", ".join(parts[:-3]).rstrip()  # Join all remaining parts as detail
+                return province, district, ward, detail
+
+            # Xử lý các trường hợp có đủ 3 phần
+            elif len(parts) == 3:
+                ward = parts[0]
+                district = parts[1]
+                return province, district, ward, None  # No detail
+
+            # Xử lý các trường hợp chỉ có 2 phần
+            elif len(parts) == 2:
+                district = parts[0]
+                return province, district, None, None  # No ward, no detail
+
+            # Trường hợp không có dấu phẩy hoặc chỉ có 1 phần
+            else:
+                # Thử nhận diện các đơn vị hành chính
+                _, district, ward, detail = identify_admin_units(address)
+                return province, district, ward, detail
+
+        # Thử tách theo dấu phẩy
+        parts = address.split(", ")
+
+        # Xử lý các trường hợp có nhiều hơn 3 phần
+        if len(parts) > 3:
+            ward = parts[-3]
+            district = parts[-2]
+            province = parts[-1]
+            detail = ", ".join(parts[:-3]).rstrip()  # Join all remaining parts as detail
+            return province, district, ward, detail
+
+        # Xử lý các trường hợp có đủ 3 phần
+        elif len(parts) == 3:
+            ward = parts[0]
+            district = parts[1]
+            province = parts[2]
+            return province, district, ward, None  # No detail
+
+        # Xử lý các trường hợp chỉ có 2 phần
+        elif len(parts) == 2:
+            district = parts[0]
+            province = parts[1]
+            return province, district, None, None  # No ward, no detail
+
+        # Trường hợp không có dấu phẩy hoặc chỉ có 1 phần
+        else:
+            # Thử nhận diện các đơn vị hành chính
+            province, district, ward, detail = identify_admin_units(address)
+
+            # Nếu không nhận diện được, xử lý theo không gian
+            if not any([province, district, ward]):
+                words = address.split()
+                if len(words) >= 3:
+                    # Giả định 3 từ cuối lần lượt là phường/xã, quận/huyện, tỉnh/thành phố
+                    ward = ' '.join(words[:-2])
+                    district = words[-2]
+                    province = words[-1]
+                    return province, district, ward, None
+                elif len(words) == 2:
+                    district = words[0]
+                    province = words[1]
+                    return province, district, None, None
+
+            return address, None, None, None  # Trả về toàn bộ địa chỉ nếu không thể phân tích
+
+    return preprocess_address, find_province_first, split_address
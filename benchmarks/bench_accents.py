@@ -0,0 +1,51 @@
+"""
+Đo tốc độ bỏ dấu tiếng Việt: remove_accents (bảng str.translate) so với unidecode.
+
+    python benchmarks/bench_accents.py input.xlsx [--repeat 5]
+
+File đầu vào cần sheet "database", sheet "raw" (cột Address) nếu có cũng được dùng để đo.
+Kết quả giống unidecode được kiểm tra trong tests/test_normalize.py.
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+import unidecode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalize import remove_accents, remove_accents_series  # noqa: E402
+from timing import time_per_call, time_series  # noqa: E402
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("workbook")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    with pd.ExcelFile(args.workbook) as workbook:
+        database_df = workbook.parse("database")
+        addresses = (workbook.parse("raw", usecols=["Address"])["Address"].dropna().astype(str).tolist()
+                     if "raw" in workbook.sheet_names else [])
+
+    print(f"best of {args.repeat}")
+
+    # Các cột tên của sheet database giữ nguyên các giá trị lặp lại, như khi biên dịch database
+    database_values = [str(name) for column in ("Tỉnh/Thành phố", "Quận/Huyện", "Phường/Xã")
+                       for name in database_df[column].dropna()]
+    for label, values in [("database", database_values), ("addresses", addresses)]:
+        if not values:
+            continue
+        series = pd.Series(values, dtype=object)
+        print(f"{label} ({len(values)}):")
+        print(f"  unidecode:             {time_per_call(unidecode.unidecode, values, args.repeat):8.3f} us/value")
+        print(f"  remove_accents:        {time_per_call(remove_accents, values, args.repeat):8.3f} us/value")
+        print(f"  apply(remove_accents): {time_series(lambda s: s.apply(remove_accents), series, args.repeat):8.3f}"
+              f" us/value")
+        print(f"  remove_accents_series: {time_series(remove_accents_series, series, args.repeat):8.3f} us/value")
+
+
+if __name__ == "__main__":
+    main()
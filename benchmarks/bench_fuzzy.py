@@ -0,0 +1,84 @@
+"""
+Benchmark so khớp gần đúng: thời gian tra mã (resolve_admin_codes) khi bật và tắt so khớp gần đúng,
+và chi phí một lần FuzzyMatcher.match.
+
+    python benchmarks/bench_fuzzy.py input.xlsx [--repeat 5]
+
+File đầu vào cần sheet "raw" (cột Address) và sheet "database". Các dòng "exact" là các dòng tra được
+đủ mã mà không cần so khớp gần đúng, thời gian của chúng không được tăng khi bật tính năng này.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from address_parser import AddressSplitter  # noqa: E402
+from process import resolve_admin_codes, get_fuzzy_matchers  # noqa: E402
+from reference import get_reference  # noqa: E402
+
+
+def time_resolve(split_df, reference, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        result_df = split_df.copy()
+        start = time.perf_counter()
+        resolve_admin_codes(result_df, reference)
+        best = min(best, time.perf_counter() - start)
+    return best, result_df
+
+
+def set_threshold(reference, threshold):
+    for matcher in get_fuzzy_matchers(reference):
+        matcher.threshold = threshold
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("workbook")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    addresses = pd.read_excel(args.workbook, sheet_name="raw")["Address"].tolist()
+    reference = get_reference(pd.read_excel(args.workbook, sheet_name="database"))
+    splitter = AddressSplitter(reference.provinces)
+    split_df = pd.DataFrame(addresses, columns=["Address"])
+    split_df[["Province/City", "District", "Ward", "Detail"]] = pd.DataFrame(
+        [splitter.split_address(address) for address in addresses], columns=["Province/City", "District", "Ward",
+                                                                             "Detail"], dtype=object)
+    default_threshold = get_fuzzy_matchers(reference)[0].threshold
+
+    # Tắt so khớp gần đúng để biết các dòng khớp chính xác
+    set_threshold(reference, 2)
+    _, exact_df = time_resolve(split_df, reference, 1)
+    exact = exact_df[["Province Code", "District Code", "Ward Code"]].notna().all(axis=1)
+    exact_split_df = split_df[exact].reset_index(drop=True)
+
+    print(f"{len(split_df)} addresses ({exact.sum()} exact matches), best of {args.repeat}")
+    for label, threshold in [("fuzzy off", 2), (f"fuzzy {default_threshold}", default_threshold)]:
+        set_threshold(reference, threshold)
+        exact_seconds, _ = time_resolve(exact_split_df, reference, args.repeat)
+        all_seconds, result_df = time_resolve(split_df, reference, args.repeat)
+        fuzzy_rows = ((result_df["District Match Score"].notna() & (result_df["District Match Score"] != 1.0)) |
+                      (result_df["Ward Match Score"].notna() & (result_df["Ward Match Score"] != 1.0))).sum()
+        print(f"{label:>10}: exact rows {len(exact_split_df) / exact_seconds:10.0f} rows/s, "
+              f"all rows {len(split_df) / all_seconds:10.0f} rows/s, fuzzy matched rows {fuzzy_rows}")
+
+    # Chi phí một lần tra gần đúng trên tên quận/huyện chưa khớp
+    district_matcher, _ = get_fuzzy_matchers(reference)
+    unmatched = exact_df[exact_df["Province Code"].notna() & exact_df["District Code"].isna() &
+                         exact_df["District"].notna()]
+    queries = [(int(code), name) for code, name in zip(unmatched["Province Code"], unmatched["District"])]
+    if queries:
+        start = time.perf_counter()
+        for parent_code, name in queries:
+            district_matcher.match(parent_code, name)
+        elapsed = time.perf_counter() - start
+        print(f"FuzzyMatcher.match: {elapsed / len(queries) * 1e6:8.2f} us/call over {len(queries)} unmatched districts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark chế độ song song: thời gian xử lý khi tăng số tiến trình từ 1 đến N.
+
+    python benchmarks/bench_parallel.py input.xlsx [--rows 200000] [--max-workers 8] [--chunk-size 5000]
+
+File đầu vào cần sheet "raw" (cột Address) và sheet "database". Địa chỉ được lặp lại cho đủ --rows dòng.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from process import process_addresses_parallel  # noqa: E402
+from reference import get_reference  # noqa: E402
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("workbook")
+    arg_parser.add_argument("--rows", type=int, default=200000)
+    arg_parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    arg_parser.add_argument("--chunk-size", type=int, default=5000)
+    args = arg_parser.parse_args()
+
+    addresses = pd.read_excel(args.workbook, sheet_name="raw")["Address"].tolist()
+    addresses = (addresses * (args.rows // len(addresses) + 1))[:args.rows]
+    reference = get_reference(pd.read_excel(args.workbook, sheet_name="database"))
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= args.max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != args.max_workers:
+        worker_counts.append(args.max_workers)
+
+    print(f"{len(addresses)} addresses, chunk size {args.chunk_size}")
+    baseline = None
+    for workers in worker_counts:
+        # Mỗi lần chạy tạo pool mới, cache trong tiến trình con bắt đầu rỗng
+        start = time.perf_counter()
+        process_addresses_parallel(addresses, reference, workers, args.chunk_size)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"workers={workers:3d}  {elapsed:8.2f}s  {len(addresses) / elapsed:10.0f} rows/s  "
+              f"speedup {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark toàn bộ quy trình xử lý trên bộ địa chỉ giả lập nhiều kích thước.
+
+    python benchmarks/bench_pipeline.py database.xlsx [--sizes 1000,10000,100000] [--output result.json]
+
+Với mỗi kích thước, địa chỉ được sinh từ sheet database (xem address_generator.py) và ghi ra file Excel tạm,
+sau đó chạy process_addresses với StageRecorder và lấy thời gian từng bước nó ghi lại: đọc file (read),
+biên dịch database (reference), tách địa chỉ (split), chuẩn hóa (normalize), tra mã (code_lookup), cập nhật
+tên chuẩn (name_rewrite), cột Check (check), cùng với generate_excel. Mỗi kích thước chạy trong một tiến
+trình mới với thư mục cache database riêng (ADDRESS_REFERENCE_CACHE_DIR) để đo bộ nhớ đỉnh (peak RSS) riêng
+và không dùng lại cache nào, kể cả bản biên dịch database đã lưu trên đĩa.
+
+Kết quả là JSON (in ra màn hình hoặc ghi vào --output) để so sánh giữa các phiên bản.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from address_generator import generate_addresses, write_workbook  # noqa: E402
+from instrumentation import StageRecorder  # noqa: E402
+from process import process_addresses, generate_excel  # noqa: E402
+
+
+def run_size(database_path, rows, seed, workdir):
+    """
+    Sinh rows địa chỉ và đo process_addresses theo từng bước bằng StageRecorder. Chạy trong tiến trình riêng.
+    """
+    database_df = pd.read_excel(database_path, sheet_name="database")
+    input_path = os.path.join(workdir, f"addresses_{rows}.xlsx")
+    write_workbook(input_path, generate_addresses(database_df, rows, seed), database_df)
+
+    recorder = StageRecorder()
+    start = time.perf_counter()
+    result_df = process_addresses(input_path, workers=1, recorder=recorder)
+    with recorder.stage("generate_excel", len(result_df)):
+        output = generate_excel(result_df)
+    total = time.perf_counter() - start
+
+    return {
+        "rows": rows,
+        "unique_addresses": int(result_df["Address"].nunique()),
+        # Cache tra mã rỗng khi bắt đầu nên mỗi lần miss là một bộ (tỉnh, quận, phường) khác nhau
+        "unique_admin_units": recorder.counters["code_cache.miss"],
+        "missing_codes": int(result_df[["Province Code", "District Code", "Ward Code"]].isnull().any(axis=1).sum()),
+        "output_bytes": len(output.getvalue()),
+        "stages": {stage: {"seconds": round(seconds, 4), "rows_per_second": round(rows / seconds) if seconds else None}
+                   for stage, seconds in recorder.seconds.items()},
+        "counters": dict(sorted(recorder.counters.items())),
+        "total_seconds": round(total, 4),
+        "rows_per_second": round(rows / total) if total else None,
+        # ru_maxrss tính bằng KB trên Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("database", help="file Excel có sheet database")
+    arg_parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="các số dòng cần đo, cách nhau bằng dấu phẩy (ví dụ 1000,10000,100000,1000000)")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", help="ghi kết quả JSON vào file này thay vì in ra màn hình")
+    args = arg_parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in sizes:
+            # Tiến trình con đọc biến môi trường khi import reference, thư mục mới nên database luôn được biên dịch
+            os.environ["ADDRESS_REFERENCE_CACHE_DIR"] = os.path.join(workdir, f"reference_cache_{rows}")
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                result = executor.submit(run_size, args.database, rows, args.seed, workdir).result()
+            print(f"{rows:>9} rows: {result['total_seconds']:8.2f}s, {result['rows_per_second']:>8} rows/s, "
+                  f"peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+            results.append(result)
+
+    report = json.dumps({
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "seed": args.seed,
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
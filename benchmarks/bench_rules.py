@@ -0,0 +1,93 @@
+"""
+So sánh bộ quy tắc tách địa chỉ hiện tại với address_parser.py của một phiên bản khác (ví dụ phiên bản cuối
+cùng còn chạy chuỗi regex lần lượt, trước khi có bộ quy tắc): kết quả phải giống hệt nhau, sau đó đo tốc độ.
+Kết quả của bộ quy tắc so với chuỗi regex cũ còn được kiểm tra trong tests/test_rules.py.
+
+    python benchmarks/bench_rules.py input.xlsx --baseline REVISION [--repeat 5]
+
+Địa chỉ lấy từ sheet "raw" (cột Address), danh sách tỉnh từ sheet "database". Cache tách địa chỉ được tắt
+để đo chi phí tách thực sự. Có địa chỉ nào cho kết quả khác thì in ra và thoát với mã lỗi 1.
+"""
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import address_parser  # noqa: E402
+from instrumentation import StageRecorder  # noqa: E402
+from reference import get_reference  # noqa: E402
+from timing import time_per_call  # noqa: E402
+
+def load_baseline(revision, workdir):
+    """
+    Import address_parser.py của phiên bản revision thành một module riêng.
+    """
+    source = subprocess.run(["git", "show", f"{revision}:address_parser.py"], cwd=BENCHMARK_DIR,
+                            capture_output=True, check=True).stdout
+    path = os.path.join(workdir, "baseline_address_parser.py")
+    with open(path, "wb") as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location("baseline_address_parser", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("workbook")
+    arg_parser.add_argument("--baseline", required=True, help="phiên bản git để so sánh (commit, tag, nhánh)")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    with pd.ExcelFile(args.workbook) as workbook:
+        addresses = [address for address in workbook.parse("raw", usecols=["Address"])["Address"]
+                     if isinstance(address, str)]
+        reference = get_reference(workbook.parse("database"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        baseline = load_baseline(args.baseline, workdir)
+    baseline_name = args.baseline[:12]
+    splitter = address_parser.AddressSplitter(reference.provinces, cache_size=0)
+    baseline_splitter = baseline.AddressSplitter(reference.provinces, cache_size=0)
+
+    mismatches = [address for address in addresses
+                  if splitter.split_address(address) != baseline_splitter.split_address(address)
+                  or address_parser.preprocess_address(address) != baseline.preprocess_address(address)]
+    for address in mismatches[:20]:
+        print(f"  {address!r}:\n    {baseline_name}: {baseline_splitter.split_address(address)}\n"
+              f"    hiện tại: {splitter.split_address(address)}")
+    if mismatches:
+        print(f"{len(mismatches)}/{len(addresses)} địa chỉ cho kết quả khác {baseline_name}")
+        sys.exit(1)
+
+    recorder = StageRecorder()
+    for address in addresses:
+        splitter.split_address(address, recorder)
+    triggered = Counter(group for address in addresses
+                        for group in address_parser.TRIGGER_SCANNER.scan(address))
+
+    print(f"{len(addresses)} addresses, kết quả giống {baseline_name}, best of {args.repeat}")
+    print("nhóm quy tắc được kích hoạt: " + ", ".join(f"{group}={triggered[group]}"
+                                                   for group in address_parser.TRIGGER_KEYWORDS))
+    print("nhánh: " + ", ".join(f"{name[len('split.'):]}={count}"
+                                for name, count in sorted(recorder.counters.items())))
+    for label, current, previous in [("preprocess_address", address_parser.preprocess_address,
+                                      baseline.preprocess_address),
+                                     ("split_address", splitter.split_address, baseline_splitter.split_address)]:
+        current_us = time_per_call(current, addresses, args.repeat)
+        previous_us = time_per_call(previous, addresses, args.repeat)
+        print(f"{label:>18}: {previous_us:8.2f} us/address ({baseline_name}) -> {current_us:8.2f} us/address, "
+              f"{previous_us / current_us:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Microbenchmark: chi phí tách một địa chỉ (preprocess_address, find_province_first và split_address), so với
+cách tách cũ trong baseline_split.py (closure dựng lại mỗi lần gọi process_addresses, mẫu regex dạng chuỗi
+tra qua cache của module re) trong cùng một lần chạy.
+
+    python benchmarks/bench_split.py input.xlsx [--repeat 5]
+
+File đầu vào cần sheet "raw" (cột Address) và sheet "database".
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from address_parser import AddressSplitter, preprocess_address  # noqa: E402
+from baseline_split import make_split_functions  # noqa: E402
+from reference import get_reference  # noqa: E402
+from timing import time_per_call  # noqa: E402
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("workbook")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    addresses = pd.read_excel(args.workbook, sheet_name="raw")["Address"].tolist()
+    reference = get_reference(pd.read_excel(args.workbook, sheet_name="database"))
+    # Tắt cache để đo chi phí tách thực sự
+    splitter = AddressSplitter(reference.provinces, cache_size=0)
+    cached_splitter = AddressSplitter(reference.provinces)
+    old_preprocess, old_find_province, old_split = make_split_functions(reference.provinces)
+
+    preprocessed = [preprocess_address(address) for address in addresses]
+    print(f"{len(addresses)} addresses, best of {args.repeat}")
+    for label, current, previous, values in [
+        ("preprocess_address", preprocess_address, old_preprocess, addresses),
+        ("find_province_first", splitter.find_province_first, old_find_province, preprocessed),
+        ("split_address", splitter.split_address, old_split, addresses),
+    ]:
+        current_us = time_per_call(current, values, args.repeat)
+        previous_us = time_per_call(previous, values, args.repeat)
+        print(f"{label:>20}: {previous_us:8.2f} us/address (cũ) -> {current_us:8.2f} us/address, "
+              f"{previous_us / current_us:5.1f}x")
+    cached_us = time_per_call(cached_splitter.split_address, addresses, args.repeat)
+    print(f"{'split_address cached':>20}: {cached_us:8.2f} us/address "
+          f"(hit rate {cached_splitter.split_cache.hit_rate:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Load test cho API JSON (/api/parse và /api/parse/batch): đo độ trễ p50/p99 và số yêu cầu mỗi giây.
+
+Chạy server bằng Gunicorn trước, ví dụ:
+
+    ADDRESS_DATABASE_PATH=database.xlsx gunicorn app:server -w 4 -b 127.0.0.1:8050
+
+rồi:
+
+    python benchmarks/load_test.py input.xlsx [--url http://127.0.0.1:8050] [--requests 20000] [--concurrency 8]
+                                              [--batch-size 0]
+
+Địa chỉ lấy từ sheet "raw" của file đầu vào. --batch-size 0 gọi /api/parse với từng địa chỉ,
+lớn hơn 0 thì gọi /api/parse/batch với mỗi yêu cầu gồm batch-size địa chỉ.
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def worker(url, bodies, latencies, errors):
+    # Mỗi luồng giữ một kết nối keep-alive riêng
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    for body in bodies:
+        start = time.perf_counter()
+        try:
+            connection.request("POST", parts.path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(repr(e))
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("workbook")
+    arg_parser.add_argument("--url", default="http://127.0.0.1:8050")
+    arg_parser.add_argument("--requests", type=int, default=20000)
+    arg_parser.add_argument("--concurrency", type=int, default=8)
+    arg_parser.add_argument("--batch-size", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    addresses = [address for address in pd.read_excel(args.workbook, sheet_name="raw")["Address"].tolist()
+                 if isinstance(address, str)]
+    if args.batch_size > 0:
+        url = args.url.rstrip("/") + "/api/parse/batch"
+        bodies = [json.dumps({"addresses": [addresses[(i * args.batch_size + j) % len(addresses)]
+                                            for j in range(args.batch_size)]}) for i in range(args.requests)]
+    else:
+        url = args.url.rstrip("/") + "/api/parse"
+        bodies = [json.dumps({"address": addresses[i % len(addresses)]}) for i in range(args.requests)]
+
+    latencies, errors = [], []
+    threads = [threading.Thread(target=worker, args=(url, bodies[i::args.concurrency], latencies, errors))
+               for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        print(f"Không có yêu cầu nào thành công ({len(errors)} lỗi, ví dụ {errors[:1]})")
+        return
+    latencies.sort()
+    print(f"{url}: {len(latencies)} requests ok, {len(errors)} errors, concurrency {args.concurrency}")
+    print(f"p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+          f"mean {statistics.mean(latencies) * 1000:.2f} ms")
+    print(f"{len(latencies) / elapsed:.0f} requests/s"
+          + (f", {len(latencies) * args.batch_size / elapsed:.0f} addresses/s" if args.batch_size > 0 else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Các hàm đo thời gian dùng chung cho các microbenchmark: lấy lần chạy nhanh nhất trong repeat lần.
+"""
+import time
+
+
+def time_per_call(func, values, repeat):
+    """
+    Thời gian gọi func với từng phần tử của values, tính bằng micro giây mỗi phần tử.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            func(value)
+        best = min(best, time.perf_counter() - start)
+    return best / len(values) * 1e6
+
+
+def time_series(func, series, repeat):
+    """
+    Thời gian gọi func một lần với cả series, tính bằng micro giây mỗi phần tử.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(series)
+        best = min(best, time.perf_counter() - start)
+    return best / len(series) * 1e6
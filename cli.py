@@ -0,0 +1,94 @@
+"""
+Xử lý file địa chỉ lớn từ dòng lệnh, không qua giao diện web.
+
+    python cli.py input.xlsx output.xlsx [--database database.xlsx] [--workers 4] [--chunk-size 5000]
+
+Đầu vào và đầu ra có thể là .xlsx, .csv hoặc .parquet (theo phần mở rộng). File đầu vào cần cột Address
+(với Excel là sheet "raw"). Database lấy từ --database, nếu không có thì từ sheet "database" của file
+Excel đầu vào, cuối cùng là database mặc định (ADDRESS_DATABASE_PATH). Tiến độ và tốc độ xử lý in ra stderr.
+
+Với --incremental, kết quả được lưu vào một file SQLite (mặc định ADDRESS_INCREMENTAL_STORE) và lần chạy sau
+chỉ xử lý các địa chỉ mới; đổi database thì toàn bộ được xử lý lại. Chế độ này luôn xử lý tuần tự (--workers
+được bỏ qua, có cảnh báo). Trước khi xử lý, các kết quả lưu quá --incremental-max-age ngày bị xóa khỏi store.
+
+Tách và tra mã dùng chung process_address_list với giao diện web nên kết quả giống hệt.
+"""
+import argparse
+import sys
+import time
+
+from incremental import INCREMENTAL_MAX_AGE_DAYS, INCREMENTAL_STORE_PATH, IncrementalStore
+from instrumentation import NULL_RECORDER, StageRecorder
+from process import DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS, parquet_available
+from streaming import file_format, process_file_streaming
+
+
+def progress_reporter(start, interval=1.0):
+    """
+    Hàm báo tiến độ (done, total) như progress_callback của process_addresses: in số dòng đã xử lý và
+    tốc độ ra stderr, tối đa một lần mỗi interval giây. total là None khi chưa biết tổng số dòng.
+    """
+    last_report = [0.0]
+
+    def report(done, total):
+        now = time.perf_counter()
+        if now - last_report[0] >= interval:
+            last_report[0] = now
+            elapsed = now - start
+            rows = f"{done}/{total}" if total is not None else f"{done}"
+            print(f"\r{rows} rows, {done / elapsed:.0f} rows/s", end="", file=sys.stderr, flush=True)
+
+    return report
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("input", help="file địa chỉ (.xlsx, .csv, .parquet)")
+    arg_parser.add_argument("output", help="file kết quả (.xlsx, .csv, .parquet)")
+    arg_parser.add_argument("--database", help="file Excel có sheet database")
+    arg_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="số tiến trình xử lý song song")
+    arg_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="số địa chỉ mỗi phần")
+    arg_parser.add_argument("--incremental", nargs="?", const=INCREMENTAL_STORE_PATH, metavar="STORE",
+                            help="dùng lại kết quả đã lưu trong file SQLite STORE, chỉ xử lý địa chỉ mới")
+    arg_parser.add_argument("--incremental-max-age", type=float, default=INCREMENTAL_MAX_AGE_DAYS, metavar="DAYS",
+                            help="xóa các kết quả lưu quá DAYS ngày khỏi store (0 để giữ mãi)")
+    arg_parser.add_argument("--quiet", action="store_true", help="không in tiến độ")
+    arg_parser.add_argument("--stats", action="store_true", help="in thời gian từng bước và các bộ đếm khi xong")
+    args = arg_parser.parse_args(argv)
+
+    if "parquet" in (file_format(args.input), file_format(args.output)) and not parquet_available():
+        print("Lỗi: cần cài pyarrow hoặc fastparquet để đọc/ghi file .parquet", file=sys.stderr)
+        return 1
+
+    if args.incremental and args.workers > 1:
+        print(f"Cảnh báo: --incremental chỉ xử lý tuần tự, bỏ qua --workers {args.workers}", file=sys.stderr)
+
+    recorder = StageRecorder() if args.stats else NULL_RECORDER
+    start = time.perf_counter()
+    store = IncrementalStore(args.incremental) if args.incremental else None
+    if store is not None:
+        with recorder.stage("incremental_prune"):
+            store.prune(args.incremental_max_age)
+    try:
+        row_count = process_file_streaming(args.input, args.output, args.database, args.chunk_size, recorder,
+                                           workers=args.workers,
+                                           progress_callback=None if args.quiet else progress_reporter(start),
+                                           store=store)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"\nLỗi: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        print(f"\r{row_count} rows in {elapsed:.1f}s ({row_count / elapsed if elapsed else 0:.0f} rows/s) "
+              f"-> {args.output}", file=sys.stderr)
+    if args.stats:
+        print(recorder.summary(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
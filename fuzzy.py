@@ -0,0 +1,84 @@
+import os
+
+from normalize import remove_accents
+
+# Độ giống tối thiểu (0-1) để nhận một tên gần đúng, đặt lớn hơn 1 để tắt so khớp gần đúng
+FUZZY_THRESHOLD = float(os.environ.get("ADDRESS_FUZZY_THRESHOLD", "0.8"))
+
+# Tên ngắn hơn độ dài này không so khớp gần đúng (dễ nhầm)
+FUZZY_MIN_LENGTH = 4
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Khoảng cách Levenshtein giữa a và b. Dừng sớm và trả về max_distance + 1 khi chắc chắn
+    khoảng cách lớn hơn max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def fuzzy_key(name):
+    """
+    Dạng so sánh của tên: không dấu, chữ thường, bỏ khoảng trắng thừa.
+    """
+    return " ".join(remove_accents(name).lower().split())
+
+
+class FuzzyMatcher:
+    """
+    So khớp gần đúng tên quận/huyện hoặc phường/xã trong phạm vi đơn vị cha đã xác định.
+
+    code_index là chỉ mục {mã cha: {tên: mã con}} của CompiledReference, nên mỗi lần tìm chỉ so với
+    vài chục tên con của một tỉnh hoặc một quận. Tên chứa chữ số (quận 1, phường 10...) không
+    so khớp gần đúng vì sai một ký tự là ra đơn vị khác.
+    """
+
+    def __init__(self, code_index, threshold=FUZZY_THRESHOLD):
+        self.code_index = code_index
+        self.threshold = threshold
+        self._candidates = {}
+
+    def candidates(self, parent_code):
+        candidates = self._candidates.get(parent_code)
+        if candidates is None:
+            candidates = {}
+            for name, code in self.code_index.get(parent_code, {}).items():
+                key = fuzzy_key(name)
+                if len(key) >= FUZZY_MIN_LENGTH and not any(char.isdigit() for char in key):
+                    candidates.setdefault(key, code)
+            candidates = list(candidates.items())
+            self._candidates[parent_code] = candidates
+        return candidates
+
+    def match(self, parent_code, name):
+        """
+        Tìm mã con có tên gần name nhất. Trả về (mã, độ giống) hoặc (None, None) nếu không có tên nào
+        đạt ngưỡng. Khi bằng điểm, tên xuất hiện trước trong database được ưu tiên.
+        """
+        if self.threshold > 1 or not isinstance(name, str):
+            return None, None
+        key = fuzzy_key(name)
+        if len(key) < FUZZY_MIN_LENGTH or any(char.isdigit() for char in key):
+            return None, None
+
+        best_code, best_score = None, None
+        for candidate, code in self.candidates(parent_code):
+            longest = max(len(key), len(candidate))
+            max_distance = int(longest * (1 - self.threshold) + 1e-9)
+            distance = edit_distance(key, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            score = 1 - distance / longest
+            if best_score is None or score > best_score:
+                best_code, best_score = code, score
+        return best_code, best_score
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from fuzzy import FUZZY_THRESHOLD
+from instrumentation import NULL_RECORDER
+from process import RESULT_COLUMNS, REFERENCE_VERSION_COLUMN, compact_result, result_rows
+from reference import REFERENCE_FORMAT_VERSION
+
+# File SQLite lưu kết quả của các lần chạy trước
+INCREMENTAL_STORE_PATH = os.environ.get(
+    "ADDRESS_INCREMENTAL_STORE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".incremental", "results.sqlite"))
+
+# Kết quả lưu quá số ngày này bị xóa khi gọi IncrementalStore.prune (0 để giữ mãi)
+INCREMENTAL_MAX_AGE_DAYS = float(os.environ.get("ADDRESS_INCREMENTAL_MAX_AGE_DAYS", "30"))
+
+# Tăng khi đổi cách tách địa chỉ hoặc tra mã (quy tắc tách, chuẩn hóa, so khớp...) để kết quả đã lưu
+# của phiên bản cũ không còn được dùng lại
+INCREMENTAL_FORMAT_VERSION = 1
+
+# Phiên bản cấu trúc bảng SQLite, khác thì bảng cũ bị xóa và tạo lại
+_SCHEMA_VERSION = 2
+
+# Số tham số tối đa trong một câu truy vấn IN (...)
+_QUERY_BATCH_SIZE = 500
+
+
+def address_key(address):
+    """
+    Khóa của một địa chỉ trong store: hash của đúng chuỗi địa chỉ. Không bỏ khoảng trắng ở hai đầu vì
+    một số quy tắc tiền xử lý neo ở cuối chuỗi (ví dụ "... HCM" với "... HCM ") cho kết quả khác nhau.
+    """
+    return hashlib.blake2b(address.encode("utf-8"), digest_size=16).digest()
+
+
+def store_version(reference):
+    """
+    Version của các kết quả trong store: phiên bản định dạng, các cột kết quả, ngưỡng so khớp gần đúng
+    và version database. Một trong số đó thay đổi thì các địa chỉ được xử lý lại.
+    """
+    settings = json.dumps([INCREMENTAL_FORMAT_VERSION, REFERENCE_FORMAT_VERSION, RESULT_COLUMNS, FUZZY_THRESHOLD])
+    return f"{hashlib.blake2b(settings.encode('utf-8'), digest_size=4).hexdigest()}-{reference.version}"
+
+
+class IncrementalStore:
+    """
+    Lưu kết quả tách và tra mã của từng địa chỉ vào SQLite, theo version database.
+
+    Khi xử lý lại một danh sách, chỉ các địa chỉ chưa có trong store (với version hiện tại, xem
+    store_version) mới được tách và tra mã. Kết quả của các version khác được giữ lại, nên nhiều
+    database dùng chung được một store; kết quả cũ chỉ bị xóa bởi prune.
+    """
+
+    def __init__(self, path=INCREMENTAL_STORE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            if self._connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                self._connection.execute("DROP TABLE IF EXISTS results")
+                self._connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " version TEXT NOT NULL, key BLOB NOT NULL, row TEXT NOT NULL, stored_at REAL NOT NULL,"
+                " PRIMARY KEY (version, key)"
+                ") WITHOUT ROWID")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_stored_at ON results (stored_at)")
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_many(self, version, keys):
+        """
+        Kết quả đã lưu cho các khóa keys, dạng {khóa: list giá trị các cột sau cột Address}.
+        """
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), _QUERY_BATCH_SIZE):
+            batch = keys[start:start + _QUERY_BATCH_SIZE]
+            query = f"SELECT key, row FROM results WHERE version = ? AND key IN ({','.join('?' * len(batch))})"
+            for key, row in self._connection.execute(query, [version, *batch]):
+                found[key] = json.loads(row)
+        return found
+
+    def put_many(self, version, rows):
+        """
+        Lưu các cặp (khóa, list giá trị) cho version.
+        """
+        stored_at = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO results (version, key, row, stored_at) VALUES (?, ?, ?, ?)",
+                ((version, key, json.dumps(row, ensure_ascii=False), stored_at) for key, row in rows))
+
+    def prune(self, max_age_days=INCREMENTAL_MAX_AGE_DAYS):
+        """
+        Xóa các kết quả lưu quá max_age_days ngày (mọi version), trả về số dòng đã xóa.
+        max_age_days là 0 hoặc None thì không xóa gì.
+        """
+        if not max_age_days:
+            return 0
+        with self._connection:
+            cursor = self._connection.execute("DELETE FROM results WHERE stored_at < ?",
+                                              (time.time() - max_age_days * 86400,))
+        return cursor.rowcount
+
+    def process(self, addresses, reference, process_new, recorder=NULL_RECORDER):
+        """
+        Tạo result_df cho addresses: lấy kết quả đã lưu nếu có, các địa chỉ còn lại được xử lý bằng
+        process_new(list địa chỉ) -> result_df rồi lưu vào store.
+        """
+        version = store_version(reference)
+        with recorder.stage("incremental_lookup", len(addresses)):
+            keys = [address_key(address) if isinstance(address, str) else None for address in addresses]
+            stored = self.get_many(version, {key for key in keys if key is not None})
+
+            # Mỗi địa chỉ mới chỉ xử lý một lần, ô trống luôn xử lý lại (không tốn gì)
+            new_positions = {}
+            for position, key in enumerate(keys):
+                if key is None or key not in stored:
+                    new_positions.setdefault(key if key is not None else ("empty", position), position)
+        if recorder.enabled:
+            recorder.count("incremental.hit", sum(key in stored for key in keys if key is not None))
+            recorder.count("incremental.miss", len(new_positions))
+
+        if new_positions:
+            new_df = process_new([addresses[position] for position in new_positions.values()])
+            # Không lưu cột Address và cột version (đã là khóa của store)
+            new_rows = {key: row[1:-1] for key, row in zip(new_positions, result_rows(new_df))}
+            with recorder.stage("incremental_store", len(new_rows)):
+                self.put_many(version, ((key, row) for key, row in new_rows.items()
+                                                  if isinstance(key, bytes)))
+            stored.update(new_rows)
+
+        with recorder.stage("incremental_assemble", len(addresses)):
+            rows = [stored[key if key is not None else ("empty", position)] for position, key in enumerate(keys)]
+            result_df = pd.DataFrame(rows, columns=RESULT_COLUMNS[1:-1], dtype=object)
+            # Cột Address tạo giống process_address_list để cùng kiểu dữ liệu với kết quả xử lý thường
+            result_df.insert(0, "Address", pd.DataFrame(addresses, columns=["Address"])["Address"])
+            result_df[REFERENCE_VERSION_COLUMN] = reference.version
+            result_df = compact_result(result_df)
+        return result_df
+
@@ -0,0 +1,187 @@
+import re
+import unicodedata
+
+import pandas as pd
+import unidecode
+
+# Các biến thể của Bà Rịa - Vũng Tàu
+BRVT_VARIATIONS = (
+    "tỉnh bà rịa - vũng tàu", "tỉnh bà rịa vũng tàu", "tỉnh br - vt",
+    "bà rịa", "vũng tàu", "bà rịa vũng tàu", "bà rịa - vũng tàu", "vùng tàu",
+    "ba ria", "vung tau", "ba ria vung tau", "ba ria - vung tau"
+)
+
+THUA_THIEN_HUE_PATTERN = re.compile(r'th[ưừ][aà]\s*thi[eê]n\s*hu[êếeé]')
+
+# Tiền tố của tên quận/huyện và phường/xã, theo thứ tự ưu tiên
+DISTRICT_PREFIXES = ("quận 0", "quận ", "huyện ", "thị xã ", "tx. ", "tx ", "tp. ", "tp ", "thành phố ")
+WARD_PREFIXES = ("p.", "p. ", "phường ", "xã ", "thị trấn ", "tt. ", "tt ", "khu phố ", "kp ", "ấp ", "thôn ",
+                 "tổ ", "p", "p ")
+
+
+def _vietnamese_fold_table():
+    """
+    Bảng str.translate bỏ dấu tiếng Việt: mọi nguyên âm có dấu (dạng dựng sẵn, cả chữ hoa và chữ thường)
+    về chữ gốc, đ/Đ về d/D, các dấu dạng tổ hợp (combining) bị xóa. Kết quả giống unidecode với các ký tự này.
+    """
+    table = {ord("đ"): "d", ord("Đ"): "D"}
+    for vowel in "aăâeêioôơuưyAĂÂEÊIOÔƠUƯY":
+        base = unicodedata.normalize("NFD", vowel)[0]
+        # Không dấu thanh, huyền, sắc, ngã, hỏi, nặng
+        for tone in ("", "\u0300", "\u0301", "\u0303", "\u0309", "\u0323"):
+            letter = unicodedata.normalize("NFC", vowel + tone)
+            if letter != base:
+                table[ord(letter)] = base
+    # Dấu thanh, dấu mũ, dấu trăng và dấu móc khi văn bản ở dạng tổ hợp (NFD)
+    for mark in ("\u0300", "\u0301", "\u0303", "\u0309", "\u0323", "\u0302", "\u0306", "\u031b"):
+        table[ord(mark)] = None
+    return table
+
+
+VIETNAMESE_FOLD_TABLE = _vietnamese_fold_table()
+
+
+# Hàm bỏ dấu tiếng Việt
+def remove_accents(text):
+    if not isinstance(text, str):
+        return text
+    # Chữ tiếng Việt được bỏ dấu bằng bảng tra, chỉ chuỗi còn ký tự khác (ví dụ dấu ngoặc kép cong)
+    # mới cần đến unidecode
+    folded = text.translate(VIETNAMESE_FOLD_TABLE)
+    return folded if folded.isascii() else unidecode.unidecode(folded)
+
+
+def normalize_baria_vungtau(province):
+    if not province or not isinstance(province, str):
+        return province
+
+    province = province.lower().strip()
+
+    if any(variation in province for variation in BRVT_VARIATIONS) or province in BRVT_VARIATIONS:
+        return "bà rịa - vũng tàu"
+
+    return province
+
+
+def normalize_province(province):
+    if not province or not isinstance(province, str):
+        return province
+
+    # Kiểm tra Bà Rịa - Vũng Tàu
+    brvt_normalized = normalize_baria_vungtau(province)
+    if brvt_normalized != province.lower().strip():
+        return brvt_normalized
+
+    province = province.lower().strip()
+
+    # Chuẩn hóa Thừa Thiên Huế
+    if THUA_THIEN_HUE_PATTERN.search(province):
+        return "thừa thiên - huế"
+
+    # Các chuẩn hóa khác...
+    if province.startswith("tỉnh "):
+        return province[5:].strip()
+    if province.startswith("tp ") or province.startswith("tp. "):
+        return province[3:].strip() if province.startswith("tp ") else province[4:].strip()
+    if province.startswith("thành phố "):
+        return province[10:].strip()
+
+    return province
+
+
+# Chuẩn hóa tên quận/huyện
+def normalize_district(district):
+    if district and isinstance(district, str):
+        # Loại bỏ tiền tố nếu có
+        district = district.lower().strip()
+        for prefix in DISTRICT_PREFIXES:
+            if district.startswith(prefix):
+                return district[len(prefix):].strip()
+        return district
+    return district
+
+
+# Chuẩn hóa tên phường/xã
+def normalize_ward(ward):
+    if ward and isinstance(ward, str):
+        # Loại bỏ tiền tố nếu có
+        ward = ward.lower().strip()
+        for prefix in WARD_PREFIXES:
+            if ward.startswith(prefix):
+                return ward[len(prefix):].strip()
+        return ward
+    return ward
+
+
+# Các hàm chuẩn hóa theo cả cột (Series), cho cùng kết quả với các hàm trên nhưng nhanh hơn nhiều
+# khi cần chuẩn hóa cả sheet database
+def _prefix_pattern(prefixes):
+    # Các nhánh của regex được thử theo thứ tự, giống vòng lặp startswith trong các hàm chuẩn hóa
+    return re.compile("^(?:" + "|".join(re.escape(prefix) for prefix in prefixes) + ")")
+
+
+BRVT_VARIATION_PATTERN = re.compile("|".join(re.escape(variation) for variation in BRVT_VARIATIONS))
+PROVINCE_PREFIX_PATTERN = _prefix_pattern(("tỉnh ", "tp ", "tp. ", "thành phố "))
+DISTRICT_PREFIX_PATTERN = _prefix_pattern(DISTRICT_PREFIXES)
+WARD_PREFIX_PATTERN = _prefix_pattern(WARD_PREFIXES)
+
+
+def _apply_to_strings(series, func):
+    """
+    Áp dụng func (nhận và trả về Series chuỗi) cho các giá trị kiểu str của series,
+    các giá trị khác (NaN, None, số) giữ nguyên như các hàm chuẩn hóa từng giá trị.
+    """
+    if pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        # Trường hợp thường gặp: chỉ có chuỗi và ô trống, không cần kiểm tra từng giá trị
+        is_str = series.notna()
+        if is_str.all():
+            return func(series.astype(object)).astype(object)
+    else:
+        is_str = series.map(lambda value: isinstance(value, str), na_action="ignore").fillna(False).astype(bool)
+    result = series.astype(object)
+    if is_str.any():
+        result[is_str] = func(series[is_str].astype(object)).astype(object)
+    return result
+
+
+def remove_accents_series(series):
+    """
+    remove_accents cho cả một Series: mỗi giá trị khác nhau chỉ bỏ dấu một lần.
+    """
+    def fold(strings):
+        unique = strings.unique()
+        return strings.map(dict(zip(unique, map(remove_accents, unique))))
+    return _apply_to_strings(series, fold)
+
+
+def normalize_province_series(series):
+    """
+    normalize_province cho cả một Series, dùng các phép xử lý chuỗi theo cột.
+    """
+    def normalize(strings):
+        strings = strings.str.lower().str.strip()
+        result = strings.str.replace(PROVINCE_PREFIX_PATTERN, "", regex=True).str.strip()
+        result[strings.str.contains(THUA_THIEN_HUE_PATTERN, regex=True)] = "thừa thiên - huế"
+        result[strings.str.contains(BRVT_VARIATION_PATTERN, regex=True)] = "bà rịa - vũng tàu"
+        return result
+    return _apply_to_strings(series, normalize)
+
+
+def _strip_prefix_series(series, pattern):
+    def normalize(strings):
+        return strings.str.lower().str.strip().str.replace(pattern, "", regex=True).str.strip()
+    return _apply_to_strings(series, normalize)
+
+
+def normalize_district_series(series):
+    """
+    normalize_district cho cả một Series.
+    """
+    return _strip_prefix_series(series, DISTRICT_PREFIX_PATTERN)
+
+
+def normalize_ward_series(series):
+    """
+    normalize_ward cho cả một Series.
+    """
+    return _strip_prefix_series(series, WARD_PREFIX_PATTERN)
@@ -0,0 +1,119 @@
+from collections import namedtuple
+
+import pandas as pd
+
+from instrumentation import NULL_RECORDER
+from process import (get_splitter, get_code_cache, lookup_admin_codes, process_address_list, result_rows,
+                     DEFAULT_CHUNK_SIZE)
+from reference import get_reference, get_default_reference
+
+# Kết quả tách một địa chỉ, các trường theo đúng thứ tự cột của file kết quả
+ParsedAddress = namedtuple("ParsedAddress", [
+    "address", "detail", "ward_code", "ward", "district_code", "district", "province_code", "province",
+    "district_match_score", "ward_match_score", "needs_check",
+])
+
+
+def input_address(address):
+    # Trường address của ParsedAddress: chuỗi đầu vào giữ nguyên, giá trị không phải chuỗi (None, NaN, số...)
+    # là None, giống nhau giữa parse và parse_many
+    return address if isinstance(address, str) else None
+
+
+class AddressParser:
+    """
+    Tách và tra mã địa chỉ theo một database, không cần file Excel.
+
+    Tạo một lần rồi dùng lại: database đã biên dịch, bộ tách địa chỉ và các cache được dùng chung
+    với process_addresses (theo version database), nên chi phí khởi tạo chỉ tốn một lần cho cả tiến trình.
+
+        parser = AddressParser.from_file("database.xlsx")
+        parser.parse("12 Nguyễn Huệ, Phường Bến Nghé, Quận 1, TP HCM").ward_code
+        for result in parser.parse_many(addresses):
+            ...
+    """
+
+    def __init__(self, reference=None):
+        # Không truyền reference thì dùng database mặc định
+        self.reference = reference if reference is not None else get_default_reference()
+        self.splitter = get_splitter(self.reference)
+        self.code_cache = get_code_cache(self.reference)
+
+    @classmethod
+    def from_database(cls, database_df):
+        return cls(get_reference(database_df))
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Tạo parser từ sheet "database" của file Excel.
+        """
+        return cls.from_database(pd.read_excel(path, sheet_name="database"))
+
+    @property
+    def version(self):
+        return self.reference.version
+
+    def parse(self, address, recorder=NULL_RECORDER):
+        """
+        Tách và tra mã một địa chỉ, trả về ParsedAddress. Không tạo DataFrame nên phù hợp để gọi
+        từng địa chỉ một (ví dụ từ một API).
+        """
+        province, district, ward, detail = self.splitter.split_address(address, recorder)
+        key = tuple(value if isinstance(value, str) else None for value in (province, district, ward))
+
+        codes = self.code_cache.get(key)
+        if codes is None:
+            recorder.count("code_cache.miss")
+            codes = lookup_admin_codes(key, self.reference)
+            self.code_cache.put(key, codes)
+        else:
+            recorder.count("code_cache.hit")
+        province_code, district_code, ward_code, district_score, ward_score = codes
+
+        reference = self.reference
+        return ParsedAddress(
+            address=input_address(address),
+            detail=detail,
+            ward_code=ward_code,
+            ward=canonical_name(reference.ward_name_map, ward_code, ward),
+            district_code=district_code,
+            district=canonical_name(reference.district_name_map, district_code, district),
+            province_code=province_code,
+            province=canonical_name(reference.province_name_map, province_code, province),
+            district_match_score=district_score,
+            ward_match_score=ward_score,
+            needs_check=province_code is None or district_code is None or ward_code is None,
+        )
+
+    def parse_many(self, addresses, chunk_size=DEFAULT_CHUNK_SIZE, recorder=NULL_RECORDER):
+        """
+        Tách và tra mã một dãy địa chỉ bất kỳ (list, generator...), trả về từng ParsedAddress theo thứ tự
+        đầu vào. Địa chỉ được xử lý theo lô chunk_size dòng như process_addresses, nên nhanh hơn gọi
+        parse nhiều lần và bộ nhớ không tăng theo độ dài của addresses.
+        """
+        chunk = []
+        for address in addresses:
+            chunk.append(address)
+            if len(chunk) >= chunk_size:
+                yield from self._parse_chunk(chunk, recorder)
+                chunk = []
+        if chunk:
+            yield from self._parse_chunk(chunk, recorder)
+
+    def parse_frame(self, addresses, recorder=NULL_RECORDER):
+        """
+        Tách và tra mã một danh sách địa chỉ, trả về DataFrame giống kết quả của process_addresses.
+        """
+        return process_address_list(list(addresses), self.reference, recorder)
+
+    def _parse_chunk(self, addresses, recorder):
+        result_df = self.parse_frame(addresses, recorder)
+        for address, (_, *values, check, _) in zip(addresses, result_rows(result_df)):
+            yield ParsedAddress(input_address(address), *values, needs_check=bool(check))
+
+
+def canonical_name(name_map, code, name):
+    if code is None:
+        return name if isinstance(name, str) else None
+    return name_map.get(code, name)
@@ -0,0 +1,178 @@
+import math
+import os
+import re
+import sqlite3
+
+from process import result_rows
+
+# Số dòng mỗi trang của bảng xem trước
+PREVIEW_PAGE_SIZE = 20
+
+# Các cột số của result_df, lọc theo giá trị số thay vì theo chuỗi
+NUMERIC_COLUMNS = ("Ward Code", "District Code", "Province Code", "District Match Score", "Ward Match Score")
+
+# Một điều kiện trong filter_query của DataTable, ví dụ {Check} contains "Cần" hoặc {Ward Code} >= 10
+FILTER_PART_PATTERN = re.compile(r"\{(?P<column>[^}]+)\}\s+(?P<operator>\S+(?: blank| nil)?)\s*(?P<value>.*)")
+
+# Bảng kết quả trong file SQLite của bảng xem trước; cột vị trí giữ thứ tự dòng của result_df
+PREVIEW_TABLE = "result"
+POSITION_COLUMN = "_position"
+
+# Toán tử của DataTable -> phép so sánh, bỏ tiền tố s (phân biệt hoa thường) và i (không phân biệt)
+FILTER_OPERATORS = {
+    "=": "eq", "eq": "eq", "!=": "ne", "ne": "ne",
+    "<": "lt", "lt": "lt", "<=": "le", "le": "le", ">": "gt", "gt": "gt", ">=": "ge", "ge": "ge",
+    "contains": "contains", "datestartswith": "startswith", "is blank": "blank", "is nil": "blank",
+}
+
+
+def split_filter_part(part):
+    """
+    Tách một điều kiện của filter_query thành (cột, phép so sánh, phân biệt hoa thường, giá trị).
+    Trả về None nếu không hiểu điều kiện.
+    """
+    match = FILTER_PART_PATTERN.fullmatch(part.strip())
+    if match is None:
+        return None
+    operator = match.group("operator")
+    case_sensitive = True
+    if operator not in FILTER_OPERATORS and operator[:1] in ("s", "i"):
+        case_sensitive = operator[0] == "s"
+        operator = operator[1:]
+    if operator not in FILTER_OPERATORS:
+        return None
+
+    value = match.group("value").strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'`":
+        value = value[1:-1]
+    return match.group("column"), FILTER_OPERATORS[operator], case_sensitive, value
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _lower(value):
+    # lower() của SQLite chỉ đổi chữ ASCII, chữ tiếng Việt cần str.lower
+    return value.lower() if isinstance(value, str) else value
+
+
+def write_preview_database(path, result_df):
+    """
+    Ghi result_df vào file SQLite path để bảng xem trước chỉ đọc trang đang xem. Cột số giữ giá trị số,
+    các cột khác lưu dạng chuỗi; cột Check có chỉ mục cho chế độ chỉ xem dòng cần kiểm tra.
+    """
+    columns = list(result_df.columns)
+    definitions = [f"{POSITION_COLUMN} INTEGER PRIMARY KEY"]
+    definitions += [quote_identifier(column) + ("" if column in NUMERIC_COLUMNS else " TEXT") for column in columns]
+    text_positions = [i for i, column in enumerate(columns) if column not in NUMERIC_COLUMNS]
+
+    def rows():
+        for position, row in enumerate(result_rows(result_df)):
+            for i in text_positions:
+                if row[i] is not None and not isinstance(row[i], str):
+                    row[i] = str(row[i])
+            yield [position, *row]
+
+    # Ghi ra file tạm rồi đổi tên, tiến trình khác không bao giờ đọc phải file đang ghi dở
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        with connection:
+            connection.execute(f"CREATE TABLE {PREVIEW_TABLE} ({', '.join(definitions)})")
+            connection.executemany(f"INSERT INTO {PREVIEW_TABLE} VALUES ({', '.join('?' * (len(columns) + 1))})",
+                                   rows())
+            if "Check" in columns:
+                connection.execute(f'CREATE INDEX result_check ON {PREVIEW_TABLE} ("Check")')
+    finally:
+        connection.close()
+    os.replace(tmp_path, path)
+
+
+def filter_condition(column, operation, case_sensitive, value):
+    """
+    Điều kiện SQL (chuỗi, tham số) cho các dòng có cột column thỏa điều kiện. Giá trị thiếu không thỏa
+    điều kiện nào ngoài "blank".
+    """
+    name = quote_identifier(column)
+    if operation == "blank":
+        return f"({name} IS NULL OR {name} = '')", []
+    if column in NUMERIC_COLUMNS:
+        try:
+            value = float(value)
+        except ValueError:
+            return "0", []
+        if operation == "contains":
+            operation = "eq"
+    else:
+        if not case_sensitive:
+            name, value = f"py_lower({name})", value.lower()
+        if operation == "contains":
+            return f"instr({name}, ?) > 0", [value]
+        if operation == "startswith":
+            return f"substr({name}, 1, length(?)) = ?", [value, value]
+
+    operator = {"eq": "=", "ne": "!=", "lt": "<", "le": "<=", "gt": ">", "ge": ">="}.get(operation)
+    if operator is None:
+        return "0", []
+    return f"{name} {operator} ?", [value]
+
+
+def filter_sql(filter_query, columns):
+    """
+    Điều kiện SQL cho các dòng thỏa filter_query (các điều kiện nối bằng &&). Điều kiện không hiểu
+    hoặc trên cột không có thì bỏ qua.
+    """
+    conditions, params = [], []
+    for part in (filter_query or "").split(" && "):
+        parsed = split_filter_part(part) if part.strip() else None
+        if parsed is None or parsed[0] not in columns:
+            continue
+        condition, condition_params = filter_condition(*parsed)
+        conditions.append(condition)
+        params += condition_params
+    return conditions, params
+
+
+def order_sql(sort_by, columns):
+    """
+    ORDER BY theo sort_by của DataTable ([{"column_id": ..., "direction": "asc"|"desc"}]), giá trị thiếu
+    luôn ở cuối, các dòng bằng nhau giữ thứ tự của result_df.
+    """
+    terms = []
+    for item in sort_by or []:
+        if item.get("column_id") in columns:
+            name = quote_identifier(item["column_id"])
+            terms += [f"{name} IS NULL", name + (" DESC" if item.get("direction") == "desc" else "")]
+    return ", ".join(terms + [POSITION_COLUMN])
+
+
+def preview_page(path, page_current=0, page_size=PREVIEW_PAGE_SIZE, sort_by=None, filter_query=None,
+                 check_only=False):
+    """
+    Một trang của bảng xem trước từ file SQLite do write_preview_database ghi: lọc, sắp xếp và cắt trang
+    đều làm trong SQLite nên chỉ các dòng của trang được đọc. check_only thì chỉ xét các dòng cần kiểm tra.
+    Trả về (list các dòng dạng dict, số trang, số dòng sau khi lọc, tổng số dòng).
+    """
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        connection.create_function("py_lower", 1, _lower, deterministic=True)
+        columns = [row[1] for row in connection.execute(f"PRAGMA table_info({PREVIEW_TABLE})")][1:]
+        conditions, params = filter_sql(filter_query, columns)
+        if check_only:
+            conditions.append('("Check" > \'\' OR "Check" IS NULL)')
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        total = connection.execute(f"SELECT COUNT(*) FROM {PREVIEW_TABLE}").fetchone()[0]
+        matched = connection.execute(f"SELECT COUNT(*) FROM {PREVIEW_TABLE}{where}", params).fetchone()[0]
+        page_size = max(1, page_size or PREVIEW_PAGE_SIZE)
+        page_count = max(1, math.ceil(matched / page_size))
+        rows = connection.execute(
+            f"SELECT {', '.join(map(quote_identifier, columns))} FROM {PREVIEW_TABLE}{where}"
+            f" ORDER BY {order_sql(sort_by, columns)} LIMIT ? OFFSET ?",
+            [*params, page_size, (page_current or 0) * page_size]).fetchall()
+    finally:
+        connection.close()
+    return [dict(zip(columns, row)) for row in rows], page_count, matched, total
@@ -1,554 +1,513 @@
 import pandas as pd
-import unidecode
-import re
+import importlib.util
 import io
-from openpyxl.styles import PatternFill
-
-# Đọc dữ liệu từ file Excel
-def process_addresses(uploaded_file):
-    addresses_df = pd.read_excel(uploaded_file, sheet_name="raw")
-    database_df = pd.read_excel(uploaded_file, sheet_name="database")
-
-
-    # Hàm bỏ dấu tiếng Việt
-    def remove_accents(text):
-        if pd.isna(text) or not isinstance(text, str):
-            return text
-        return unidecode.unidecode(str(text))
-
-
-    def normalize_baria_vungtau(province):
-        if not province or not isinstance(province, str):
-            return province
-
-        province = province.lower().strip()
-
-        # Các biến thể của Bà Rịa - Vũng Tàu
-        brvt_variations = [
-            "tỉnh bà rịa - vũng tàu", "tỉnh bà rịa vũng tàu", "tỉnh br - vt",
-            "bà rịa", "vũng tàu", "bà rịa vũng tàu", "bà rịa - vũng tàu", "vùng tàu",
-            "ba ria", "vung tau", "ba ria vung tau", "ba ria - vung tau"
-        ]
-
-        if any(variation in province for variation in brvt_variations) or province in brvt_variations:
-            return "bà rịa - vũng tàu"
-
-        return province
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from address_parser import AddressSplitter
+from cache import LRUCache
+from fuzzy import FuzzyMatcher
+from instrumentation import NULL_RECORDER, StageRecorder
+from normalize import remove_accents, normalize_province, normalize_district, normalize_ward
+from reference import get_reference, get_default_reference, lookup_code, on_reference_retired, MAX_REFERENCES
+
+# Chế độ song song: số tiến trình (1 là xử lý tuần tự) và số địa chỉ mỗi phần
+DEFAULT_WORKERS = int(os.environ.get("ADDRESS_WORKERS", "1"))
+DEFAULT_CHUNK_SIZE = int(os.environ.get("ADDRESS_CHUNK_SIZE", "5000"))
+
+# Cột ghi version database đã dùng, để biết kết quả được tạo từ database nào khi database được cập nhật
+REFERENCE_VERSION_COLUMN = "Reference Version"
+
+# Các cột của file kết quả, theo thứ tự
+RESULT_COLUMNS = ["Address", "Detail", "Ward Code", "Ward", "District Code", "District", "Province Code",
+                  "Province/City", "District Match Score", "Ward Match Score", "Check", REFERENCE_VERSION_COLUMN]
+
+# Kiểu dữ liệu gọn của result_df: mã là số nguyên nullable (Int64), tên đơn vị hành chính và cột Check
+# chỉ có ít giá trị khác nhau nên lưu dạng category
+CODE_COLUMNS = ["Province Code", "District Code", "Ward Code"]
+SCORE_COLUMNS = ["District Match Score", "Ward Match Score"]
+CATEGORY_COLUMNS = ["Province/City", "District", "Ward", "Check", REFERENCE_VERSION_COLUMN]
+
+# Bộ tách địa chỉ và cache tra mã theo từng database (version), dùng lại giữa các lần tải lên.
+# Giữ tối đa MAX_REFERENCES database, database mặc định cũ bị bỏ ngay khi được nạp lại (forget_reference)
+_splitters = LRUCache(MAX_REFERENCES)
+_code_caches = LRUCache(MAX_REFERENCES)
+_fuzzy_matchers = LRUCache(MAX_REFERENCES)
+
+
+def get_splitter(reference):
+    splitter = _splitters.get(reference.version)
+    if splitter is None:
+        splitter = AddressSplitter(reference.provinces)
+        _splitters.put(reference.version, splitter)
+    return splitter
+
+
+def get_code_cache(reference):
+    code_cache = _code_caches.get(reference.version)
+    if code_cache is None:
+        code_cache = LRUCache()
+        _code_caches.put(reference.version, code_cache)
+    return code_cache
+
+
+def get_fuzzy_matchers(reference):
+    """
+    Bộ so khớp gần đúng (quận/huyện, phường/xã) cho database reference.
+    """
+    matchers = _fuzzy_matchers.get(reference.version)
+    if matchers is None:
+        matchers = (FuzzyMatcher(reference.district_code_index), FuzzyMatcher(reference.ward_code_index))
+        _fuzzy_matchers.put(reference.version, matchers)
+    return matchers
+
+
+def forget_reference(version):
+    """
+    Bỏ bộ tách địa chỉ, cache tra mã và bộ so khớp gần đúng của database version.
+    """
+    for per_version in (_splitters, _code_caches, _fuzzy_matchers):
+        per_version.pop(version)
+
+
+on_reference_retired(forget_reference)
+
+
+def cache_stats():
+    """
+    Thống kê hit/miss của cache tách địa chỉ và cache tra mã, theo version database.
+    """
+    splitters, code_caches = dict(_splitters.items()), dict(_code_caches.items())
+    return {
+        version: {
+            "split": splitters[version].split_cache.stats() if version in splitters else None,
+            "code_lookup": code_caches[version].stats() if version in code_caches else None,
+        }
+        for version in set(splitters) | set(code_caches)
+    }
 
 
-    def find_province_first(address):
-        """
-        Tìm tỉnh/thành phố trong địa chỉ bằng cách so khớp với danh sách tỉnh trong database
-        """
-        if not isinstance(address, str):
-            return None
-
-        # Lấy danh sách tỉnh/thành phố từ database
-        provinces = database_df["Tỉnh/Thành phố"].dropna().unique()
-
-        # Chuẩn hóa địa chỉ để tìm kiếm
-        normalized_address = address.lower()
+# Đọc dữ liệu từ file Excel
+def process_addresses(uploaded_file, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None,
+                      recorder=NULL_RECORDER, store=None):
+    """
+    Xử lý sheet "raw" của file tải lên. Nếu có progress_callback, hàm được gọi với
+    (số địa chỉ đã xử lý, tổng số địa chỉ) sau mỗi phần chunk_size địa chỉ (xem thêm process_file_streaming).
+    Truyền một StageRecorder vào recorder để đo thời gian và đếm theo từng bước.
+    Nếu có store (IncrementalStore), chỉ các địa chỉ chưa có kết quả cho database này mới được xử lý.
+    """
+    with pd.ExcelFile(uploaded_file) as workbook:
+        with recorder.stage("read"):
+            addresses_df = workbook.parse("raw", usecols=["Address"])
+        # File không có sheet database thì dùng database mặc định đã biên dịch sẵn
+        with recorder.stage("reference"):
+            if "database" in workbook.sheet_names:
+                reference = get_reference(workbook.parse("database"))
+            else:
+                reference = get_default_reference()
+
+    addresses = addresses_df["Address"].tolist()
+    if store is not None:
+        return store.process(addresses, reference,
+                             lambda new_addresses: process_address_sequence(new_addresses, reference, workers,
+                                                                            chunk_size, progress_callback, recorder),
+                             recorder)
+    return process_address_sequence(addresses, reference, workers, chunk_size, progress_callback, recorder)
+
+
+def process_address_sequence(addresses, reference, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE,
+                             progress_callback=None, recorder=NULL_RECORDER):
+    """
+    Xử lý danh sách địa chỉ: song song nếu workers > 1 và đủ nhiều địa chỉ, ngược lại tuần tự
+    (theo từng phần chunk_size địa chỉ khi cần báo tiến độ).
+    """
+    if workers > 1 and len(addresses) > chunk_size:
+        return process_addresses_parallel(addresses, reference, workers, chunk_size, progress_callback, recorder)
+    if progress_callback is None or len(addresses) <= chunk_size:
+        result_df = process_address_list(addresses, reference, recorder)
+        if progress_callback is not None:
+            progress_callback(len(addresses), len(addresses))
+        return result_df
+
+    # Xử lý theo từng phần để báo tiến độ
+    result_dfs = []
+    for start in range(0, len(addresses), chunk_size):
+        result_dfs.append(process_address_list(addresses[start:start + chunk_size], reference, recorder))
+        progress_callback(min(start + chunk_size, len(addresses)), len(addresses))
+    return compact_result(pd.concat(result_dfs, ignore_index=True))
+
+
+def process_address_list(addresses, reference, recorder=NULL_RECORDER):
+    """
+    Tách địa chỉ, tra mã và tạo result_df cho một danh sách địa chỉ.
+    """
+    splitter, code_cache = get_splitter(reference), get_code_cache(reference)
 
-        # Đặc biệt xử lý trường hợp "thừa thiên huế"
-        if re.search(r'th[ưừ][aà]\s*thi[eê]n\s*hu[êếeé]', normalized_address):
-            return "Thừa Thiên - Huế"
+    # Tạo DataFrame mới với các cột đã tách
+    with recorder.stage("split", len(addresses)):
+        result_df = pd.DataFrame(addresses, columns=["Address"])
+        split_rows = [splitter.split_address(address, recorder) for address in result_df["Address"]]
+        result_df[["Province/City", "District", "Ward", "Detail"]] = pd.DataFrame(
+            split_rows, index=result_df.index, columns=["Province/City", "District", "Ward", "Detail"], dtype=object)
 
-        # Tìm tỉnh/thành phố trong địa chỉ
-        for province in provinces:
-            if province.lower() in normalized_address:
-                return province
+    # Tìm mã tỉnh/thành phố, quận/huyện, phường/xã và cập nhật tên chuẩn theo lô
+    resolve_admin_codes(result_df, reference, code_cache, recorder)
 
-        # Xử lý các trường hợp đặc biệt của Hồ Chí Minh
-        hcmc_variations = [
-            "tp hcm", "tp.hcm", "tphcm", "tp. hcm", "hcm", "chm", "tpchm",
-            "tp ho chi minh", "tp. ho chi minh", "ho chi minh"
-        ]
+    # Lưu kết quả vào file Excel mới
+    with recorder.stage("check", len(result_df)):
+        result_df['Check'] = (result_df[['Province Code', 'District Code', 'Ward Code']].isnull().any(axis=1)
+                                         .map({True: "Cần kiểm tra", False: ""}))
+    result_df[REFERENCE_VERSION_COLUMN] = reference.version
+    result_df = compact_result(result_df[RESULT_COLUMNS])
 
-        normalized_address_no_accent = remove_accents(normalized_address)
-        for variation in hcmc_variations:
-            if variation in normalized_address_no_accent:
-                return "TP Hồ Chí Minh"
+    return result_df
 
-        return None
 
+def compact_result(result_df):
+    """
+    Đưa các cột của result_df về kiểu gọn: mã Int64, độ giống float, tên đơn vị hành chính và Check
+    dạng category. Gọi lại sau khi ghép nhiều result_df vì pd.concat trả về object khi các phần
+    có danh sách category khác nhau.
+    """
+    result_df = result_df.copy()
+    for column in CODE_COLUMNS:
+        result_df[column] = result_df[column].astype("Int64")
+    for column in SCORE_COLUMNS:
+        result_df[column] = result_df[column].astype("float64")
+    for column in CATEGORY_COLUMNS:
+        result_df[column] = result_df[column].astype("category")
+    return result_df
 
-    def preprocess_address(address):
-        if not isinstance(address, str):
-            return None
-
-        # Handle standalone HCM at the end of address
-        address = re.sub(r'\bHCM\b$', 'Hồ Chí Minh', address, flags=re.IGNORECASE)
-
-        # Handle "TP Something HCM" pattern (like "TP Thủ Đức HCM")
-        address = re.sub(r'(TP|Tp\.|T\.P\.|Thành phố)\s+([^\s,]+(\s+[^\s,]+)*)\s+HCM\b',
-                         r'\1 \2, Hồ Chí Minh', address, flags=re.IGNORECASE)
-
-        # Handle district followed directly by HCM without comma
-        address = re.sub(r'(Bình Chánh|Củ Chi|Hóc Môn|Nhà Bè|Cần Giờ|Thủ Đức)\s+(Hồ Chí Minh|HCM|TPHCM|TP HCM)$',
-                         r'\1, Hồ Chí Minh', address, flags=re.IGNORECASE)
-
-        # Handle numeric ward patterns in HCMC
-        address = re.sub(r'(P\.?\s*(\d+))\s+(Bình Thạnh|Quận \d+|Q\.?\s*\d+)',
-                         r'Phường \2, \3', address, flags=re.IGNORECASE)
-
-        # Handle other common patterns
-        address = re.sub(r'\bTP\.?\s*HCM\b', 'Hồ Chí Minh', address, flags=re.IGNORECASE)
-        address = re.sub(r'\bTPHCM\b', 'Hồ Chí Minh', address, flags=re.IGNORECASE)
-        address = re.sub(r'\bTP\.?\s*Hồ\s*Chí\s*Minh\b', 'Hồ Chí Minh', address, flags=re.IGNORECASE)
-        address = re.sub(r'\bThành\s*[Pp]hố\s*Hồ\s*Chí\s*Minh\b', 'Hồ Chí Minh', address)
-
-        # Chuẩn hóa dấu phẩy
-        address = address.replace(" - ", ", ")
-        address = address.replace("-", ", ")
-
-        # Xử lý khoảng trắng thừa
-        address = re.sub(r'\s+', ' ', address)
-        address = re.sub(r'\s*,\s*', ', ', address)
-
-        # Loại bỏ khoảng trắng ở đầu và cuối
-        address = address.strip()
-
-        return address
-
-
-    # Hàm nhận diện các đơn vị hành chính
-    def identify_admin_units(address):
-        # Các từ khóa để nhận diện tỉnh/thành phố
-        province_keywords = [
-            "TP", "Thành phố", "Tỉnh", "Tp.", "T.P", "Tp", "TPHCM", "Tphcm", "HCM",
-            "Hà Nội", "Hồ Chí Minh", "Đà Nẵng", "Cần Thơ", "Hải Phòng", "Huế"
-        ]
-
-        # Các từ khóa để nhận diện quận/huyện
-        district_keywords = [
-            "Quận", "Huyện", "Thị xã", "TX.", "TX", "Q.", "Q", "H.", "H"
-        ]
-
-        # Các từ khóa để nhận diện phường/xã
-        ward_keywords = [
-            "Phường", "Xã", "Thị trấn", "TT.", "TT", "P.", "P", "X.", "X",
-            "Khu phố", "KP", "Ấp", "Thôn", "Tổ"
-        ]
-
-        province = None
-        district = None
-        ward = None
-        detail = None
-
-        # Tìm kiếm trong địa chỉ
-        words = address.split()
-
-        # Xử lý trường hợp không có dấu phẩy
-        if ", " not in address and len(words) >= 3:
-            # Tìm các từ khóa trong địa chỉ
-            for i, word in enumerate(words):
-                if any(kw in word for kw in province_keywords) and i < len(words) - 1:
-                    province = words[i + 1]
-                elif any(kw in word for kw in district_keywords) and i < len(words) - 1:
-                    district = words[i + 1]
-                elif any(kw in word for kw in ward_keywords) and i < len(words) - 1:
-                    ward = words[i + 1]
-
-        return province, district, ward, detail
-
-
-    # Hàm tách địa chỉ thành 3 cấp
-    def split_address(address):
-        if not isinstance(address, str):
-            return None, None, None, None
-
-        # Tiền xử lý địa chỉ
-        address = preprocess_address(address)
-
-        # Xử lý đặc biệt cho Bà Rịa - Vũng Tàu
-        brvt_pattern = r'(.*?)(?:,\s*)?((?:Thành phố|TP\.?|T\.P\.?|Thị xã|TX\.?|Huyện)\s+([^,]+))(?:,\s*)?(Bà Rịa|Bà Rịa - Vũng Tàu|Vũng Tàu)$'
-        brvt_match = re.search(brvt_pattern, address, re.IGNORECASE)
-
-        if brvt_match and normalize_baria_vungtau(brvt_match.group(4)):
-            detail_and_ward = brvt_match.group(1).strip() if brvt_match.group(1) else None
-            district = brvt_match.group(3).strip()
-            province = "Bà Rịa - Vũng Tàu"
-
-            # Tách ward từ detail nếu có
-            if detail_and_ward:
-                ward_pattern = r'(.*?)(?:,\s*)?([^,]+)$'
-                ward_match = re.search(ward_pattern, detail_and_ward)
-                if ward_match:
-                    detail = ward_match.group(1).strip() if ward_match.group(1) else None
-                    ward = ward_match.group(2).strip()
-                    return province, district, ward, detail
-                else:
-                    return province, district, detail_and_ward, None
-            else:
-                return province, district, None, None
-
-        # Xử lý trường hợp đặc biệt "thành phố Vũng Tàu, tỉnh Bà Rịa - Vũng Tàu"
-        vungtau_pattern = r'(.*?)(?:,\s*)?(?:thành phố|tp\.?)\s+vũng\s+tàu(?:,\s*)?(?:tỉnh)?\s+bà\s+rịa(?:\s*-\s*vũng\s+tàu)?'
-        vungtau_match = re.search(vungtau_pattern, address.lower())
-
-        if vungtau_match:
-            detail_and_ward = vungtau_match.group(1).strip() if vungtau_match.group(1) else None
-            district = "Vũng Tàu"
-            province = "Bà Rịa - Vũng Tàu"
-
-            # Tách ward từ detail nếu có
-            if detail_and_ward and "," in detail_and_ward:
-                parts = detail_and_ward.split(",")
-                ward = parts[-1].strip()
-                detail = ", ".join(parts[:-1]).strip()
-                return province, district, ward, detail
-            else:
-                return province, district, detail_and_ward, None
-
-        # Xử lý các trường hợp đặc biệt khi địa chỉ chứa "Bà Rịa" hoặc "Vũng Tàu" nhưng không theo mẫu trên
-        if re.search(r'bà\s*rịa|vũng\s*tàu', address.lower()):
-            parts = address.split(", ")
-
-            # Xác định province trước
-            province = "Bà Rịa - Vũng Tàu"
-
-            # Tìm district trong các phần còn lại
-            district = None
-            ward = None
-            detail = None
-
-            # Danh sách các district của Bà Rịa - Vũng Tàu
-            brvt_districts = ["bà rịa", "vũng tàu", "châu đức", "đất đỏ", "long điền", "côn đảo", "xuyên mộc", "phú mỹ"]
-
-            # Tìm district trong các phần
-            for i, part in enumerate(parts):
-                part_lower = part.lower()
-                if any(district_name in part_lower for district_name in brvt_districts):
-                    # Tránh nhầm lẫn "Bà Rịa" và "Vũng Tàu" là district khi chúng là một phần của tên tỉnh
-                    if "bà rịa" in part_lower and "vũng tàu" in address.lower():
-                        continue
-                    if "vũng tàu" in part_lower and "bà rịa" in address.lower():
-                        continue
-
-                    district = part
-
-                    # Ward có thể là phần trước district
-                    if i > 0:
-                        ward = parts[i - 1]
-
-                    # Detail là các phần còn lại
-                    if i > 1:
-                        detail = ", ".join(parts[:i - 1])
-
-                    break
-
-            if district:
-                return province, district, ward, detail
-
-        # Tìm tỉnh/thành phố trước
-        province = find_province_first(address)
-
-        # Nếu tìm thấy tỉnh/thành phố, tiếp tục tách các thành phần khác
-        if province:
-            # Thử tách theo dấu phẩy
-            parts = address.split(", ")
-
-            # Xử lý các trường hợp có nhiều hơn 3 phần
-            if len(parts) > 3:
-                ward = parts[-3]
-                district = parts[-2]
-                detail = ", ".join(parts[:-3]).rstrip()  # Join all remaining parts as detail
-                return province, district, ward, detail
-
-            # Xử lý các trường hợp có đủ 3 phần
-            elif len(parts) == 3:
-                ward = parts[0]
-                district = parts[1]
-                return province, district, ward, None  # No detail
-
-            # Xử lý các trường hợp chỉ có 2 phần
-            elif len(parts) == 2:
-                district = parts[0]
-                return province, district, None, None  # No ward, no detail
-
-            # Trường hợp không có dấu phẩy hoặc chỉ có 1 phần
-            else:
-                # Thử nhận diện các đơn vị hành chính
-                _, district, ward, detail = identify_admin_units(address)
-                return province, district, ward, detail
-
-        # Thử tách theo dấu phẩy
-        parts = address.split(", ")
-
-        # Xử lý các trường hợp có nhiều hơn 3 phần
-        if len(parts) > 3:
-            ward = parts[-3]
-            district = parts[-2]
-            province = parts[-1]
-            detail = ", ".join(parts[:-3]).rstrip()  # Join all remaining parts as detail
-            return province, district, ward, detail
-
-        # Xử lý các trường hợp có đủ 3 phần
-        elif len(parts) == 3:
-            ward = parts[0]
-            district = parts[1]
-            province = parts[2]
-            return province, district, ward, None  # No detail
-
-        # Xử lý các trường hợp chỉ có 2 phần
-        elif len(parts) == 2:
-            district = parts[0]
-            province = parts[1]
-            return province, district, None, None  # No ward, no detail
-
-        # Trường hợp không có dấu phẩy hoặc chỉ có 1 phần
-        else:
-            # Thử nhận diện các đơn vị hành chính
-            province, district, ward, detail = identify_admin_units(address)
-
-            # Nếu không nhận diện được, xử lý theo không gian
-            if not any([province, district, ward]):
-                words = address.split()
-                if len(words) >= 3:
-                    # Giả định 3 từ cuối lần lượt là phường/xã, quận/huyện, tỉnh/thành phố
-                    ward = ' '.join(words[:-2])
-                    district = words[-2]
-                    province = words[-1]
-                    return province, district, ward, None
-                elif len(words) == 2:
-                    district = words[0]
-                    province = words[1]
-                    return province, district, None, None
-
-            return address, None, None, None  # Trả về toàn bộ địa chỉ nếu không thể phân tích
-
-
-    def normalize_province(province):
-        if not province or not isinstance(province, str):
-            return province
-
-        # Kiểm tra Bà Rịa - Vũng Tàu
-        brvt_normalized = normalize_baria_vungtau(province)
-        if brvt_normalized != province.lower().strip():
-            return brvt_normalized
-
-        province = province.lower().strip()
-
-        # Chuẩn hóa Thừa Thiên Huế
-        if re.search(r'th[ưừ][aà]\s*thi[eê]n\s*hu[êếeé]', province):
-            return "thừa thiên - huế"
-
-        # Các chuẩn hóa khác...
-        if province.startswith("tỉnh "):
-            return province[5:].strip()
-        if province.startswith("tp ") or province.startswith("tp. "):
-            return province[3:].strip() if province.startswith("tp ") else province[4:].strip()
-        if province.startswith("thành phố "):
-            return province[10:].strip()
-
-        return province
-
-
-    # Chuẩn hóa tên quận/huyện
-    def normalize_district(district):
-        if district and isinstance(district, str):
-            # Loại bỏ tiền tố nếu có
-            district = district.lower().strip()
-            prefixes = ["quận 0", "quận ", "huyện ", "thị xã ", "tx. ", "tx ", "tp. ", "tp ", "thành phố "]
-            for prefix in prefixes:
-                if district.startswith(prefix):
-                    return district[len(prefix):].strip()
-            return district
-        return district
-
-
-    # Chuẩn hóa tên phường/xã
-    def normalize_ward(ward):
-        if ward and isinstance(ward, str):
-            # Loại bỏ tiền tố nếu có
-            ward = ward.lower().strip()
-            prefixes = ["p.", "p. ", "phường ", "xã ", "thị trấn ", "tt. ", "tt ", "khu phố ", "kp ", "ấp ", "thôn ",
-                        "tổ ", "p", "p "]
-            for prefix in prefixes:
-                if ward.startswith(prefix):
-                    return ward[len(prefix):].strip()
-            return ward
-        return ward
 
-    # Tạo DataFrame mới với các cột đã tách
-    result_df = pd.DataFrame(addresses_df["Address"].tolist(), columns=["Address"])
-    result_df[["Province/City", "District", "Ward", "Detail"]] = result_df["Address"].apply(
-        lambda x: pd.Series(split_address(x))
-    )
+# Database dùng trong tiến trình con của chế độ song song, gán một lần bởi _init_worker
+_worker_reference = None
+
+
+def _init_worker(reference):
+    global _worker_reference
+    _worker_reference = reference
+
+
+def _process_chunk(addresses, record=False):
+    # Tiến trình con không dùng chung recorder với tiến trình chính, số liệu được gửi về dạng dict
+    if not record:
+        return process_address_list(addresses, _worker_reference), None
+    recorder = StageRecorder()
+    return process_address_list(addresses, _worker_reference, recorder), recorder.as_dict()
+
+
+def process_addresses_parallel(addresses, reference, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE,
+                               progress_callback=None, recorder=NULL_RECORDER):
+    """
+    Chia danh sách địa chỉ thành các phần chunk_size dòng và xử lý trên nhiều tiến trình.
+
+    Database đã biên dịch được gửi tới mỗi tiến trình một lần qua initializer. Kết quả được ghép
+    lại theo đúng thứ tự đầu vào. Thời gian từng bước trong recorder là tổng của các tiến trình con,
+    thời gian thực của cả phần song song nằm ở bước "parallel".
+    """
+    chunks = (addresses[start:start + chunk_size] for start in range(0, len(addresses), chunk_size))
+    result_dfs = []
+    done = 0
+    with recorder.stage("parallel", len(addresses)):
+        for result_df in process_chunks_parallel(chunks, reference, workers, recorder):
+            result_dfs.append(result_df)
+            done += len(result_df)
+            if progress_callback is not None:
+                progress_callback(done, len(addresses))
+    return compact_result(pd.concat(result_dfs, ignore_index=True))
+
+
+def process_chunks_parallel(chunks, reference, workers=DEFAULT_WORKERS, recorder=NULL_RECORDER):
+    """
+    Xử lý các phần địa chỉ (iterable các list) trên workers tiến trình, trả về result_df của từng phần
+    theo đúng thứ tự. Chỉ đọc trước tối đa 2 * workers phần nên dùng được với nguồn dữ liệu đọc dần.
+    """
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(reference,)) as executor:
+        for addresses in chunks:
+            pending.append(executor.submit(_process_chunk, addresses, recorder.enabled))
+            if len(pending) >= 2 * workers:
+                yield _chunk_result(pending.popleft(), recorder)
+        while pending:
+            yield _chunk_result(pending.popleft(), recorder)
+
+
+def _chunk_result(future, recorder):
+    result_df, recorded = future.result()
+    if recorded is not None:
+        recorder.merge(recorded)
+    return result_df
 
 
+def merge_codes(parent_codes, names, names_no_accent, lookup_df):
+    """
+    Tra mã theo lô bằng hai lần merge: lần đầu theo tên chuẩn hóa, lần sau theo tên không dấu
+    cho các dòng chưa tìm thấy.
+    """
+    parent_col, name_col, code_col = lookup_df.columns
+
+    def merge_on(parents, keys):
+        left = pd.DataFrame({parent_col: parents.array, name_col: keys.array})
+        merged = left.merge(lookup_df, how="left", on=[parent_col, name_col])
+        return pd.Series(merged[code_col].array, index=parents.index)
+
+    codes = merge_on(parent_codes, names)
+    missing = codes.isna() & parent_codes.notna() & names_no_accent.notna()
+    if missing.any():
+        codes[missing] = merge_on(parent_codes[missing], names_no_accent[missing])
+    return codes
+
+
+def fuzzy_fill(codes, parent_codes, names, matcher):
+    """
+    Tra gần đúng các dòng có mã cha và tên nhưng chưa tìm được mã, ghi mã tìm được vào codes.
+    Trả về Series độ giống: 1.0 với dòng khớp chính xác, điểm so khớp với dòng khớp gần đúng,
+    None nếu không tìm được mã.
+    """
+    found = codes.notna()
+    scores = pd.Series([1.0 if is_found else None for is_found in found], index=codes.index, dtype="float64")
+    missing = ~found & parent_codes.notna() & names.notna()
+    if not missing.any():
+        return scores
+    for idx in missing[missing].index:
+        code, score = matcher.match(parent_codes[idx], names[idx])
+        if code is not None:
+            codes[idx] = code
+            scores[idx] = round(score, 3)
+    return scores
+
+
+def normalize_admin_units(units_df):
+    """
+    Thêm các cột tên chuẩn hóa và không dấu cho các cột Province/City, District, Ward.
+    """
     # Áp dụng hàm chuẩn hóa
-    result_df["Normalized Province"] = result_df["Province/City"].apply(normalize_province)
-    result_df["Normalized District"] = result_df["District"].apply(normalize_district)
-    result_df["Normalized Ward"] = result_df["Ward"].apply(normalize_ward)
+    units_df["Normalized Province"] = units_df["Province/City"].apply(normalize_province)
+    units_df["Normalized District"] = units_df["District"].apply(normalize_district)
+    units_df["Normalized Ward"] = units_df["Ward"].apply(normalize_ward)
 
     # Tạo phiên bản không dấu
-    result_df["Province No Accent"] = result_df["Normalized Province"].apply(remove_accents)
-    result_df["District No Accent"] = result_df["Normalized District"].apply(remove_accents)
-    result_df["Ward No Accent"] = result_df["Normalized Ward"].apply(remove_accents)
-
-    # Tạo các cột mã số
-    result_df["Province Code"] = None
-    result_df["District Code"] = None
-    result_df["Ward Code"] = None
-
-    # Chuẩn bị database để tìm kiếm
-    # Tạo các cột chuẩn hóa và không dấu trong database
-    database_df["Normalized Province"] = database_df["Tỉnh/Thành phố"].apply(normalize_province)
-    database_df["Normalized District"] = database_df["Quận/Huyện"].apply(normalize_district)
-    database_df["Normalized Ward"] = database_df["Phường/Xã"].apply(normalize_ward)
-    database_df["Province No Accent"] = database_df["Normalized Province"].apply(remove_accents)
-    database_df["District No Accent"] = database_df["Normalized District"].apply(remove_accents)
-    database_df["Ward No Accent"] = database_df["Normalized Ward"].apply(remove_accents)
-
-    # Tạo từ điển ánh xạ tên tỉnh -> mã tỉnh
-    province_code_map = {}
-    for _, row in database_df.dropna(subset=["Tỉnh/Thành phố", "Mã Tỉnh/Thành phố"]).iterrows():
-        province_name = row["Normalized Province"]
-        province_no_accent = row["Province No Accent"]
-        province_code = row["Mã Tỉnh/Thành phố"]
-        if pd.notna(province_name) and pd.notna(province_code):
-            if province_name not in province_code_map:
-                province_code_map[province_name] = province_code
-            if province_no_accent not in province_code_map:
-                province_code_map[province_no_accent] = province_code
-
-    # Tìm mã tỉnh/thành phố, quận/huyện, phường/xã
-    for index, row in result_df.iterrows():
-        # Tìm mã tỉnh/thành phố
-        province_name = row["Normalized Province"]
-        province_no_accent = row["Province No Accent"]
-        if province_name in province_code_map:
-            province_code = province_code_map[province_name]
-        elif province_no_accent in province_code_map:
-            province_code = province_code_map[province_no_accent]
+    units_df["Province No Accent"] = units_df["Normalized Province"].apply(remove_accents)
+    units_df["District No Accent"] = units_df["Normalized District"].apply(remove_accents)
+    units_df["Ward No Accent"] = units_df["Normalized Ward"].apply(remove_accents)
+    return units_df
+
+
+def merge_admin_codes(units_df, reference):
+    """
+    Tìm mã tỉnh/quận/phường cho các dòng của units_df (đã chuẩn hóa) bằng join theo lô, tên quận/huyện
+    và phường/xã không khớp chính xác thì so khớp gần đúng trong phạm vi đơn vị cha.
+    Trả về ba Series mã kiểu Int64 (giá trị thiếu là NA) và hai Series độ giống của quận/huyện, phường/xã.
+    """
+    province_code_map = reference.province_code_map
+    district_matcher, ward_matcher = get_fuzzy_matchers(reference)
+
+    # Mã tỉnh/thành phố: ưu tiên tên chuẩn hóa, sau đó đến tên không dấu
+    province_codes = pd.Series(
+        pd.array([province_code_map.get(name, province_code_map.get(name_no_accent))
+                  for name, name_no_accent in zip(units_df["Normalized Province"], units_df["Province No Accent"])],
+                 dtype="Int64"),
+        index=units_df.index)
+
+    # Mã quận/huyện theo mã tỉnh
+    district_names = units_df["Normalized District"].astype(object)
+    district_parent = province_codes.where(district_names.notna())
+    district_codes = merge_codes(district_parent, district_names,
+                                 units_df["District No Accent"].astype(object), reference.district_lookup)
+    district_scores = fuzzy_fill(district_codes, district_parent, district_names, district_matcher)
+
+    # Mã phường/xã theo mã quận/huyện
+    ward_names = units_df["Normalized Ward"].astype(object)
+    ward_parent = district_codes.where(ward_names.notna())
+    ward_codes = merge_codes(ward_parent, ward_names, units_df["Ward No Accent"].astype(object),
+                             reference.ward_lookup)
+    ward_scores = fuzzy_fill(ward_codes, ward_parent, ward_names, ward_matcher)
+
+    return province_codes, district_codes, ward_codes, district_scores, ward_scores
+
+
+def lookup_admin_codes(key, reference):
+    """
+    Tra mã cho một bộ (tỉnh, quận, phường) đã tách, cùng kết quả với normalize_admin_units và
+    merge_admin_codes nhưng dùng thẳng các từ điển, nhanh hơn khi chỉ có một địa chỉ.
+    Trả về (mã tỉnh, mã quận/huyện, mã phường/xã, độ giống quận/huyện, độ giống phường/xã).
+    """
+    province, district, ward = key
+    district_matcher, ward_matcher = get_fuzzy_matchers(reference)
+
+    province_name = normalize_province(province)
+    province_code_map = reference.province_code_map
+    province_code = province_code_map.get(province_name, province_code_map.get(remove_accents(province_name)))
+
+    def lookup(code_index, matcher, parent_code, name):
+        if parent_code is None or pd.isna(parent_code) or not isinstance(name, str):
+            return None, None
+        code = lookup_code(code_index, parent_code, name, remove_accents(name))
+        if code is not None:
+            return code, 1.0
+        code, score = matcher.match(parent_code, name)
+        return code, (round(score, 3) if code is not None else None)
+
+    district_code, district_score = lookup(reference.district_code_index, district_matcher, province_code,
+                                           normalize_district(district))
+    ward_code, ward_score = lookup(reference.ward_code_index, ward_matcher, district_code, normalize_ward(ward))
+    return province_code, district_code, ward_code, district_score, ward_score
+
+
+def resolve_admin_codes(result_df, reference, code_cache=None, recorder=NULL_RECORDER):
+    """
+    Tìm mã tỉnh/quận/phường cho toàn bộ result_df, sau đó ghi đè tên tỉnh/quận/phường bằng tên chuẩn
+    trong database. Ghi trực tiếp vào result_df.
+
+    Mỗi bộ (tỉnh, quận, phường) chỉ được tra một lần. Nếu có code_cache (LRUCache), các bộ đã tra ở
+    lần trước được lấy từ cache, phần còn lại được chuẩn hóa và join theo lô.
+    """
+    unit_columns = ["Province/City", "District", "Ward"]
+    keys = [tuple(value if isinstance(value, str) else None for value in key)
+            for key in zip(*(result_df[col] for col in unit_columns))]
+
+    resolved = {}
+    unresolved = []
+    for key in dict.fromkeys(keys):
+        codes = code_cache.get(key) if code_cache is not None else None
+        if codes is None:
+            unresolved.append(key)
         else:
-            continue
-
-        result_df.at[index, "Province Code"] = province_code
-
-        # Tìm mã quận/huyện dựa trên mã tỉnh
-        if pd.notna(province_code):
-            province_code_str = str(int(province_code))  # Chuyển về dạng số nguyên rồi thành chuỗi để loại bỏ .0
-            district_name = row["Normalized District"]
-            district_no_accent = row["District No Accent"]
-            if pd.isna(district_name):
-                continue
-
-            # Tìm tất cả quận/huyện có mã bắt đầu bằng mã tỉnh
-            district_pattern = f"^{province_code_str}"
-            matching_districts = database_df[database_df["Mã Quận/Huyện"].astype(str).str.match(district_pattern)]
-            district_code = None
-
-            # Tìm quận/huyện phù hợp
-            for _, district_row in matching_districts.iterrows():
-                db_district_name = district_row["Normalized District"]
-                db_district_no_accent = district_row["District No Accent"]
-                if (pd.notna(db_district_name) and db_district_name == district_name) or \
-                        (pd.notna(db_district_no_accent) and db_district_no_accent == district_no_accent):
-                    district_code = district_row["Mã Quận/Huyện"]
-                    result_df.at[index, "District Code"] = district_code
-                    break
-
-            # Tìm mã phường/xã dựa trên mã quận/huyện
-            if pd.notna(district_code) and pd.notna(row["Normalized Ward"]):
-                district_code_str = str(int(district_code))
-                ward_name = row["Normalized Ward"]
-                ward_no_accent = row["Ward No Accent"]
-
-                # Tìm tất cả phường/xã có mã bắt đầu bằng mã quận/huyện
-                ward_pattern = f"^{district_code_str}"
-                matching_wards = database_df[database_df["Mã Phường/Xã"].astype(str).str.match(ward_pattern)]
-
-                # Tìm phường/xã phù hợp
-                for _, ward_row in matching_wards.iterrows():
-                    db_ward_name = ward_row["Normalized Ward"]
-                    db_ward_no_accent = ward_row["Ward No Accent"]
-                    if (pd.notna(db_ward_name) and db_ward_name == ward_name) or \
-                            (pd.notna(db_ward_no_accent) and db_ward_no_accent == ward_no_accent):
-                        ward_code = ward_row["Mã Phường/Xã"]
-                        result_df.at[index, "Ward Code"] = ward_code
-                        break
-
-    # Thêm sau phần tìm mã Ward Code
-
-    # Tạo từ điển ánh xạ mã -> tên chuẩn
-    province_name_map = {}
-    district_name_map = {}
-    ward_name_map = {}
-
-    # Tạo mapping từ mã code đến tên chuẩn
-    for _, row in database_df.dropna(subset=["Mã Tỉnh/Thành phố", "Tỉnh/Thành phố"]).iterrows():
-        province_code = row["Mã Tỉnh/Thành phố"]
-        province_name = row["Tỉnh/Thành phố"]
-        if pd.notna(province_code) and pd.notna(province_name):
-            province_name_map[str(int(province_code))] = province_name
-
-    for _, row in database_df.dropna(subset=["Mã Quận/Huyện", "Quận/Huyện"]).iterrows():
-        district_code = row["Mã Quận/Huyện"]
-        district_name = row["Quận/Huyện"]
-        if pd.notna(district_code) and pd.notna(district_name):
-            district_name_map[str(int(district_code))] = district_name
-
-    for _, row in database_df.dropna(subset=["Mã Phường/Xã", "Phường/Xã"]).iterrows():
-        ward_code = row["Mã Phường/Xã"]
-        ward_name = row["Phường/Xã"]
-        if pd.notna(ward_code) and pd.notna(ward_name):
-            ward_name_map[str(int(ward_code))] = ward_name
-
-    # Cập nhật tên chuẩn dựa trên mã code
-    for index, row in result_df.iterrows():
-        # Cập nhật tên tỉnh/thành phố
-        if pd.notna(row["Province Code"]):
-            province_code_str = str(int(row["Province Code"]))
-            if province_code_str in province_name_map:
-                result_df.at[index, "Province/City"] = province_name_map[province_code_str]
-
-        # Cập nhật tên quận/huyện
-        if pd.notna(row["District Code"]):
-            district_code_str = str(int(row["District Code"]))
-            if district_code_str in district_name_map:
-                result_df.at[index, "District"] = district_name_map[district_code_str]
-
-        # Cập nhật tên phường/xã
-        if pd.notna(row["Ward Code"]):
-            ward_code_str = str(int(row["Ward Code"]))
-            if ward_code_str in ward_name_map:
-                result_df.at[index, "Ward"] = ward_name_map[ward_code_str]
+            resolved[key] = codes
+    recorder.count("code_cache.hit", len(resolved))
+    recorder.count("code_cache.miss", len(unresolved))
+
+    if unresolved:
+        with recorder.stage("normalize", len(unresolved)):
+            units_df = normalize_admin_units(pd.DataFrame(unresolved, columns=unit_columns, dtype=object))
+        with recorder.stage("code_lookup", len(unresolved)):
+            for key, codes in zip(unresolved, zip(*merge_admin_codes(units_df, reference))):
+                codes = tuple(python_value(code) for code in codes)
+                resolved[key] = codes
+                if code_cache is not None:
+                    code_cache.put(key, codes)
+        if recorder.enabled:
+            recorder.count("fuzzy.district", sum(resolved[key][3] not in (None, 1.0) for key in unresolved))
+            recorder.count("fuzzy.ward", sum(resolved[key][4] not in (None, 1.0) for key in unresolved))
+
+    # Ghi các cột mã (Int64) và độ giống (float), giá trị thiếu là NA/NaN
+    row_codes = [resolved[key] for key in keys]
+    for i, (column, dtype) in enumerate([("Province Code", "Int64"), ("District Code", "Int64"),
+                                         ("Ward Code", "Int64"), ("District Match Score", "float64"),
+                                         ("Ward Match Score", "float64")]):
+        result_df[column] = pd.Series(pd.array([codes[i] for codes in row_codes], dtype=dtype),
+                                      index=result_df.index)
+
+    with recorder.stage("name_rewrite", len(result_df)):
+        rewrite_admin_names(result_df, reference)
+
+
+def rewrite_admin_names(result_df, reference):
+    """
+    Cập nhật tên chuẩn dựa trên mã code, dòng không có mã giữ nguyên tên đã tách.
+    """
+    for code_col, name_col, name_map in [("Province Code", "Province/City", reference.province_name_map),
+                                         ("District Code", "District", reference.district_name_map),
+                                         ("Ward Code", "Ward", reference.ward_name_map)]:
+        canonical_names = result_df[code_col].map(name_map)
+        result_df[name_col] = canonical_names.where(canonical_names.notna(), result_df[name_col])
+
+
+def highlight_missing_codes(worksheet, columns, last_row):
+    """
+    Tô vàng các ô mã bị trống bằng một quy tắc conditional formatting cho mỗi cột mã,
+    dùng được cho cả worksheet write-only.
+    """
+    if last_row < 2:
+        return
+    yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+    for column in ["Ward Code", "District Code", "Province Code"]:
+        letter = get_column_letter(columns.index(column) + 1)
+        worksheet.conditional_formatting.add(f"{letter}2:{letter}{last_row}",
+                                             FormulaRule(formula=[f"ISBLANK({letter}2)"], fill=yellow_fill))
+
+
+def excel_header(worksheet, columns):
+    """
+    Dòng tiêu đề in đậm cho worksheet write-only.
+    """
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, value=column)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    return header
+
+
+def python_value(value):
+    """
+    Giá trị thiếu (None/NaN/NA) thành None, số kiểu numpy (ví dụ mã trong cột Int64) thành int/float.
+    """
+    if isinstance(value, str):
+        return value
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
 
-    # Lưu kết quả vào file Excel mới
-    result_df['Check'] = (result_df[['Province Code', 'District Code', 'Ward Code']].isnull().any(axis=1)
-                                     .map({True: "Cần kiểm tra", False: ""}))
-    result_df = result_df[["Address", "Detail", "Ward Code", "Ward", "District Code", "District", "Province Code",
-                           "Province/City", "Check"]]
 
-    return result_df
+def result_rows(result_df):
+    """
+    Các dòng của result_df dạng list giá trị Python, giá trị thiếu thành None (ô trống).
+    """
+    for row in result_df.itertuples(index=False, name=None):
+        yield [python_value(value) for value in row]
 
 
 def generate_excel(result_df):
     # Tạo BytesIO object để lưu file Excel trong bộ nhớ
     output = io.BytesIO()
 
-    # Sử dụng ExcelWriter với engine là openpyxl
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        result_df.to_excel(writer, index=False, sheet_name="Processed Data")
+    # Workbook write-only: ghi tuần tự từng dòng, không giữ đối tượng ô trong bộ nhớ
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Processed Data")
+    columns = list(result_df.columns)
+    worksheet.append(excel_header(worksheet, columns))
+    for row in result_rows(result_df):
+        worksheet.append(row)
+
+    # Tô màu các ô trống trong cột mã
+    highlight_missing_codes(worksheet, columns, len(result_df) + 1)
+    workbook.save(output)
+
+    # Đặt con trỏ về đầu file
+    output.seek(0)
+    return output
 
-        # Lấy workbook và worksheet
-        workbook = writer.book
-        worksheet = writer.sheets["Processed Data"]
 
-        # Áp dụng định dạng
-        yellow_fill = PatternFill(start_color="FFFF00", fill_type="solid")
+def generate_csv(result_df):
+    output = io.BytesIO()
+    # utf-8-sig để Excel mở đúng tiếng Việt
+    result_df.to_csv(output, index=False, encoding="utf-8-sig")
+    output.seek(0)
+    return output
 
-        # Tô màu các ô trống trong cột mã
-        for row_idx, row in enumerate(result_df.values, start=2):  # Start from 2 to skip header
-            for col_idx, value in [(2, row[2]), (4, row[4]), (6, row[6])]:  # Ward Code, District Code, Province Code
-                if pd.isna(value):
-                    cell = worksheet.cell(row=row_idx, column=col_idx + 1)  # +1 because openpyxl is 1-indexed
-                    cell.fill = yellow_fill
 
-    # Đặt con trỏ về đầu file
+def generate_parquet(result_df):
+    # Cần pyarrow hoặc fastparquet
+    output = io.BytesIO()
+    result_df.to_parquet(output, index=False)
     output.seek(0)
     return output
 
 
+# Các định dạng xuất kết quả: phần mở rộng -> hàm tạo file
+EXPORT_FORMATS = {
+    "xlsx": generate_excel,
+    "csv": generate_csv,
+    "parquet": generate_parquet,
+}
+
+
+def parquet_available():
+    return any(importlib.util.find_spec(engine) is not None for engine in ("pyarrow", "fastparquet"))
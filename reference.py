@@ -0,0 +1,402 @@
+import hashlib
+import os
+import pickle
+import re
+import threading
+import time
+
+import pandas as pd
+
+from cache import LRUCache
+from normalize import (remove_accents_series, normalize_province_series, normalize_district_series,
+                       normalize_ward_series)
+
+# Tăng giá trị này khi cấu trúc CompiledReference thay đổi để bỏ qua các file cache cũ
+REFERENCE_FORMAT_VERSION = 2
+
+# File database mặc định, dùng khi file tải lên không có sheet "database"
+DEFAULT_DATABASE_PATH = os.environ.get(
+    "ADDRESS_DATABASE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.xlsx"))
+
+# Thư mục chứa các database đã biên dịch (pickle), đặt tên theo hash nội dung
+REFERENCE_CACHE_DIR = os.environ.get(
+    "ADDRESS_REFERENCE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".reference_cache"))
+
+# Số file database đã biên dịch tối đa trong thư mục cache, file ít được dùng gần đây nhất bị xóa trước
+REFERENCE_CACHE_FILES = int(os.environ.get("ADDRESS_REFERENCE_CACHE_FILES", "32"))
+
+# File trong thư mục cache: reference-v{phiên bản định dạng}-{version}.pkl, cùng file tạm khi đang ghi
+CACHE_FILE_PATTERN = re.compile(r"reference-v(?P<format>\d+)-[0-9a-f]+\.pkl(?P<tmp>\.\d+\.tmp)?")
+
+# File tạm cũ hơn số giây này là của một lần ghi bị ngắt giữa chừng
+_STALE_TMP_SECONDS = 3600
+
+# Số giây giữa hai lần kiểm tra file database mặc định có thay đổi không (0 để tắt theo dõi)
+DATABASE_POLL_SECONDS = float(os.environ.get("ADDRESS_DATABASE_POLL_SECONDS", "5"))
+
+# Số database (version) tối đa được giữ trong bộ nhớ, cùng với các cấu trúc dựng theo từng database
+# (bộ tách địa chỉ, cache tra mã...); database ít được dùng gần đây nhất bị bỏ trước
+MAX_REFERENCES = int(os.environ.get("ADDRESS_MAX_REFERENCES", "8"))
+
+# Các database đã biên dịch trong tiến trình hiện tại, theo version
+_compiled_references = LRUCache(MAX_REFERENCES)
+
+# Các hàm được gọi với version của database mặc định cũ khi đổi sang database mới (xem on_reference_retired)
+_retired_callbacks = []
+
+# Database mặc định đang dùng. Khi nạp lại, database mới được biên dịch xong rồi mới gán biến này
+# (một phép gán duy nhất), nên yêu cầu đang chạy vẫn dùng trọn vẹn database cũ
+_default_reference = None
+# Trạng thái file (mtime, kích thước) lúc nạp database mặc định, để phát hiện file thay đổi
+_default_file_state = None
+_reload_lock = threading.Lock()
+
+
+class CompiledReference:
+    """
+    Dữ liệu tra cứu đã biên dịch từ sheet database: danh sách tỉnh, các từ điển tên -> mã,
+    mã -> tên chuẩn và chỉ mục tỉnh -> quận/huyện -> phường/xã. Mọi mã đều là số nguyên (int).
+    """
+
+    def __init__(self, version, provinces, province_code_map, district_code_index, ward_code_index,
+                 province_name_map, district_name_map, ward_name_map):
+        self.version = version
+        self.provinces = provinces
+        self.province_code_map = province_code_map
+        self.district_code_index = district_code_index
+        self.ward_code_index = ward_code_index
+        self.province_name_map = province_name_map
+        self.district_name_map = district_name_map
+        self.ward_name_map = ward_name_map
+
+        # Bảng tra để join theo lô
+        self.district_lookup = code_index_frame(district_code_index, "parent_code", "name", "code")
+        self.ward_lookup = code_index_frame(ward_code_index, "parent_code", "name", "code")
+
+
+def reference_version(database_df):
+    """
+    Hash nội dung sheet database (tên cột và giá trị), dùng làm khóa cache.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(list(database_df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(database_df, index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def compile_reference(database_df, version=None):
+    """
+    Chuẩn hóa sheet database và xây dựng toàn bộ cấu trúc tra cứu.
+    """
+    if version is None:
+        version = reference_version(database_df)
+    database_df = normalize_database(database_df)
+
+    # Tạo từ điển ánh xạ tên tỉnh -> mã tỉnh, tên chuẩn hóa và tên không dấu xen kẽ theo thứ tự dòng,
+    # tên xuất hiện trước được ưu tiên
+    provinces_df = database_df.dropna(subset=["Tỉnh/Thành phố", "Mã Tỉnh/Thành phố"]).drop_duplicates(
+        subset=["Normalized Province", "Province No Accent", "Mã Tỉnh/Thành phố"])
+    province_code_map = {}
+    for province_name, province_no_accent, province_code in zip(
+            provinces_df["Normalized Province"], provinces_df["Province No Accent"],
+            provinces_df["Mã Tỉnh/Thành phố"].astype("int64").tolist()):
+        province_code_map.setdefault(province_name, province_code)
+        province_code_map.setdefault(province_no_accent, province_code)
+
+    # Tạo từ điển ánh xạ mã -> tên chuẩn (dòng sau ghi đè dòng trước)
+    province_name_map = code_name_map(database_df, "Mã Tỉnh/Thành phố", "Tỉnh/Thành phố")
+    district_name_map = code_name_map(database_df, "Mã Quận/Huyện", "Quận/Huyện")
+    ward_name_map = code_name_map(database_df, "Mã Phường/Xã", "Phường/Xã")
+
+    # Chỉ mục tỉnh -> quận/huyện -> phường/xã
+    district_code_index, ward_code_index = build_code_index(database_df)
+
+    return CompiledReference(
+        version=version,
+        provinces=list(database_df["Tỉnh/Thành phố"].dropna().unique()),
+        province_code_map=province_code_map,
+        district_code_index=district_code_index,
+        ward_code_index=ward_code_index,
+        province_name_map=province_name_map,
+        district_name_map=district_name_map,
+        ward_name_map=ward_name_map,
+    )
+
+
+def normalize_database(database_df):
+    """
+    Bản sao của sheet database có thêm các cột tên chuẩn hóa ("Normalized ...") và không dấu
+    ("... No Accent"), tính theo cả cột thay vì từng dòng.
+    """
+    database_df = database_df.copy()
+    database_df["Normalized Province"] = normalize_province_series(database_df["Tỉnh/Thành phố"])
+    database_df["Normalized District"] = normalize_district_series(database_df["Quận/Huyện"])
+    database_df["Normalized Ward"] = normalize_ward_series(database_df["Phường/Xã"])
+    database_df["Province No Accent"] = remove_accents_series(database_df["Normalized Province"])
+    database_df["District No Accent"] = remove_accents_series(database_df["Normalized District"])
+    database_df["Ward No Accent"] = remove_accents_series(database_df["Normalized Ward"])
+    return database_df
+
+
+def code_name_map(database_df, code_col, name_col):
+    """
+    Từ điển mã (int) -> tên chuẩn cho một cấp đơn vị hành chính.
+    """
+    rows = database_df.dropna(subset=[code_col, name_col])
+    return dict(zip(rows[code_col].astype("int64").tolist(), rows[name_col]))
+
+
+def build_code_index(database_df):
+    """
+    Xây dựng chỉ mục phân cấp tỉnh -> quận/huyện -> phường/xã từ sheet database.
+
+    database_df phải có sẵn các cột "Normalized ..." và "... No Accent". Kết quả gồm hai từ điển:
+    {mã tỉnh: {tên quận/huyện: mã quận/huyện}} và {mã quận/huyện: {tên phường/xã: mã phường/xã}},
+    trong đó tên có cả dạng chuẩn hóa lẫn dạng không dấu. Dòng xuất hiện trước trong database được ưu tiên.
+    """
+    district_code_index = {}
+    ward_code_index = {}
+
+    columns = ["Mã Tỉnh/Thành phố", "Mã Quận/Huyện", "Normalized District", "District No Accent",
+               "Mã Phường/Xã", "Normalized Ward", "Ward No Accent"]
+    for (province_code, district_code, district_name, district_no_accent,
+         ward_code, ward_name, ward_no_accent) in zip(*(database_df[col] for col in columns)):
+        if pd.isna(province_code) or pd.isna(district_code):
+            continue
+
+        districts = district_code_index.setdefault(int(province_code), {})
+        for name in (district_name, district_no_accent):
+            if pd.notna(name) and name not in districts:
+                districts[name] = int(district_code)
+
+        if pd.isna(ward_code):
+            continue
+
+        wards = ward_code_index.setdefault(int(district_code), {})
+        for name in (ward_name, ward_no_accent):
+            if pd.notna(name) and name not in wards:
+                wards[name] = int(ward_code)
+
+    return district_code_index, ward_code_index
+
+
+def lookup_code(code_index, parent_code, name, name_no_accent):
+    """
+    Tra mã đơn vị con theo mã đơn vị cha, ưu tiên tên chuẩn hóa rồi đến tên không dấu.
+    """
+    children = code_index.get(parent_code)
+    if not children:
+        return None
+    if name in children:
+        return children[name]
+    if pd.notna(name_no_accent) and name_no_accent in children:
+        return children[name_no_accent]
+    return None
+
+
+def code_index_frame(code_index, parent_col, name_col, code_col):
+    """
+    Chuyển chỉ mục {mã cha: {tên: mã con}} thành bảng để join bằng pandas, cột mã kiểu Int64.
+    """
+    rows = [(parent_code, name, code) for parent_code, children in code_index.items()
+            for name, code in children.items()]
+    parents, names, codes = zip(*rows) if rows else ((), (), ())
+    return pd.DataFrame({parent_col: pd.array(parents, dtype="Int64"),
+                         name_col: pd.array(names, dtype=object),
+                         code_col: pd.array(codes, dtype="Int64")})
+
+
+def _cache_path(version):
+    return os.path.join(REFERENCE_CACHE_DIR, f"reference-v{REFERENCE_FORMAT_VERSION}-{version}.pkl")
+
+
+def _load_cached(version):
+    path = _cache_path(version)
+    try:
+        with open(path, "rb") as f:
+            reference = pickle.load(f)
+        # Cập nhật mtime để file đang được dùng không bị prune_reference_cache xóa
+        os.utime(path)
+        return reference
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+def prune_reference_cache(max_files=REFERENCE_CACHE_FILES):
+    """
+    Dọn thư mục cache: xóa file của các phiên bản định dạng khác REFERENCE_FORMAT_VERSION, file tạm bị
+    bỏ dở, và chỉ giữ max_files file mới dùng gần đây nhất. Gọi sau mỗi lần ghi cache.
+    """
+    current = []
+    now = time.time()
+    for entry in os.scandir(REFERENCE_CACHE_DIR):
+        match = CACHE_FILE_PATTERN.fullmatch(entry.name)
+        if match is None:
+            continue
+        try:
+            mtime = entry.stat().st_mtime
+            if match.group("tmp"):
+                if now - mtime > _STALE_TMP_SECONDS:
+                    os.remove(entry.path)
+            elif int(match.group("format")) != REFERENCE_FORMAT_VERSION:
+                os.remove(entry.path)
+            else:
+                current.append((mtime, entry.path))
+        except FileNotFoundError:
+            # Worker khác vừa xóa hoặc đổi tên file
+            pass
+    current.sort(reverse=True)
+    for _, path in current[max_files:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _save_cached(reference):
+    # Ghi ra file tạm rồi đổi tên để các worker khác không đọc phải file ghi dở
+    try:
+        os.makedirs(REFERENCE_CACHE_DIR, exist_ok=True)
+        path = _cache_path(reference.version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(reference, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        prune_reference_cache()
+    except OSError:
+        pass
+
+
+def get_reference(database_df):
+    """
+    Lấy database đã biên dịch cho sheet database_df: tìm trong bộ nhớ, sau đó trong thư mục cache,
+    cuối cùng mới biên dịch lại và lưu vào cache.
+    """
+    version = reference_version(database_df)
+    reference = _compiled_references.get(version)
+    if reference is None:
+        reference = _load_cached(version)
+        if reference is None:
+            reference = compile_reference(database_df, version)
+            _save_cached(reference)
+        _compiled_references.put(version, reference)
+    return reference
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_default_reference(path=DEFAULT_DATABASE_PATH):
+    """
+    Nạp database mặc định từ file (sheet "database") và dùng nó cho các lần xử lý sau, gọi khi worker
+    khởi động và mỗi khi file thay đổi. Trả về None nếu không có file.
+    """
+    global _default_reference, _default_file_state
+    if not path or not os.path.exists(path):
+        return None
+    file_state = _file_state(path)
+    reference = get_reference(pd.read_excel(path, sheet_name="database"))
+    previous, _default_reference = _default_reference, reference
+    _default_file_state = file_state
+    # Database cũ vẫn dùng được bởi các yêu cầu đang giữ nó, chỉ bỏ khỏi bộ nhớ cùng các cấu trúc dựng theo nó
+    if previous is not None and previous.version != reference.version:
+        _compiled_references.pop(previous.version)
+        for callback in _retired_callbacks:
+            callback(previous.version)
+    return reference
+
+
+def on_reference_retired(callback):
+    """
+    Đăng ký callback(version) được gọi khi database mặc định version được thay bằng database mới,
+    để bỏ các cấu trúc dựng theo version đó.
+    """
+    _retired_callbacks.append(callback)
+
+
+def get_default_reference():
+    if _default_reference is None and load_default_reference() is None:
+        raise ValueError("File không có sheet 'database' và chưa có database mặc định "
+                         f"({DEFAULT_DATABASE_PATH})")
+    return _default_reference
+
+
+def current_default_reference():
+    """
+    Database mặc định đang dùng, None nếu chưa nạp. Lấy một lần rồi dùng cho cả yêu cầu để kết quả
+    và version trả về luôn khớp nhau kể cả khi database được nạp lại giữa chừng.
+    """
+    return _default_reference
+
+
+def reload_default_reference(path=DEFAULT_DATABASE_PATH):
+    """
+    Nạp lại database mặc định từ file. Trả về database mới, hoặc None nếu đang có một lần nạp lại khác.
+    Nếu file lỗi thì báo lỗi và giữ nguyên database đang dùng.
+    """
+    if not _reload_lock.acquire(blocking=False):
+        return None
+    try:
+        return load_default_reference(path)
+    finally:
+        _reload_lock.release()
+
+
+def install_default_database(source_path, path=DEFAULT_DATABASE_PATH):
+    """
+    Thay file database mặc định bằng source_path rồi nạp lại. File mới được biên dịch thử trước (lỗi thì
+    báo lỗi, không thay gì), sau đó đổi tên thay file cũ trong một bước; các worker khác nhận ra file
+    thay đổi qua ReferenceWatcher và dùng lại bản biên dịch đã lưu trong thư mục cache.
+    """
+    get_reference(pd.read_excel(source_path, sheet_name="database"))
+    with _reload_lock:
+        os.replace(source_path, path)
+        return load_default_reference(path)
+
+
+def reload_in_progress():
+    return _reload_lock.locked()
+
+
+class ReferenceWatcher(threading.Thread):
+    """
+    Luồng nền kiểm tra file database mặc định mỗi interval giây và nạp lại khi file thay đổi.
+    Lỗi khi nạp được chuyển cho on_error (nếu có), database đang dùng được giữ nguyên.
+    """
+
+    def __init__(self, path=DEFAULT_DATABASE_PATH, interval=DATABASE_POLL_SECONDS, on_reload=None, on_error=None):
+        super().__init__(name="reference-watcher", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.on_reload = on_reload
+        self.on_error = on_error
+        self._stop_event = threading.Event()
+        # File lỗi chỉ được thử lại khi nó thay đổi tiếp
+        self._failed_state = None
+
+    def check(self):
+        state = _file_state(self.path)
+        if state is None or state == _default_file_state or state == self._failed_state:
+            return None
+        try:
+            reference = reload_default_reference(self.path)
+        except Exception as e:
+            self._failed_state = state
+            if self.on_error is not None:
+                self.on_error(e)
+            return None
+        if reference is not None and self.on_reload is not None:
+            self.on_reload(reference)
+        return reference
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stop_event.set()
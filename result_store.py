@@ -0,0 +1,126 @@
+import os
+import re
+import sqlite3
+import time
+import uuid
+
+import diskcache
+import numpy as np
+
+from preview import preview_page, write_preview_database, PREVIEW_PAGE_SIZE
+from process import EXPORT_FORMATS
+
+# Thư mục lưu kết quả, thời gian giữ kết quả và dung lượng tối đa của kho
+RESULT_STORE_DIR = os.environ.get(
+    "ADDRESS_RESULT_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".result_store"))
+RESULT_TTL_SECONDS = int(os.environ.get("ADDRESS_RESULT_TTL", "3600"))
+RESULT_STORE_SIZE_MB = int(os.environ.get("ADDRESS_RESULT_STORE_SIZE_MB", "1024"))
+
+EXPORT_MIMETYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/octet-stream",
+}
+
+RESULT_KEY_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# File SQLite của bảng xem trước trong thư mục con "preview" của kho, cùng file tạm khi đang ghi
+PREVIEW_FILE_PATTERN = re.compile(r"[0-9a-f]{32}\.sqlite(\.\d+\.tmp)?")
+
+
+def check_index(result_df):
+    """
+    Vị trí (thứ tự dòng) các dòng cần kiểm tra của result_df.
+    """
+    return np.flatnonzero((result_df["Check"] != "").to_numpy(dtype=bool))
+
+
+class ResultStore:
+    """
+    Kho kết quả xử lý trên đĩa, mỗi lần tải lên có một khóa riêng.
+
+    Kết quả hết hạn sau ttl giây; khi tổng dung lượng vượt size_limit, các kết quả ít được dùng
+    gần đây nhất bị xóa trước. Dữ liệu nằm trên đĩa nên dùng chung được giữa các worker và
+    không chiếm bộ nhớ của tiến trình web. Bảng xem trước đọc từ một file SQLite riêng cho mỗi
+    kết quả, file hết hạn cùng lúc với kết quả.
+    """
+
+    def __init__(self, directory=RESULT_STORE_DIR, ttl=RESULT_TTL_SECONDS,
+                 size_limit=RESULT_STORE_SIZE_MB * 1024 * 1024):
+        self.ttl = ttl
+        self._cache = diskcache.Cache(directory, size_limit=size_limit, eviction_policy="least-recently-used")
+        self._preview_dir = os.path.join(directory, "preview")
+        os.makedirs(self._preview_dir, exist_ok=True)
+
+    @staticmethod
+    def new_key():
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def is_valid_key(key):
+        return isinstance(key, str) and RESULT_KEY_PATTERN.fullmatch(key) is not None
+
+    def _preview_path(self, key):
+        return os.path.join(self._preview_dir, f"{key}.sqlite")
+
+    def save(self, key, result_df):
+        """
+        Lưu result_df và bảng xem trước của nó, trả về vị trí các dòng cần kiểm tra.
+        """
+        self.sweep_previews()
+        write_preview_database(self._preview_path(key), result_df)
+        self._cache.set(("result", key), result_df, expire=self.ttl)
+        return check_index(result_df)
+
+    def sweep_previews(self):
+        """
+        Xóa file bảng xem trước của các kết quả đã hết hạn, gọi ở mỗi lần lưu.
+        """
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self._preview_dir):
+            if PREVIEW_FILE_PATTERN.fullmatch(entry.name) is None:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                # Worker khác đã xóa
+                pass
+
+    def load(self, key):
+        if not self.is_valid_key(key):
+            return None
+        return self._cache.get(("result", key))
+
+    def preview_page(self, key, page_current=0, page_size=PREVIEW_PAGE_SIZE, sort_by=None, filter_query=None,
+                     check_only=False):
+        """
+        Một trang của bảng xem trước (xem preview.preview_page), đọc từ SQLite mà không nạp result_df.
+        Trả về None nếu không có kết quả cho khóa này hoặc kết quả đã hết hạn.
+        """
+        if not self.is_valid_key(key) or ("result", key) not in self._cache:
+            return None
+        try:
+            return preview_page(self._preview_path(key), page_current, page_size, sort_by, filter_query,
+                                check_only)
+        except sqlite3.OperationalError:
+            # File đã bị xóa khi hết hạn
+            return None
+
+    def open_export(self, key, export_format):
+        """
+        Mở file kết quả ở định dạng export_format để stream về trình duyệt. File được tạo ở lần tải
+        đầu tiên rồi giữ lại trong kho. Trả về None nếu không có kết quả cho khóa này.
+        """
+        if export_format not in EXPORT_FORMATS:
+            return None
+
+        export_key = ("export", key, export_format)
+        handle = self._cache.get(export_key, read=True)
+        if handle is None:
+            result_df = self.load(key)
+            if result_df is None:
+                return None
+            self._cache.set(export_key, EXPORT_FORMATS[export_format](result_df), read=True, expire=self.ttl)
+            handle = self._cache.get(export_key, read=True)
+        return handle
@@ -0,0 +1,186 @@
+import csv
+import os
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from instrumentation import NULL_RECORDER
+from process import (process_address_list, process_chunks_parallel, highlight_missing_codes, excel_header,
+                     result_rows, DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS)
+from reference import get_reference, get_default_reference
+
+
+def file_format(path):
+    """
+    Định dạng file theo phần mở rộng: "csv", "parquet" hoặc "xlsx" (mặc định).
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension if extension in ("csv", "parquet") else "xlsx"
+
+
+def iter_address_chunks(input_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Đọc cột Address theo từng phần chunk_size dòng, không nạp cả file vào bộ nhớ.
+    File .csv đọc bằng pandas theo chunk, file Excel đọc sheet "raw" bằng openpyxl read-only.
+    File .parquet chỉ đọc cột Address rồi chia phần.
+    """
+    if file_format(input_path) == "csv":
+        for chunk_df in pd.read_csv(input_path, usecols=["Address"], dtype={"Address": object},
+                                    chunksize=chunk_size):
+            yield chunk_df["Address"].tolist()
+        return
+    if file_format(input_path) == "parquet":
+        addresses = pd.read_parquet(input_path, columns=["Address"])["Address"].tolist()
+        for start in range(0, len(addresses), chunk_size):
+            yield addresses[start:start + chunk_size]
+        return
+
+    workbook = load_workbook(input_path, read_only=True)
+    try:
+        rows = workbook["raw"].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None or "Address" not in header:
+            raise ValueError("Sheet 'raw' không có cột 'Address'")
+        address_idx = header.index("Address")
+
+        chunk = []
+        for row in rows:
+            chunk.append(row[address_idx] if address_idx < len(row) else None)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+
+def load_stream_reference(input_path, database_path=None):
+    """
+    Lấy database cho chế độ streaming: từ database_path nếu có, sau đó từ sheet "database" của file
+    Excel đầu vào, cuối cùng là database mặc định.
+    """
+    if database_path:
+        return get_reference(pd.read_excel(database_path, sheet_name="database"))
+    if file_format(input_path) == "xlsx":
+        with pd.ExcelFile(input_path) as workbook:
+            if "database" in workbook.sheet_names:
+                return get_reference(workbook.parse("database"))
+    return get_default_reference()
+
+
+class CsvResultWriter:
+    def __init__(self, output_path):
+        self._file = open(output_path, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file)
+        self._header_written = False
+
+    def write(self, result_df):
+        if not self._header_written:
+            self._writer.writerow(result_df.columns)
+            self._header_written = True
+        self._writer.writerows(result_rows(result_df))
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """
+    Parquet cần một schema chung cho mọi phần, nên các phần được gom lại và ghi một lần khi đóng.
+    """
+
+    def __init__(self, output_path):
+        self._output_path = output_path
+        self._result_dfs = []
+
+    def write(self, result_df):
+        self._result_dfs.append(result_df)
+
+    def close(self):
+        if self._result_dfs:
+            pd.concat(self._result_dfs, ignore_index=True).to_parquet(self._output_path, index=False)
+
+
+class ExcelResultWriter:
+    """
+    Ghi kết quả vào workbook write-only của openpyxl: các dòng được ghi thẳng ra file tạm,
+    bộ nhớ không tăng theo số dòng.
+    """
+
+    def __init__(self, output_path):
+        self._output_path = output_path
+        self._workbook = Workbook(write_only=True)
+        self._worksheet = self._workbook.create_sheet("Processed Data")
+        self._columns = None
+        self._row_count = 0
+
+    def write(self, result_df):
+        if self._columns is None:
+            self._columns = list(result_df.columns)
+            self._worksheet.append(excel_header(self._worksheet, self._columns))
+        for row in result_rows(result_df):
+            self._worksheet.append(row)
+        self._row_count += len(result_df)
+
+    def close(self):
+        if self._columns is not None:
+            highlight_missing_codes(self._worksheet, self._columns, self._row_count + 1)
+        self._workbook.save(self._output_path)
+        self._workbook.close()
+
+
+# Định dạng file kết quả -> lớp ghi theo từng phần
+RESULT_WRITERS = {
+    "xlsx": ExcelResultWriter,
+    "csv": CsvResultWriter,
+    "parquet": ParquetResultWriter,
+}
+
+
+def process_file_streaming(input_path, output_path, database_path=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                           recorder=NULL_RECORDER, workers=DEFAULT_WORKERS, progress_callback=None, store=None):
+    """
+    Xử lý file địa chỉ lớn theo từng phần: đọc chunk_size dòng, tách và tra mã, ghi ngay ra
+    output_path (.xlsx, .csv hoặc .parquet). Với workers > 1 các phần được xử lý trên nhiều tiến trình.
+    Nếu có progress_callback, hàm được gọi với (số dòng đã xử lý, None) sau mỗi phần, giống process_addresses
+    nhưng tổng số dòng là None vì file chưa được đọc hết. Trả về số dòng đã xử lý.
+
+    Nếu có store (IncrementalStore), mỗi phần chỉ xử lý các địa chỉ chưa có kết quả trong store;
+    khi đó các phần được xử lý tuần tự.
+    """
+    with recorder.stage("reference"):
+        reference = load_stream_reference(input_path, database_path)
+    writer = RESULT_WRITERS[file_format(output_path)](output_path)
+
+    def read_chunks():
+        chunks = iter_address_chunks(input_path, chunk_size)
+        while True:
+            with recorder.stage("read"):
+                addresses = next(chunks, None)
+            if addresses is None:
+                return
+            yield addresses
+
+    if store is not None:
+        result_dfs = (store.process(addresses, reference,
+                                    lambda new_addresses: process_address_list(new_addresses, reference, recorder),
+                                    recorder)
+                      for addresses in read_chunks())
+    elif workers > 1:
+        result_dfs = process_chunks_parallel(read_chunks(), reference, workers, recorder)
+    else:
+        result_dfs = (process_address_list(addresses, reference, recorder) for addresses in read_chunks())
+
+    row_count = 0
+    try:
+        for result_df in result_dfs:
+            with recorder.stage("write", len(result_df)):
+                writer.write(result_df)
+            row_count += len(result_df)
+            if progress_callback is not None:
+                progress_callback(row_count, None)
+    finally:
+        with recorder.stage("write"):
+            writer.close()
+    return row_count
@@ -0,0 +1,387 @@
+"""
+Bản sao address_parser.py trước khi có bộ quy tắc (PREPROCESS_RULES, SPLIT_RULES): các regex tiền xử lý và
+các nhánh tách địa chỉ chạy lần lượt cho mọi địa chỉ. Chỉ dùng trong test để kiểm tra bộ quy tắc cho cùng
+kết quả; không sửa file này khi thay đổi address_parser.py.
+"""
+import itertools
+import re
+
+from cache import LRUCache, DEFAULT_CACHE_SIZE
+from instrumentation import NULL_RECORDER
+from normalize import remove_accents, normalize_baria_vungtau
+
+# Các mẫu tiền xử lý địa chỉ, biên dịch một lần khi import
+HCM_AT_END_PATTERN = re.compile(r'\bHCM\b$', re.IGNORECASE)
+CITY_BEFORE_HCM_PATTERN = re.compile(r'(TP|Tp\.|T\.P\.|Thành phố)\s+([^\s,]+(\s+[^\s,]+)*)\s+HCM\b', re.IGNORECASE)
+HCM_DISTRICT_PATTERN = re.compile(r'(Bình Chánh|Củ Chi|Hóc Môn|Nhà Bè|Cần Giờ|Thủ Đức)\s+(Hồ Chí Minh|HCM|TPHCM|TP HCM)$',
+                                  re.IGNORECASE)
+HCM_NUMERIC_WARD_PATTERN = re.compile(r'(P\.?\s*(\d+))\s+(Bình Thạnh|Quận \d+|Q\.?\s*\d+)', re.IGNORECASE)
+TP_HCM_PATTERN = re.compile(r'\bTP\.?\s*HCM\b', re.IGNORECASE)
+TPHCM_PATTERN = re.compile(r'\bTPHCM\b', re.IGNORECASE)
+TP_HO_CHI_MINH_PATTERN = re.compile(r'\bTP\.?\s*Hồ\s*Chí\s*Minh\b', re.IGNORECASE)
+CITY_HO_CHI_MINH_PATTERN = re.compile(r'\bThành\s*[Pp]hố\s*Hồ\s*Chí\s*Minh\b')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+COMMA_PATTERN = re.compile(r'\s*,\s*')
+
+# Các mẫu tách địa chỉ Bà Rịa - Vũng Tàu
+BRVT_PATTERN = re.compile(
+    r'(.*?)(?:,\s*)?((?:Thành phố|TP\.?|T\.P\.?|Thị xã|TX\.?|Huyện)\s+([^,]+))(?:,\s*)?(Bà Rịa|Bà Rịa - Vũng Tàu|Vũng Tàu)$',
+    re.IGNORECASE)
+LAST_PART_PATTERN = re.compile(r'(.*?)(?:,\s*)?([^,]+)$')
+VUNGTAU_PATTERN = re.compile(
+    r'(.*?)(?:,\s*)?(?:thành phố|tp\.?)\s+vũng\s+tàu(?:,\s*)?(?:tỉnh)?\s+bà\s+rịa(?:\s*-\s*vũng\s+tàu)?')
+BRVT_MENTION_PATTERN = re.compile(r'bà\s*rịa|vũng\s*tàu')
+
+# Các biến thể của TP Hồ Chí Minh
+HCMC_VARIATIONS = (
+    "tp hcm", "tp.hcm", "tphcm", "tp. hcm", "hcm", "chm", "tpchm",
+    "tp ho chi minh", "tp. ho chi minh", "ho chi minh",
+    "tp hồ chí minh", "tp. hồ chí minh", "hồ chí minh"
+)
+
+# Các biến thể của Thừa Thiên Huế, tương ứng với THUA_THIEN_HUE_PATTERN sau khi đã gộp khoảng trắng
+THUA_THIEN_HUE_VARIATIONS = tuple(
+    f"th{u}{a}{space1}thi{e}n{space2}hu{e_hue}"
+    for u, a, space1, e, space2, e_hue in itertools.product("ưừu", "aà", ("", " "), "eê", ("", " "), "êếeé")
+)
+
+# Danh sách các district của Bà Rịa - Vũng Tàu
+BRVT_DISTRICTS = ("bà rịa", "vũng tàu", "châu đức", "đất đỏ", "long điền", "côn đảo", "xuyên mộc", "phú mỹ")
+
+# Các từ khóa để nhận diện tỉnh/thành phố
+PROVINCE_KEYWORDS = (
+    "TP", "Thành phố", "Tỉnh", "Tp.", "T.P", "Tp", "TPHCM", "Tphcm", "HCM",
+    "Hà Nội", "Hồ Chí Minh", "Đà Nẵng", "Cần Thơ", "Hải Phòng", "Huế"
+)
+
+# Các từ khóa để nhận diện quận/huyện
+DISTRICT_KEYWORDS = (
+    "Quận", "Huyện", "Thị xã", "TX.", "TX", "Q.", "Q", "H.", "H"
+)
+
+# Các từ khóa để nhận diện phường/xã
+WARD_KEYWORDS = (
+    "Phường", "Xã", "Thị trấn", "TT.", "TT", "P.", "P", "X.", "X",
+    "Khu phố", "KP", "Ấp", "Thôn", "Tổ"
+)
+
+# Tên các nhánh của split_address, dùng cho bộ đếm "split.<nhánh>" của StageRecorder
+BRANCH_BRVT_PATTERN = "brvt_pattern"
+BRANCH_VUNGTAU_PATTERN = "vungtau_pattern"
+BRANCH_BRVT_SCAN = "brvt_scan"
+BRANCH_PROVINCE_FIRST = "province_first"
+BRANCH_COMMA_SPLIT = "comma_split"
+BRANCH_ADMIN_UNITS = "admin_units_fallback"
+
+
+def preprocess_address(address):
+    if not isinstance(address, str):
+        return None
+
+    # Handle standalone HCM at the end of address
+    address = HCM_AT_END_PATTERN.sub('Hồ Chí Minh', address)
+
+    # Handle "TP Something HCM" pattern (like "TP Thủ Đức HCM")
+    address = CITY_BEFORE_HCM_PATTERN.sub(r'\1 \2, Hồ Chí Minh', address)
+
+    # Handle district followed directly by HCM without comma
+    address = HCM_DISTRICT_PATTERN.sub(r'\1, Hồ Chí Minh', address)
+
+    # Handle numeric ward patterns in HCMC
+    address = HCM_NUMERIC_WARD_PATTERN.sub(r'Phường \2, \3', address)
+
+    # Handle other common patterns
+    address = TP_HCM_PATTERN.sub('Hồ Chí Minh', address)
+    address = TPHCM_PATTERN.sub('Hồ Chí Minh', address)
+    address = TP_HO_CHI_MINH_PATTERN.sub('Hồ Chí Minh', address)
+    address = CITY_HO_CHI_MINH_PATTERN.sub('Hồ Chí Minh', address)
+
+    # Chuẩn hóa dấu phẩy
+    address = address.replace(" - ", ", ")
+    address = address.replace("-", ", ")
+
+    # Xử lý khoảng trắng thừa
+    address = WHITESPACE_PATTERN.sub(' ', address)
+    address = COMMA_PATTERN.sub(', ', address)
+
+    # Loại bỏ khoảng trắng ở đầu và cuối
+    address = address.strip()
+
+    return address
+
+
+# Hàm nhận diện các đơn vị hành chính
+def identify_admin_units(address):
+    province = None
+    district = None
+    ward = None
+    detail = None
+
+    # Tìm kiếm trong địa chỉ
+    words = address.split()
+
+    # Xử lý trường hợp không có dấu phẩy
+    if ", " not in address and len(words) >= 3:
+        # Tìm các từ khóa trong địa chỉ
+        for i, word in enumerate(words):
+            if any(kw in word for kw in PROVINCE_KEYWORDS) and i < len(words) - 1:
+                province = words[i + 1]
+            elif any(kw in word for kw in DISTRICT_KEYWORDS) and i < len(words) - 1:
+                district = words[i + 1]
+            elif any(kw in word for kw in WARD_KEYWORDS) and i < len(words) - 1:
+                ward = words[i + 1]
+
+    return province, district, ward, detail
+
+
+class ProvinceMatcher:
+    """
+    Tìm tỉnh/thành phố trong địa chỉ chỉ với một lần quét.
+
+    Tất cả tên tỉnh (có dấu và không dấu) cùng các biến thể được đưa vào một trie đảo ngược. Địa chỉ được
+    quét từ cuối về đầu, nên kết quả là tên kết thúc xa nhất về bên phải, và dài nhất nếu có nhiều tên
+    cùng kết thúc tại đó. Với cùng một chuỗi, tên được thêm trước được ưu tiên.
+    """
+
+    def __init__(self, patterns):
+        self._trie = {}
+        for pattern, province in patterns:
+            node = self._trie
+            for char in reversed(pattern):
+                node = node.setdefault(char, {})
+            # Khóa None đánh dấu kết thúc một tên
+            node.setdefault(None, province)
+
+    def find(self, text):
+        trie = self._trie
+        for end in range(len(text), 0, -1):
+            node = trie.get(text[end - 1])
+            if node is None:
+                continue
+
+            found = node.get(None)
+            i = end - 2
+            while i >= 0:
+                node = node.get(text[i])
+                if node is None:
+                    break
+                if None in node:
+                    found = node[None]
+                i -= 1
+
+            if found is not None:
+                return found
+        return None
+
+
+class AddressSplitter:
+    """
+    Tách một địa chỉ thành (tỉnh/thành phố, quận/huyện, phường/xã, chi tiết).
+
+    Chỉ phụ thuộc vào danh sách tỉnh/thành phố của database, nên có thể tạo một lần cho mỗi
+    database và dùng lại cho mọi địa chỉ mà không cần DataFrame. Kết quả tách được lưu trong
+    cache LRU (split_cache) nên địa chỉ lặp lại chỉ tốn một lần tra cứu.
+    """
+
+    def __init__(self, provinces, cache_size=DEFAULT_CACHE_SIZE):
+        self.provinces = tuple(provinces)
+        self.split_cache = LRUCache(cache_size)
+
+        patterns = [(province.lower(), province) for province in self.provinces]
+        patterns += [(remove_accents(province.lower()), province) for province in self.provinces]
+        patterns += [(variation, "Thừa Thiên - Huế") for variation in THUA_THIEN_HUE_VARIATIONS]
+        patterns += [(variation, "TP Hồ Chí Minh") for variation in HCMC_VARIATIONS]
+        self._province_matcher = ProvinceMatcher(patterns)
+
+    def find_province_first(self, address):
+        """
+        Tìm tỉnh/thành phố trong địa chỉ bằng cách so khớp với danh sách tỉnh trong database
+        """
+        if not isinstance(address, str):
+            return None
+
+        # Chuẩn hóa địa chỉ để tìm kiếm
+        normalized_address = address.lower()
+        province = self._province_matcher.find(normalized_address)
+
+        # Địa chỉ bỏ dấu không đầy đủ: thử lại trên bản không dấu
+        if province is None and not normalized_address.isascii():
+            province = self._province_matcher.find(remove_accents(normalized_address))
+
+        return province
+
+    def split_address(self, address, recorder=NULL_RECORDER):
+        """
+        Tách address thành (tỉnh/thành phố, quận/huyện, phường/xã, chi tiết). recorder đếm số lần
+        trúng cache và nhánh tách đã dùng cho các địa chỉ chưa có trong cache.
+        """
+        if not isinstance(address, str):
+            return None, None, None, None
+
+        result = self.split_cache.get(address)
+        if result is None:
+            split = self._split_address(address)
+            branch, result = split[0], split[1:]
+            self.split_cache.put(address, result)
+            recorder.count(f"split.{branch}")
+        else:
+            recorder.count("split.cache_hit")
+        return result
+
+    # Hàm tách địa chỉ thành 3 cấp, trả về (nhánh, tỉnh/thành phố, quận/huyện, phường/xã, chi tiết)
+    def _split_address(self, address):
+
+        # Tiền xử lý địa chỉ
+        address = preprocess_address(address)
+
+        # Xử lý đặc biệt cho Bà Rịa - Vũng Tàu
+        brvt_match = BRVT_PATTERN.search(address)
+
+        if brvt_match and normalize_baria_vungtau(brvt_match.group(4)):
+            detail_and_ward = brvt_match.group(1).strip() if brvt_match.group(1) else None
+            district = brvt_match.group(3).strip()
+            province = "Bà Rịa - Vũng Tàu"
+
+            # Tách ward từ detail nếu có
+            if detail_and_ward:
+                ward_match = LAST_PART_PATTERN.search(detail_and_ward)
+                if ward_match:
+                    detail = ward_match.group(1).strip() if ward_match.group(1) else None
+                    ward = ward_match.group(2).strip()
+                    return BRANCH_BRVT_PATTERN, province, district, ward, detail
+                else:
+                    return BRANCH_BRVT_PATTERN, province, district, detail_and_ward, None
+            else:
+                return BRANCH_BRVT_PATTERN, province, district, None, None
+
+        # Xử lý trường hợp đặc biệt "thành phố Vũng Tàu, tỉnh Bà Rịa - Vũng Tàu"
+        address_lower = address.lower()
+        vungtau_match = VUNGTAU_PATTERN.search(address_lower)
+
+        if vungtau_match:
+            detail_and_ward = vungtau_match.group(1).strip() if vungtau_match.group(1) else None
+            district = "Vũng Tàu"
+            province = "Bà Rịa - Vũng Tàu"
+
+            # Tách ward từ detail nếu có
+            if detail_and_ward and "," in detail_and_ward:
+                parts = detail_and_ward.split(",")
+                ward = parts[-1].strip()
+                detail = ", ".join(parts[:-1]).strip()
+                return BRANCH_VUNGTAU_PATTERN, province, district, ward, detail
+            else:
+                return BRANCH_VUNGTAU_PATTERN, province, district, detail_and_ward, None
+
+        # Xử lý các trường hợp đặc biệt khi địa chỉ chứa "Bà Rịa" hoặc "Vũng Tàu" nhưng không theo mẫu trên
+        if BRVT_MENTION_PATTERN.search(address_lower):
+            parts = address.split(", ")
+
+            # Xác định province trước
+            province = "Bà Rịa - Vũng Tàu"
+
+            # Tìm district trong các phần còn lại
+            district = None
+            ward = None
+            detail = None
+
+            # Tìm district trong các phần
+            for i, part in enumerate(parts):
+                part_lower = part.lower()
+                if any(district_name in part_lower for district_name in BRVT_DISTRICTS):
+                    # Tránh nhầm lẫn "Bà Rịa" và "Vũng Tàu" là district khi chúng là một phần của tên tỉnh
+                    if "bà rịa" in part_lower and "vũng tàu" in address_lower:
+                        continue
+                    if "vũng tàu" in part_lower and "bà rịa" in address_lower:
+                        continue
+
+                    district = part
+
+                    # Ward có thể là phần trước district
+                    if i > 0:
+                        ward = parts[i - 1]
+
+                    # Detail là các phần còn lại
+                    if i > 1:
+                        detail = ", ".join(parts[:i - 1])
+
+                    break
+
+            if district:
+                return BRANCH_BRVT_SCAN, province, district, ward, detail
+
+        # Tìm tỉnh/thành phố trước
+        province = self.find_province_first(address)
+
+        # Nếu tìm thấy tỉnh/thành phố, tiếp tục tách các thành phần khác
+        if province:
+            # Thử tách theo dấu phẩy
+            parts = address.split(", ")
+
+            # Xử lý các trường hợp có nhiều hơn 3 phần
+            if len(parts) > 3:
+                ward = parts[-3]
+                district = parts[-2]
+                detail = ", ".join(parts[:-3]).rstrip()  # Join all remaining parts as detail
+                return BRANCH_PROVINCE_FIRST, province, district, ward, detail
+
+            # Xử lý các trường hợp có đủ 3 phần
+            elif len(parts) == 3:
+                ward = parts[0]
+                district = parts[1]
+                return BRANCH_PROVINCE_FIRST, province, district, ward, None  # No detail
+
+            # Xử lý các trường hợp chỉ có 2 phần
+            elif len(parts) == 2:
+                district = parts[0]
+                return BRANCH_PROVINCE_FIRST, province, district, None, None  # No ward, no detail
+
+            # Trường hợp không có dấu phẩy hoặc chỉ có 1 phần
+            else:
+                # Thử nhận diện các đơn vị hành chính
+                _, district, ward, detail = identify_admin_units(address)
+                return BRANCH_PROVINCE_FIRST, province, district, ward, detail
+
+        # Thử tách theo dấu phẩy
+        parts = address.split(", ")
+
+        # Xử lý các trường hợp có nhiều hơn 3 phần
+        if len(parts) > 3:
+            ward = parts[-3]
+            district = parts[-2]
+            province = parts[-1]
+            detail = ", ".join(parts[:-3]).rstrip()  # Join all remaining parts as detail
+            return BRANCH_COMMA_SPLIT, province, district, ward, detail
+
+        # Xử lý các trường hợp có đủ 3 phần
+        elif len(parts) == 3:
+            ward = parts[0]
+            district = parts[1]
+            province = parts[2]
+            return BRANCH_COMMA_SPLIT, province, district, ward, None  # No detail
+
+        # Xử lý các trường hợp chỉ có 2 phần
+        elif len(parts) == 2:
+            district = parts[0]
+            province = parts[1]
+            return BRANCH_COMMA_SPLIT, province, district, None, None  # No ward, no detail
+
+        # Trường hợp không có dấu phẩy hoặc chỉ có 1 phần
+        else:
+            # Thử nhận diện các đơn vị hành chính
+            province, district, ward, detail = identify_admin_units(address)
+
+            # Nếu không nhận diện được, xử lý theo không gian
+            if not any([province, district, ward]):
+                words = address.split()
+                if len(words) >= 3:
+                    # Giả định 3 từ cuối lần lượt là phường/xã, quận/huyện, tỉnh/thành phố
+                    ward = ' '.join(words[:-2])
+                    district = words[-2]
+                    province = words[-1]
+                    return BRANCH_ADMIN_UNITS, province, district, ward, None
+                elif len(words) == 2:
+                    district = words[0]
+                    province = words[1]
+                    return BRANCH_ADMIN_UNITS, province, district, None, None
+
+            return BRANCH_ADMIN_UNITS, address, None, None, None  # Trả về toàn bộ địa chỉ nếu không thể phân tích
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reference import compile_reference  # noqa: E402
+
+# Các cột của sheet database
+DATABASE_COLUMNS = ["Tỉnh/Thành phố", "Mã Tỉnh/Thành phố", "Quận/Huyện", "Mã Quận/Huyện", "Phường/Xã", "Mã Phường/Xã"]
+
+
+@pytest.fixture(scope="session")
+def make_database():
+    """
+    Tạo sheet database từ các dòng (tỉnh, mã tỉnh, quận/huyện, mã quận/huyện, phường/xã, mã phường/xã).
+    """
+    def make(rows):
+        return pd.DataFrame(rows, columns=DATABASE_COLUMNS)
+    return make
+
+
+@pytest.fixture(scope="session")
+def make_reference(make_database):
+    """
+    Biên dịch database từ các dòng như make_database, không ghi vào thư mục cache.
+    """
+    def make(rows):
+        return compile_reference(make_database(rows))
+    return make
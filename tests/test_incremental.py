@@ -0,0 +1,81 @@
+"""
+Xử lý qua IncrementalStore phải cho cùng kết quả với xử lý thường, kể cả khi chạy lại lần hai.
+"""
+import time
+
+import pandas as pd
+import pytest
+
+import incremental
+from incremental import IncrementalStore, store_version
+from process import process_address_list
+
+# Các cặp địa chỉ chỉ khác nhau khoảng trắng ở cuối nhưng được tách khác nhau (quy tắc neo ở cuối chuỗi)
+ADDRESSES = [
+    "Xã Tân Nhựt, Bình Chánh HCM ",
+    "Xã Tân Nhựt, Bình Chánh HCM",
+    "Bình Chánh HCM ",
+    "Bình Chánh HCM",
+    None,
+    "Bình Chánh HCM",
+]
+
+
+@pytest.fixture(scope="module")
+def reference(make_reference):
+    return make_reference([("TP Hồ Chí Minh", 79, "Huyện Bình Chánh", 7909, "Xã Tân Nhựt", 790901)])
+
+
+@pytest.fixture
+def store(tmp_path):
+    with IncrementalStore(str(tmp_path / "results.sqlite")) as store:
+        yield store
+
+
+def process_with_store(store, addresses, reference):
+    return store.process(addresses, reference, lambda new: process_address_list(new, reference))
+
+
+def assert_same_result(actual, expected):
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_matches_plain_processing(store, reference):
+    expected = process_address_list(ADDRESSES, reference)
+    assert_same_result(process_with_store(store, ADDRESSES, reference), expected)
+    # Lần hai lấy hoàn toàn từ store
+    assert_same_result(process_with_store(store, ADDRESSES, reference), expected)
+    assert_same_result(process_with_store(store, list(reversed(ADDRESSES)), reference),
+                       process_address_list(list(reversed(ADDRESSES)), reference))
+
+
+def test_versions_kept_side_by_side(store, reference, make_reference):
+    other = make_reference([("TP Hồ Chí Minh", 79, "Huyện Bình Chánh", 7910, "Xã Tân Nhựt", 791001)])
+    process_with_store(store, ADDRESSES, reference)
+    process_with_store(store, ADDRESSES, other)
+
+    new_addresses = []
+
+    def process_new(addresses):
+        new_addresses.extend(addresses)
+        return process_address_list(addresses, reference)
+
+    store.process(ADDRESSES, reference, process_new)
+    # Chỉ ô trống được xử lý lại, kết quả của database thứ nhất không bị database thứ hai xóa
+    assert new_addresses == [None]
+
+
+def test_format_version_changes_key(reference, monkeypatch):
+    version = store_version(reference)
+    monkeypatch.setattr(incremental, "INCREMENTAL_FORMAT_VERSION", incremental.INCREMENTAL_FORMAT_VERSION + 1)
+    assert store_version(reference) != version
+    assert store_version(reference).endswith(reference.version)
+
+
+def test_prune_by_age(store, reference):
+    process_with_store(store, ADDRESSES, reference)
+    assert store.prune(1) == 0
+    assert store.prune(0) == 0
+    store._connection.execute("UPDATE results SET stored_at = ?", (time.time() - 2 * 86400,))
+    assert store.prune(1) == 4
+    assert store.get_many(store_version(reference), []) == {}
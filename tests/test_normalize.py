@@ -0,0 +1,98 @@
+"""
+remove_accents (bảng str.translate) phải cho cùng kết quả với unidecode; các hàm chuẩn hóa theo cột
+phải cho cùng kết quả với hàm chuẩn hóa từng giá trị.
+"""
+import unicodedata
+
+import pandas as pd
+import pytest
+import unidecode
+
+from normalize import (VIETNAMESE_FOLD_TABLE, normalize_district, normalize_district_series, normalize_province,
+                       normalize_province_series, normalize_ward, normalize_ward_series, remove_accents,
+                       remove_accents_series)
+
+VOWELS = "aăâeêioôơuưyAĂÂEÊIOÔƠUƯY"
+TONES = ("", "\u0300", "\u0301", "\u0303", "\u0309", "\u0323")
+
+NAMES = [
+    "Thành phố Hồ Chí Minh", "Thừa Thiên - Huế", "Bà Rịa - Vũng Tàu", "Phường Bến Nghé", "Quận Đống Đa",
+    "Huyện Krông Pắc", "Xã Ea Kly", "Thị trấn Phước Bửu", "Phường Thuận Phước", "Xã Nghĩa Hưng",
+    "Ấp Mỹ Thạnh", "Thôn Ngọc Hồi", "ĐƯỜNG NGUYỄN TRÃI", "Tổ 5, khu phố 3", "“Khu đô thị” Ecopark",
+    "Số 12A/3 – ngõ 45", "", "abc",
+]
+
+# Tên tỉnh, quận/huyện, phường/xã với các tiền tố và cách viết gặp trong file tải lên
+UNIT_NAMES = [
+    "TP HCM", "tp. Hồ Chí Minh", "Thành phố Hà Nội", "Tỉnh Bình Dương", "  TỈNH  Đồng Nai ", "Hà Nội",
+    "Bà Rịa - Vũng Tàu", "Tỉnh Bà Rịa Vũng Tàu", "tỉnh br - vt", "BR-VT", "Vùng Tàu", "ba ria vung tau",
+    "Thừa Thiên Huế", "Thừa Thiên - Huế", "Tỉnh Thừa Thiên-Huế", "thua thien hue", "Huế",
+    "Quận 1", "Quận 01", "quận Bình Thạnh", "Huyện Củ Chi", "Thị xã Tân Uyên", "TX. Dĩ An", "tx Thuận An",
+    "TP. Thủ Đức", "tp Thủ Dầu Một", "Thành phố Vũng Tàu",
+    "Phường 5", "Phường 05", "P.7", "P. 7", "p12", "P Bến Nghé", "Phường Phú Mỹ", "Xã Tân Thạnh Đông",
+    "Thị trấn Củ Chi", "TT. Long Điền", "tt Phước Bửu", "Khu phố 3", "KP 2", "Ấp Mỹ Thạnh", "Thôn Ngọc Hồi",
+    "Tổ 5", "Phước Long", "Phú Nhuận", "Xã",
+    "1", "01", "12", " 7 ", "", "  ",
+]
+# Giá trị không phải chuỗi: ô trống và ô số trong Excel
+NON_STRING_VALUES = [None, float("nan"), 7, 7.0, True]
+
+
+def assert_same_values(results, expected):
+    assert len(results) == len(expected)
+    for result, value in zip(results, expected):
+        if pd.isna(value) is True:
+            assert pd.isna(result) is True and type(result) is type(value)
+        else:
+            assert result == value and type(result) is type(value)
+
+
+def vietnamese_letters():
+    # Mọi nguyên âm có dấu (dựng sẵn) và đ/Đ
+    return [unicodedata.normalize("NFC", vowel + tone) for vowel in VOWELS for tone in TONES] + ["đ", "Đ"]
+
+
+def variants(text):
+    # Dạng gốc, chữ thường, chữ hoa và dạng tổ hợp (NFD)
+    forms = {text, text.lower(), text.upper()}
+    return sorted(forms | {unicodedata.normalize("NFD", form) for form in forms})
+
+
+@pytest.mark.parametrize("text", [variant for text in vietnamese_letters() + NAMES for variant in variants(text)])
+def test_remove_accents_matches_unidecode(text):
+    assert remove_accents(text) == unidecode.unidecode(text)
+
+
+def test_fold_table_matches_unidecode():
+    for code, folded in VIETNAMESE_FOLD_TABLE.items():
+        assert (folded or "") == unidecode.unidecode(chr(code))
+
+
+def test_series_matches_single_values():
+    values = [variant for text in NAMES for variant in variants(text)] + [None, float("nan"), 5]
+    folded = remove_accents_series(pd.Series(values, dtype=object)).tolist()
+    for value, result in zip(values, folded):
+        expected = remove_accents(value)
+        if isinstance(expected, float) and expected != expected:
+            assert result != result
+        else:
+            assert result == expected
+
+
+@pytest.mark.parametrize("series_func, scalar_func", [
+    (normalize_province_series, normalize_province),
+    (normalize_district_series, normalize_district),
+    (normalize_ward_series, normalize_ward),
+], ids=["province", "district", "ward"])
+@pytest.mark.parametrize("values", [
+    UNIT_NAMES,
+    UNIT_NAMES + NON_STRING_VALUES,
+    NON_STRING_VALUES,
+    [None, float("nan")],
+    [],
+], ids=["strings", "mixed", "non-strings", "empty-cells", "empty"])
+def test_normalize_series_matches_scalar(series_func, scalar_func, values):
+    values = [variant for value in values for variant in (variants(value) if isinstance(value, str) else [value])]
+    results = series_func(pd.Series(values, dtype=object))
+    assert list(results.index) == list(range(len(values)))
+    assert_same_values(results.tolist(), [scalar_func(value) for value in values])
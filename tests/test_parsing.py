@@ -0,0 +1,45 @@
+"""
+AddressParser.parse và parse_many phải cho cùng kết quả, kể cả với ô trống và giá trị không phải chuỗi.
+"""
+import pytest
+
+from parsing import AddressParser
+
+DATABASE_ROWS = [
+    ("TP Hồ Chí Minh", 79, "Quận 1", 7901, "Phường Bến Nghé", 790101),
+    ("TP Hồ Chí Minh", 79, "Quận 1", 7901, "Phường 5", 790105),
+    ("Hà Nội", 1, "Quận Ba Đình", 101, "Phường Phúc Xá", 10101),
+]
+
+ADDRESSES = [
+    "10 Lê Lợi, Phường Bến Nghé, Quận 1, TP HCM",
+    None,
+    float("nan"),
+    "",
+    "  5 Hàng Bún, phường Phúc Xá, quận Ba Đình, Hà Nội  ",
+    7,
+]
+
+
+@pytest.fixture(scope="module")
+def parser(make_reference):
+    return AddressParser(make_reference(DATABASE_ROWS))
+
+
+def test_parse_many_matches_parse(parser):
+    assert list(parser.parse_many(ADDRESSES, chunk_size=4)) == [parser.parse(address) for address in ADDRESSES]
+
+
+@pytest.mark.parametrize("address", [None, float("nan"), 7])
+def test_missing_address(parser, address):
+    for parsed in (parser.parse(address), next(parser.parse_many([address]))):
+        assert parsed.address is None
+        assert parsed.needs_check
+        assert (parsed.province_code, parsed.district_code, parsed.ward_code) == (None, None, None)
+
+
+def test_address_kept_as_given(parser):
+    parsed = next(parser.parse_many([ADDRESSES[4]]))
+    assert parsed.address == ADDRESSES[4]
+    assert (parsed.province_code, parsed.district_code, parsed.ward_code) == (1, 101, 10101)
+    assert parsed.ward_match_score == 1.0
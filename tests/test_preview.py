@@ -0,0 +1,179 @@
+"""
+Bảng xem trước đọc từ SQLite (lọc, sắp xếp, cắt trang bằng SQL) phải cho cùng kết quả với cách làm trên
+result_df bằng pandas trước đây.
+"""
+import math
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from preview import NUMERIC_COLUMNS, preview_page, split_filter_part, write_preview_database
+from process import RESULT_COLUMNS, compact_result, result_rows
+from result_store import ResultStore, check_index
+
+ROWS = [
+    # Address, Detail, Ward Code, Ward, District Code, District, Province Code, Province/City, điểm quận, điểm phường
+    ("1 Lê Lợi, Phường Bến Nghé, Quận 1, TP HCM", "1 Lê Lợi", 790101, "Phường Bến Nghé", 7901, "Quận 1", 79,
+     "TP Hồ Chí Minh", 1.0, 1.0),
+    ("2 Lê Lợi, PHƯỜNG BẾN THÀNH, QUẬN 1, TP HCM", "2 Lê Lợi", 790102, "PHƯỜNG BẾN THÀNH", 7901, "QUẬN 1", 79,
+     "TP Hồ Chí Minh", 1.0, 0.92),
+    ("Phường Đa Kao, Quận 1, Hồ Chí Minh", None, None, "Phường Đa Kao", 7901, "Quận 1", 79, "TP Hồ Chí Minh",
+     1.0, None),
+    ("Số 3 Tràng Tiền, Quận Hoàn Kiếm, Hà Nội", "Số 3 Tràng Tiền", None, None, 101, "Quận Hoàn Kiếm", 1, "Hà Nội",
+     0.9, None),
+    ("số 4, Xã Ea Kly, Huyện Krông Pắc, Đắk Lắk", "số 4", 660501, "Xã Ea Kly", 6605, "Huyện Krông Pắc", 66,
+     "Đắk Lắk", 1.0, 1.0),
+    ("Xã Ea Kly, Krông Pắc", None, None, "Xã Ea Kly", None, "Krông Pắc", None, None, None, None),
+    ("5 Trần Phú, Phường 1, Vũng Tàu, Bà Rịa - Vũng Tàu", "5 Trần Phú", 770101, "Phường 1", 7701, "Vũng Tàu", 77,
+     "Bà Rịa - Vũng Tàu", 1.0, 1.0),
+    ("", None, None, None, None, None, None, None, None, None),
+    (None, None, None, None, None, None, None, None, None, None),
+    ("7", None, None, None, None, None, None, "7", None, None),
+    ("Phường 10, Quận 10, TP HCM", None, 791010, "Phường 10", 7910, "Quận 10", 79, "TP Hồ Chí Minh", 1.0, 1.0),
+    ("Phường 2, Quận 10, TP HCM", None, 791002, "Phường 2", 7910, "Quận 10", 79, "TP Hồ Chí Minh", 1.0, 0.95),
+]
+
+FILTER_QUERIES = [
+    "",
+    '{Check} contains "Cần"',
+    '{Ward} contains "Phường"',
+    '{Ward} icontains "phường"',
+    '{Ward} scontains "PHƯỜNG"',
+    '{District} icontains quận 1',
+    '{Ward Code} >= 790102',
+    '{Ward Code} = 790101',
+    '{Ward Code} contains 790101',
+    '{Ward Code} > abc',
+    '{Ward Match Score} < 1',
+    '{District Match Score} != 1',
+    '{Ward} is blank',
+    '{Detail} is nil',
+    '{Province/City} = "Hà Nội"',
+    '{Province/City} ne "TP Hồ Chí Minh"',
+    '{Ward} < "Phường 2"',
+    '{Ward} ilt "phường 2"',
+    '{Ward} ige "phường b"',
+    '{Address} datestartswith "Phường"',
+    '{Address} idatestartswith "SỐ"',
+    '{Province Code} datestartswith 7',
+    '{Address} contains "7"',
+    '{Unknown} = 1',
+    "garbage",
+    '{Province/City} = "TP Hồ Chí Minh" && {Ward Match Score} < 1',
+    '{Ward} icontains "phường" && {Check} is blank',
+]
+
+SORTS = [
+    [],
+    [{"column_id": "Ward", "direction": "asc"}],
+    [{"column_id": "Ward", "direction": "desc"}],
+    [{"column_id": "District Code", "direction": "desc"}, {"column_id": "Ward", "direction": "asc"}],
+    [{"column_id": "Ward Match Score", "direction": "asc"}],
+    [{"column_id": "Check", "direction": "desc"}, {"column_id": "Address", "direction": "asc"}],
+    [{"column_id": "Unknown", "direction": "asc"}],
+]
+
+
+def pandas_filter_mask(column, operation, case_sensitive, value):
+    # Cách lọc trên result_df trước khi bảng xem trước chuyển sang SQLite. Bản cũ để NaN của cột độ giống
+    # thỏa "!=", ở đây sửa theo đúng mô tả: giá trị thiếu không thỏa điều kiện nào ngoài "blank"
+    if operation == "blank":
+        return column.isna() | (column.astype(object) == "")
+    if column.name in NUMERIC_COLUMNS:
+        try:
+            value = float(value)
+        except ValueError:
+            return column.notna() & False
+        if operation == "contains":
+            operation = "eq"
+    else:
+        column = column.astype(object).where(column.notna(), None).astype("string")
+        if not case_sensitive:
+            column, value = column.str.lower(), value.lower()
+        if operation == "contains":
+            return column.str.contains(value, regex=False).fillna(False).astype(bool)
+        if operation == "startswith":
+            return column.str.startswith(value).fillna(False).astype(bool)
+
+    compare = {"eq": column.__eq__, "ne": column.__ne__, "lt": column.__lt__, "le": column.__le__,
+               "gt": column.__gt__, "ge": column.__ge__}.get(operation)
+    if compare is None:
+        return column.notna() & False
+    return (compare(value) & column.notna()).fillna(False).astype(bool)
+
+
+def pandas_filter_result(result_df, filter_query):
+    for part in (filter_query or "").split(" && "):
+        parsed = split_filter_part(part) if part.strip() else None
+        if parsed is None or parsed[0] not in result_df.columns:
+            continue
+        column, operation, case_sensitive, value = parsed
+        result_df = result_df[pandas_filter_mask(result_df[column], operation, case_sensitive, value)]
+    return result_df
+
+
+def pandas_sort_result(result_df, sort_by):
+    sort_by = [item for item in (sort_by or []) if item.get("column_id") in result_df.columns]
+    if not sort_by:
+        return result_df
+    return result_df.sort_values([item["column_id"] for item in sort_by],
+                                 ascending=[item.get("direction") != "desc" for item in sort_by],
+                                 kind="stable", na_position="last")
+
+
+def pandas_preview_page(result_df, page_current, page_size, sort_by, filter_query, check_only):
+    if check_only:
+        result_df = result_df.take(check_index(result_df))
+    result_df = pandas_sort_result(pandas_filter_result(result_df, filter_query), sort_by)
+    start = page_current * page_size
+    page_df = result_df.iloc[start:start + page_size]
+    columns = list(page_df.columns)
+    return ([dict(zip(columns, row)) for row in result_rows(page_df)],
+            max(1, math.ceil(len(result_df) / page_size)), len(result_df))
+
+
+@pytest.fixture(scope="module")
+def result_df():
+    result_df = pd.DataFrame([(*row[:10], "Cần kiểm tra" if None in row[2:7:2] else "", "abc123") for row in ROWS],
+                             columns=RESULT_COLUMNS)
+    return compact_result(result_df)
+
+
+@pytest.fixture(scope="module")
+def preview_path(result_df, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("preview") / "result.sqlite")
+    write_preview_database(path, result_df)
+    return path
+
+
+@pytest.mark.parametrize("check_only", [False, True])
+@pytest.mark.parametrize("sort_by", SORTS)
+@pytest.mark.parametrize("filter_query", FILTER_QUERIES)
+def test_sqlite_page_matches_pandas(result_df, preview_path, filter_query, sort_by, check_only):
+    for page_current, page_size in [(0, 20), (0, 3), (1, 3), (10, 3)]:
+        data, page_count, matched, total = preview_page(preview_path, page_current, page_size, sort_by,
+                                                        filter_query, check_only)
+        assert (data, page_count, matched) == pandas_preview_page(result_df, page_current, page_size, sort_by,
+                                                                  filter_query, check_only)
+        assert total == len(result_df)
+
+
+def test_result_store_preview(result_df, tmp_path):
+    store = ResultStore(str(tmp_path / "store"), ttl=60)
+    key = store.new_key()
+    assert list(store.save(key, result_df)) == list(check_index(result_df))
+    data, page_count, matched, total = store.preview_page(key, 0, 5, check_only=True)
+    assert (len(data), matched, total) == (5, len(check_index(result_df)), len(result_df))
+    assert store.preview_page(store.new_key()) is None
+    assert store.preview_page("../result") is None
+
+    # File xem trước của kết quả đã hết hạn bị xóa ở lần lưu sau
+    preview_file = os.path.join(str(tmp_path / "store"), "preview", f"{key}.sqlite")
+    os.utime(preview_file, (time.time() - 120,) * 2)
+    other_key = store.new_key()
+    store.save(other_key, result_df)
+    assert not os.path.exists(preview_file)
+    assert store.preview_page(key) is None
+    assert store.preview_page(other_key) is not None
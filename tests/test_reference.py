@@ -0,0 +1,91 @@
+"""
+Nạp lại database mặc định: database mới được dùng ngay, các cấu trúc dựng theo database cũ được bỏ khỏi bộ nhớ.
+"""
+import os
+import time
+
+import pytest
+
+import process
+import reference
+from parsing import AddressParser
+
+ADDRESS = "10 Lê Lợi, Phường Bến Nghé, Quận 1, TP HCM"
+
+
+def database_rows(ward_code):
+    return [("TP Hồ Chí Minh", 79, "Quận 1", 7901, "Phường Bến Nghé", ward_code)]
+
+
+@pytest.fixture
+def write_database(make_database):
+    def write(path, ward_code):
+        make_database(database_rows(ward_code)).to_excel(path, sheet_name="database", index=False)
+    return write
+
+
+@pytest.fixture
+def database_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(reference, "REFERENCE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(reference, "_default_reference", None)
+    monkeypatch.setattr(reference, "_default_file_state", None)
+    return str(tmp_path / "database.xlsx")
+
+
+def test_reload_swaps_and_forgets_old_versions(database_path, write_database):
+    versions = []
+    for ward_code in (790101, 790102, 790103, 790104):
+        write_database(database_path, ward_code)
+        current = reference.reload_default_reference(database_path)
+        versions.append(current.version)
+        parser = AddressParser()
+        assert parser.version == current.version
+        assert parser.parse(ADDRESS).ward_code == ward_code
+
+    assert len(set(versions)) == 4
+    for per_version in (process._splitters, process._code_caches, process._fuzzy_matchers,
+                        reference._compiled_references):
+        held = {version for version, _ in per_version.items()}
+        assert held & set(versions) == {versions[-1]}
+
+
+def test_in_flight_parser_keeps_old_reference(database_path, write_database):
+    write_database(database_path, 790101)
+    parser = AddressParser(reference.reload_default_reference(database_path))
+    write_database(database_path, 790102)
+    reference.reload_default_reference(database_path)
+    # Parser tạo trước khi nạp lại vẫn dùng trọn vẹn database cũ
+    assert parser.parse(ADDRESS).ward_code == 790101
+    assert AddressParser().parse(ADDRESS).ward_code == 790102
+
+
+def test_per_version_structures_are_bounded(monkeypatch, make_reference):
+    monkeypatch.setattr(process, "_splitters", process.LRUCache(2))
+    for ward_code in (790101, 790102, 790103):
+        process.get_splitter(make_reference(database_rows(ward_code)))
+    assert len(process._splitters) == 2
+
+
+def test_reference_cache_is_pruned(tmp_path, monkeypatch, make_database):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr(reference, "REFERENCE_CACHE_DIR", str(cache_dir))
+    old_format = cache_dir / f"reference-v{reference.REFERENCE_FORMAT_VERSION - 1}-0123456789abcdef.pkl"
+    stale_tmp = cache_dir / f"reference-v{reference.REFERENCE_FORMAT_VERSION}-0123456789abcdef.pkl.42.tmp"
+    other = cache_dir / "notes.txt"
+    for path in (old_format, stale_tmp, other):
+        path.write_bytes(b"")
+    os.utime(stale_tmp, (time.time() - 7200,) * 2)
+
+    # Mỗi database mới được ghi vào cache, sau đó thư mục được dọn
+    versions = []
+    for age, ward_code in enumerate((790201, 790202, 790203)):
+        versions.append(reference.get_reference(make_database(database_rows(ward_code))).version)
+        os.utime(reference._cache_path(versions[-1]), (time.time() - 100 * (3 - age),) * 2)
+    assert sorted(os.listdir(cache_dir)) == sorted([os.path.basename(reference._cache_path(version))
+                                                    for version in versions] + ["notes.txt"])
+
+    reference.prune_reference_cache(max_files=2)
+    assert not os.path.exists(reference._cache_path(versions[0]))
+    assert all(os.path.exists(reference._cache_path(version)) for version in versions[1:])
+    assert other.exists()
@@ -0,0 +1,138 @@
+"""
+Tra mã theo lô (resolve_admin_codes, merge_codes) phải cho cùng mã với cách tra từng dòng trước đây.
+"""
+import pandas as pd
+import pytest
+
+from normalize import normalize_district, normalize_province, normalize_ward, remove_accents
+from process import get_fuzzy_matchers, resolve_admin_codes
+
+# Database nhỏ có tên trùng nhau giữa các tỉnh và giữa các quận/huyện
+DATABASE_ROWS = [
+    ("Hà Nội", 1, "Quận Ba Đình", 101, "Phường 1", 10101),
+    ("Hà Nội", 1, "Quận Ba Đình", 101, "Xã An Bình", 10102),
+    ("Hà Nội", 1, "Huyện Châu Thành", 102, "Phường 1", 10201),
+    ("Hà Nội", 1, "Huyện Châu Thành", 102, "Thị trấn Châu Thành", 10202),
+    ("Bến Tre", 2, "Huyện Châu Thành", 201, "Xã An Bình", 20101),
+    ("Bến Tre", 2, "Huyện Châu Thành", 201, "Phường 1", 20102),
+    ("Bến Tre", 2, "Quận Ba Đình", 202, "Phường 1", 20201),
+    ("Bến Tre", 2, "Quận Ba Đình", 202, "Xã Tân Định", 20202),
+]
+
+# (tỉnh, quận/huyện, phường/xã) như sau bước tách địa chỉ
+ADDRESS_UNITS = [
+    ("Hà Nội", "Quận Ba Đình", "Phường 1"),
+    ("Hà Nội", "Huyện Châu Thành", "Phường 1"),
+    ("Bến Tre", "Quận Ba Đình", "Phường 1"),
+    ("Bến Tre", "Huyện Châu Thành", "Xã An Bình"),
+    ("Ben Tre", "huyen chau thanh", "xa an binh"),
+    ("Hà Nội", "Châu Thành", "Thị trấn Châu Thành"),
+    ("Hà Nội", "Ba Đình", "P.1"),
+    ("Bến Tre", "Quận Ba Đình", "Xã Tân Định"),
+    ("Hà Nội", "Quận Ba Đình", "Xã Tân Định"),
+    ("Hà Nội", "Quận Ba Đình", None),
+    ("Hà Nội", None, "Phường 1"),
+    (None, "Quận Ba Đình", "Phường 1"),
+    ("Đà Nẵng", "Quận Ba Đình", "Phường 1"),
+    (None, None, None),
+    # Viết sai: không khớp chính xác (với so khớp gần đúng thì tìm được, xem test_fuzzy_fallback)
+    ("Hà Nội", "Huyện Châu Thàn", "Thị trấn Châu Thành"),
+    ("Bến Tre", "Quận Ba Đình", "Xã Tân Địn"),
+]
+
+
+@pytest.fixture(scope="module")
+def database_df(make_database):
+    return make_database(DATABASE_ROWS)
+
+
+@pytest.fixture(scope="module")
+def reference(make_reference):
+    return make_reference(DATABASE_ROWS)
+
+
+def row_by_row_codes(database_df, province, district, ward):
+    """
+    Cách tra mã từng dòng trước khi có merge theo lô: duyệt các dòng database có mã bắt đầu bằng mã cha,
+    lấy dòng đầu tiên trùng tên chuẩn hóa hoặc tên không dấu.
+    """
+    database_df = database_df.assign(
+        **{"Normalized Province": database_df["Tỉnh/Thành phố"].apply(normalize_province),
+           "Normalized District": database_df["Quận/Huyện"].apply(normalize_district),
+           "Normalized Ward": database_df["Phường/Xã"].apply(normalize_ward)})
+
+    province_code_map = {}
+    for _, row in database_df.iterrows():
+        province_code_map.setdefault(row["Normalized Province"], row["Mã Tỉnh/Thành phố"])
+        province_code_map.setdefault(remove_accents(row["Normalized Province"]), row["Mã Tỉnh/Thành phố"])
+
+    province_name = normalize_province(province)
+    province_code = province_code_map.get(province_name, province_code_map.get(remove_accents(province_name)))
+
+    def find(parent_code, name, name_col, code_col):
+        if parent_code is None or not isinstance(name, str):
+            return None
+        name_no_accent = remove_accents(name)
+        for _, row in database_df[database_df[code_col].astype(str).str.match(f"^{parent_code}")].iterrows():
+            if row[name_col] == name or remove_accents(row[name_col]) == name_no_accent:
+                return row[code_col]
+        return None
+
+    district_code = find(province_code, normalize_district(district), "Normalized District", "Mã Quận/Huyện")
+    ward_code = find(district_code, normalize_ward(ward), "Normalized Ward", "Mã Phường/Xã")
+    return province_code, district_code, ward_code
+
+
+@pytest.fixture
+def exact_only(reference, monkeypatch):
+    # Tắt so khớp gần đúng (ngưỡng lớn hơn 1) để chỉ so sánh phần tra chính xác
+    for matcher in get_fuzzy_matchers(reference):
+        monkeypatch.setattr(matcher, "threshold", 1.01)
+
+
+def resolve(units, reference):
+    result_df = pd.DataFrame(units, columns=["Province/City", "District", "Ward"], dtype=object)
+    resolve_admin_codes(result_df, reference)
+    return result_df
+
+
+def test_batched_codes_match_row_by_row(database_df, reference, exact_only):
+    result_df = resolve(ADDRESS_UNITS, reference)
+    for units, (_, row) in zip(ADDRESS_UNITS, result_df.iterrows()):
+        actual = tuple(None if pd.isna(row[col]) else row[col]
+                       for col in ("Province Code", "District Code", "Ward Code"))
+        assert actual == row_by_row_codes(database_df, *units), units
+        for code, score_col in zip(actual[1:], ("District Match Score", "Ward Match Score")):
+            assert row[score_col] == 1.0 if code is not None else pd.isna(row[score_col]), (units, score_col)
+
+
+def test_duplicate_names_resolve_within_parent(reference):
+    result_df = resolve(ADDRESS_UNITS[:4], reference)
+    assert result_df["Ward Code"].tolist() == [10101, 10201, 20201, 20101]
+    assert result_df["District"].tolist() == ["Quận Ba Đình", "Huyện Châu Thành", "Quận Ba Đình",
+                                              "Huyện Châu Thành"]
+
+
+# Tên viết sai: không khớp chính xác, so khớp gần đúng tìm được trong đúng đơn vị cha.
+# (địa chỉ đã tách, mã tìm được, cách khớp quận/huyện và phường/xã)
+FUZZY_UNITS = [
+    (("Hà Nội", "Huyện Châu Thàn", "Thị trấn Châu Thành"), (1, 102, 10202), ("fuzzy", "exact")),
+    (("Bến Tre", "Huyện Chau Thanhh", "Xã An Bìn"), (2, 201, 20101), ("fuzzy", "fuzzy")),
+    (("Bến Tre", "Quận Ba Đình", "Xã Tân Địn"), (2, 202, 20202), ("exact", "fuzzy")),
+    # Tên không có trong đơn vị cha thì không lấy tên trùng của tỉnh khác
+    (("Hà Nội", "Quận Ba Đình", "Xã Tân Địn"), (1, 101, None), ("exact", None)),
+]
+
+
+@pytest.mark.parametrize("units, expected, matched", FUZZY_UNITS)
+def test_fuzzy_fallback(reference, units, expected, matched):
+    row = resolve([units], reference).iloc[0]
+    actual = tuple(None if pd.isna(row[col]) else row[col] for col in ("Province Code", "District Code", "Ward Code"))
+    assert actual == expected
+    for how, score in zip(matched, (row["District Match Score"], row["Ward Match Score"])):
+        if how is None:
+            assert pd.isna(score)
+        elif how == "exact":
+            assert score == 1.0
+        else:
+            assert 0.8 <= score < 1.0
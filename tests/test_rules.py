@@ -0,0 +1,121 @@
+"""
+Bộ quy tắc tách địa chỉ (PREPROCESS_RULES, SPLIT_RULES qua KeywordScanner) phải cho cùng kết quả với chuỗi
+regex chạy lần lượt trước đây (cascade_address_parser.py).
+"""
+import pytest
+
+import address_parser
+import cascade_address_parser
+from instrumentation import StageRecorder
+
+PROVINCES = ["TP Hồ Chí Minh", "Hà Nội", "Bà Rịa - Vũng Tàu", "Thừa Thiên - Huế", "Đà Nẵng", "Bình Dương",
+             "Cần Thơ", "Đồng Nai"]
+
+ADDRESSES = [
+    # TP Hồ Chí Minh
+    "10 Lê Lợi, Phường Bến Nghé, Quận 1, TP HCM",
+    "10 Lê Lợi, Phường Bến Nghé, Quận 1, TP.HCM",
+    "10 Lê Lợi, Phường Bến Nghé, Quận 1, Tp. HCM",
+    "10 Lê Lợi, Phường Bến Nghé, Quận 1, TPHCM",
+    "10 Lê Lợi, Phường Bến Nghé, Quận 1, tphcm",
+    "10 Lê Lợi Bến Nghé Quận 1 HCM",
+    "12 Nguyễn Huệ, Quận 1, Hồ Chí Minh",
+    "12 Nguyễn Huệ, Quận 1, TP Hồ Chí Minh",
+    "12 Nguyễn Huệ, Quận 1, TP. Hồ  Chí Minh",
+    "12 Nguyễn Huệ, Quận 1, Thành phố Hồ Chí Minh",
+    "12 Nguyễn Huệ, Quận 1, Thành Phố Hồ Chí Minh",
+    "12 Nguyễn Huệ, Quận 1, thành phố hồ chí minh",
+    "5 Võ Văn Ngân, TP Thủ Đức HCM",
+    "5 Võ Văn Ngân, Thành phố Thủ Đức HCM",
+    "Ấp 3, Xã Tân Thạnh Đông, Củ Chi Hồ Chí Minh",
+    "Ấp 3, Xã Tân Thạnh Đông, Củ Chi TP HCM",
+    "Xã Bình Hưng, Bình Chánh HCM",
+    "Xã Nhị Bình, Hóc Môn TPHCM",
+    "45 Xô Viết Nghệ Tĩnh, P.25 Bình Thạnh, TP HCM",
+    "45 Xô Viết Nghệ Tĩnh, P 25 Bình Thạnh, TP HCM",
+    "100 Cách Mạng Tháng 8, P.5 Quận 3, TPHCM",
+    "100 Cách Mạng Tháng 8, P5 Q.3, Hồ Chí Minh",
+    "100 Cách Mạng Tháng 8, p.5 q3",
+    "Số 8 - Đường 3/2, Phường 12 - Quận 10 - TP.HCM",
+    "  7   Pasteur ,Phường Võ Thị Sáu ,  Quận 3,TP HCM  ",
+    "7\tPasteur,\tQuận 3, HCM",
+    "Ho Chi Minh",
+    "Quận 7, Minh Phụng",
+    # Bà Rịa - Vũng Tàu
+    "15 Lê Lợi, Phường 1, Thành phố Vũng Tàu, Bà Rịa - Vũng Tàu",
+    "15 Lê Lợi, Phường 1, TP Vũng Tàu, Bà Rịa Vũng Tàu",
+    "15 Lê Lợi, Phường 1, TP. Vũng Tàu, Vũng Tàu",
+    "15 Lê Lợi, Phường 1, thành phố Vũng Tàu, tỉnh Bà Rịa - Vũng Tàu",
+    "15 Lê Lợi, Phường 1, thành phố vũng tàu tỉnh bà rịa vũng tàu",
+    "Phường 1, tp vũng tàu, bà rịa",
+    "Thành phố Vũng Tàu, Bà Rịa",
+    "Ấp Tân Ninh, Xã Châu Pha, Thị xã Phú Mỹ, Bà Rịa - Vũng Tàu",
+    "Ấp Tân Ninh, Xã Châu Pha, TX. Phú Mỹ, Bà Rịa",
+    "Khu phố 2, Thị trấn Long Điền, Huyện Long Điền, Bà Rịa - Vũng Tàu",
+    "Xã Xuyên Mộc, Huyện Xuyên Mộc, Bà Rịa-Vũng Tàu",
+    "Thị trấn Ngãi Giao, Châu Đức, tỉnh BR-VT Bà Rịa",
+    "Xã Láng Dài, Đất Đỏ, Bà Rịa Vũng Tàu",
+    "Côn Đảo, Bà Rịa Vũng Tàu",
+    "Phường Phước Trung, Bà Rịa",
+    "Phường Phước Trung, thành phố Bà Rịa, tỉnh Bà Rịa Vũng Tàu",
+    "Vũng Tàu",
+    "ba ria vung tau",
+    # Thừa Thiên - Huế
+    "20 Lê Lợi, Phường Phú Hội, Thành phố Huế, Thừa Thiên Huế",
+    "20 Lê Lợi, Phường Phú Hội, TP Huế, Thừa Thiên - Huế",
+    "20 Lê Lợi, Phú Hội, Huế, Tỉnh Thừa Thiên-Huế",
+    "Phú Hội, Huế, Thừa ThiênHuế",
+    "Phú Hội, Huế, thua thien hue",
+    "Phú Hội Huế Thừa Thiên Huế",
+    "Xã Phú Mậu, Huyện Phú Vang, TT Huế",
+    # Các tỉnh khác và địa chỉ không theo mẫu nào
+    "1 Tràng Tiền, Phường Tràng Tiền, Quận Hoàn Kiếm, Hà Nội",
+    "Phường Tràng Tiền, Quận Hoàn Kiếm, Ha Noi",
+    "Quận Hoàn Kiếm, Hà Nội",
+    "Hoàn Kiếm Hà Nội",
+    "Số 3, Hẻm 5, Tổ 2, Phường Dĩ An, TP Dĩ An, Bình Dương",
+    "Phường Thống Nhất, TP Biên Hòa, Đồng Nai",
+    "Xã Hòa Vang, Đà Nẵng",
+    "123 Đường 30/4, Phường Xuân Khánh, Quận Ninh Kiều, Cần Thơ",
+    "Khu phố 1, Phường An Bình, Thị xã Tân Uyên, Tây Ninh",
+    "Phường 3, Quận 5, Long An",
+    "Ward 3 District 5 Saigon",
+    "Quận 5 Saigon",
+    "Saigon",
+    "X Y",
+    "P. 3 Q. 5",
+    "",
+    "  ",
+    ",,",
+    "-",
+    None,
+    float("nan"),
+]
+
+
+@pytest.fixture(scope="module")
+def splitters():
+    return (address_parser.AddressSplitter(PROVINCES, cache_size=0),
+            cascade_address_parser.AddressSplitter(PROVINCES, cache_size=0))
+
+
+@pytest.mark.parametrize("address", ADDRESSES)
+def test_rules_match_cascade(splitters, address):
+    splitter, cascade_splitter = splitters
+    assert address_parser.preprocess_address(address) == cascade_address_parser.preprocess_address(address)
+    assert splitter.split_address(address) == cascade_splitter.split_address(address)
+
+
+def test_addresses_cover_every_rule(splitters):
+    # Mỗi quy tắc tiền xử lý và mỗi nhánh tách phải được dùng ít nhất một lần, để test trên có ý nghĩa
+    addresses = [address for address in ADDRESSES if isinstance(address, str)]
+    for trigger, pattern, replacement in address_parser.PREPROCESS_RULES:
+        assert any(pattern.search(address) for address in addresses), pattern.pattern
+
+    recorder = StageRecorder()
+    for address in addresses:
+        splitters[0].split_address(address, recorder)
+    branches = {name[len("split."):] for name in recorder.counters}
+    assert branches >= {branch for branch, trigger, method in address_parser.SPLIT_RULES}
+    assert branches >= {address_parser.BRANCH_PROVINCE_FIRST, address_parser.BRANCH_COMMA_SPLIT,
+                        address_parser.BRANCH_ADMIN_UNITS}